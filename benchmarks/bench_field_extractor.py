@@ -0,0 +1,159 @@
+# benchmarks/bench_field_extractor.py
+"""
+Benchmark: extracción de campos por documento (FieldExtractor) sobre textos OCR.
+
+Mide el costo de la extracción de campos por documento, sin OCR: primera pasada
+(_extract_all_fields: glosa, RUT, folio, fecha, montos, nombre, convenio,
+periodo, horas, decreto, tipo) y segunda pasada desde la glosa.
+
+Con --baseline compara contra la versión de modules/data_processing.py de otra
+revisión de git (p. ej. la anterior al registro de expresiones compiladas) y
+verifica que ambas extraigan exactamente los mismos campos.
+
+Corpus: textos sintéticos tipo boleta con ruido OCR (semilla fija) o los .txt
+de una carpeta propia (--texts).
+
+Uso:
+    python benchmarks/bench_field_extractor.py --docs 2000
+    python benchmarks/bench_field_extractor.py --baseline HEAD~1 --rounds 5
+    python benchmarks/bench_field_extractor.py --texts Export/textos_ocr
+"""
+import argparse
+import importlib.util
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+
+from modules import data_processing as dp_mod
+
+_NOMBRES = ["MARIA JOSE GONZALEZ PEREZ", "Juan Pablo Soto Rojas", "CAMILA ANDREA MUÑOZ DIAZ",
+            "Pedro Ignacio Fuentes", "VALENTINA ROJAS ARAYA", "Francisco Javier Núñez"]
+_RUTS = ["12.345.678-5", "11.111.111-1", "9.876.543-3", "15.432.109-6", "7.654.321-K"]
+_GLOSAS = [
+    "Por atencion profesional: PROGRAMA PASMI {h} hrs semanales",
+    "Servicios de acompañamiento psicosocial D.A {dec} mes de {mes}",
+    "PROGRAMA DIR APS {h} horas mensuales",
+    "Honorarios convenio AIDIA periodo {mes} {anio}",
+    "Atencion ESPACIOS AMIGABLES EEAA {h} hrs",
+    "Programa Mejor Niñez (SENAME) mes {mes}",
+    "CONVENIO MUNICIPAL salud {h} horas",
+    "Prestaciones SALUD MENTAL decreto alcaldicio {dec}",
+    "Servicios profesionales {mes} de {anio}",
+]
+_MESES = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+          "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
+
+
+def _ruido(line: str, rng: random.Random) -> str:
+    """Errores típicos de OCR: barras, espacios dobles, o/0"""
+    r = rng.random()
+    if r < 0.10:
+        return line.replace(" ", "  ", 1)
+    if r < 0.15:
+        return line.replace("o", "0", 1)
+    if r < 0.20:
+        return f"| {line} |"
+    return line
+
+
+def synthetic_corpus(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(n):
+        anio = rng.choice([2023, 2024, 2025])
+        mes = rng.randrange(1, 13)
+        dia = rng.randrange(1, 29)
+        bruto = rng.randrange(150, 1800) * 1000
+        liquido = int(bruto * (1 - 0.1375))
+        fecha = (f"Fecha: {dia} de {_MESES[mes - 1]} de {anio}" if rng.random() < 0.6
+                 else f"Fecha: {dia:02d}/{mes:02d}/{anio}")
+        glosa = rng.choice(_GLOSAS).format(h=rng.choice([11, 22, 33, 44]), mes=_MESES[mes - 1],
+                                           anio=anio, dec=rng.choice([612, 1845, 1928, 2301]))
+        lines = [
+            "I. MUNICIPALIDAD DE EJEMPLO" if rng.random() < 0.5 else "",
+            "BOLETA DE HONORARIOS ELECTRONICA",
+            f"N° {rng.randrange(1, 9999)}",
+            f"Nombre: {rng.choice(_NOMBRES)}" if rng.random() < 0.7 else rng.choice(_NOMBRES),
+            f"RUT: {rng.choice(_RUTS)}",
+            "Domicilio: Calle Falsa 123, Santiago",
+            fecha,
+            "Señor(es): ILUSTRE MUNICIPALIDAD DE EJEMPLO",
+            glosa,
+            f"Total Honorarios $: {bruto:,}".replace(",", "."),
+            f"13,75% Impto. Retenido: {bruto - liquido:,}".replace(",", "."),
+            f"Total: {liquido:,}".replace(",", "."),
+            f"Fecha / Hora Emisión: {dia:02d}/{mes:02d}/{anio} 10:3{rng.randrange(10)}",
+            "RES. EX. N° 83 de 2004 Verifique este documento en www.sii.cl",
+        ]
+        docs.append("\n".join(_ruido(l, rng) for l in lines if l))
+    return docs
+
+
+def load_texts(folder: Path) -> list:
+    return [p.read_text(encoding="utf-8", errors="ignore") for p in sorted(Path(folder).glob("*.txt"))]
+
+
+def load_baseline(rev: str):
+    """Importa modules/data_processing.py tal como estaba en la revisión `rev`"""
+    src = subprocess.run(["git", "show", f"{rev}:modules/data_processing.py"], cwd=ROOT,
+                         check=True, capture_output=True, text=True, encoding="utf-8").stdout
+    tmp = Path(tempfile.mkdtemp()) / "data_processing_baseline.py"
+    tmp.write_text(src, encoding="utf-8")
+    spec = importlib.util.spec_from_file_location("data_processing_baseline", tmp)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _extract_all(module, docs: list) -> list:
+    """Primera y segunda pasada por documento, como en DataProcessorOptimized.process_file"""
+    dp = module.DataProcessorOptimized.__new__(module.DataProcessorOptimized)
+    dp.field_extractor = module.FieldExtractor()
+    path = Path("boleta_honorarios.pdf")
+    return [dp._segunda_pasada_desde_glosa(dp._extract_all_fields(text, path), text) for text in docs]
+
+
+def _bench(module, docs: list, rounds: int) -> float:
+    _extract_all(module, docs[:10])  # calentamiento
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        _extract_all(module, docs)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(docs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo de extracción de campos por documento")
+    parser.add_argument("--docs", type=int, default=1000, help="Documentos sintéticos")
+    parser.add_argument("--texts", default=None, help="Carpeta con textos OCR (.txt) en vez del corpus sintético")
+    parser.add_argument("--rounds", type=int, default=3, help="Repeticiones (se reporta la mejor)")
+    parser.add_argument("--baseline", default=None, help="Revisión de git a comparar (p. ej. HEAD~1)")
+    args = parser.parse_args()
+
+    docs = load_texts(args.texts) if args.texts else synthetic_corpus(args.docs)
+    if not docs:
+        print("Sin documentos para medir")
+        return
+    print(f"{len(docs)} documentos | mejor de {args.rounds} rondas")
+
+    t_new = _bench(dp_mod, docs, args.rounds)
+    print(f"actual:          {t_new * 1e6:8.1f} µs/documento")
+
+    if args.baseline:
+        base = load_baseline(args.baseline)
+        t_old = _bench(base, docs, args.rounds)
+        print(f"{args.baseline:<16} {t_old * 1e6:8.1f} µs/documento")
+        print(f"Aceleración por documento: x{t_old / t_new:.2f}")
+        iguales = _extract_all(base, docs) == _extract_all(dp_mod, docs)
+        print(f"Campos extraídos idénticos: {'sí' if iguales else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# benchmarks/bench_memory_lookup.py
+"""
+Benchmark: búsqueda Nombre → RUT (get_rut_by_name) en la memoria persistente.
+
+Carga los mismos profesionales sintéticos en Memory (JSON) y SQLiteMemory, y
+consulta nombres con ruido OCR (la mayoría no tiene coincidencia exacta, así que
+ejercitan la búsqueda difusa por trigramas). Verifica que ambos backends
+retornen exactamente el RUT del recorrido lineal con difflib (cutoff 0.85) y
+mide el costo por consulta.
+
+Uso:
+    python benchmarks/bench_memory_lookup.py --names 5000 --queries 500
+"""
+import argparse
+import difflib
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from modules.memory import Memory, SQLiteMemory
+
+_NOMBRES = ["MARIA", "JOSE", "JUAN", "PABLO", "CAMILA", "ANDREA", "PEDRO", "IGNACIO",
+            "VALENTINA", "FRANCISCO", "JAVIERA", "CRISTOBAL", "FERNANDA", "TOMAS"]
+_APELLIDOS = ["GONZALEZ", "PEREZ", "SOTO", "ROJAS", "MUÑOZ", "DIAZ", "FUENTES", "ARAYA",
+              "NUÑEZ", "CONTRERAS", "SILVA", "MORALES", "VALENZUELA", "TAPIA", "REYES"]
+
+
+def _rut(n: int) -> str:
+    cuerpo = 5_000_000 + n * 7
+    s, m = 0, 2
+    for d in reversed(str(cuerpo)):
+        s += int(d) * m
+        m = 2 if m == 7 else m + 1
+    dv = {10: "K", 11: "0"}.get(11 - s % 11, str(11 - s % 11))
+    return f"{cuerpo:,}".replace(",", ".") + f"-{dv}"
+
+
+def _ruido(nombre: str, rng: random.Random) -> str:
+    chars = list(nombre)
+    for _ in range(rng.randint(0, 2)):
+        i = rng.randrange(len(chars))
+        chars[i] = rng.choice("ABCDEFGHIJKLMNOPRSTUV10 ")
+    return "".join(chars).lower() if rng.random() < 0.3 else "".join(chars)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo y equivalencia de get_rut_by_name por backend")
+    parser.add_argument("--names", type=int, default=3000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    personas = {}
+    while len(personas) < args.names:
+        nombre = " ".join([rng.choice(_NOMBRES), rng.choice(_NOMBRES),
+                           rng.choice(_APELLIDOS), rng.choice(_APELLIDOS)])
+        personas.setdefault(nombre, _rut(len(personas)))
+    consultas = [_ruido(rng.choice(list(personas)), rng) for _ in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        backends = {
+            "json": Memory(tmp / "memory.json"),
+            "sqlite": SQLiteMemory(tmp / "memory.sqlite3", json_path=tmp / "no_existe.json"),
+        }
+        for mem in backends.values():
+            with mem.batch():
+                for nombre, rut in personas.items():
+                    mem.learn({"rut": rut, "nombre": nombre})
+
+        # Referencia: recorrido lineal sobre todas las claves normalizadas
+        normalizar = backends["json"]._normalize_name
+        name_to_rut = {normalizar(n): r for n, r in personas.items()}
+        esperado = []
+        for consulta in consultas:
+            norm = normalizar(consulta)
+            if norm in name_to_rut:
+                esperado.append(name_to_rut[norm])
+                continue
+            match = difflib.get_close_matches(norm, list(name_to_rut), n=1, cutoff=0.85)
+            esperado.append(name_to_rut[match[0]] if match else "")
+
+        print(f"{len(personas)} nombres | {len(consultas)} consultas | "
+              f"{sum(1 for e in esperado if e)} con coincidencia")
+        ok = True
+        for nombre_backend, mem in backends.items():
+            mem._name_index = None  # el primer get_rut_by_name construye el índice (se mide)
+            t0 = time.perf_counter()
+            resultado = [mem.get_rut_by_name(c) for c in consultas]
+            dt = time.perf_counter() - t0
+            iguales = resultado == esperado
+            ok &= iguales
+            print(f"{nombre_backend:>6}: {dt / len(consultas) * 1000:8.3f} ms/consulta | "
+                  f"{'idéntico' if iguales else 'DIFIERE'} al recorrido lineal")
+            if hasattr(mem, "close"):
+                mem.close()
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/bench_ocr_backend.py
+"""
+Benchmark: latencia por llamada de image_to_data según backend OCR.
+
+Compara:
+- pytesseract: un proceso tesseract por llamada (PNG temporal + carga de traineddata + TSV)
+- tesserocr:   motor en proceso reutilizado, imagen numpy pasada como buffer
+
+Usa una imagen sintética con texto tipo boleta (o una imagen propia con --image).
+
+Uso:
+    python benchmarks/bench_ocr_backend.py --calls 20
+    python benchmarks/bench_ocr_backend.py --image Registro/boleta.png --psm 6
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from modules.ocr_backend import PytesseractBackend, TesserocrBackend, tesserocr
+
+
+def _synthetic_page() -> np.ndarray:
+    img = np.full((1400, 1000), 255, np.uint8)
+    lines = [
+        "BOLETA DE HONORARIOS ELECTRONICA",
+        "RUT: 12.345.678-5   N 1234",
+        "Fecha: 15 de marzo de 2024",
+        "Por atencion profesional: PROGRAMA PASMI",
+        "Total Honorarios $: 500.000",
+        "13,75% Impto. Retenido: 68.750",
+        "Total: 431.250",
+    ]
+    for i, line in enumerate(lines):
+        cv2.putText(img, line, (60, 150 + i * 120), cv2.FONT_HERSHEY_SIMPLEX, 1.1, 0, 2, cv2.LINE_AA)
+    return img
+
+
+def _bench(backend, img: np.ndarray, config: str, calls: int) -> float:
+    backend.image_to_data(img, config)  # calentamiento (inicializa el motor)
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        backend.image_to_data(img, config)
+    return (time.perf_counter() - t0) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia por llamada de los backends OCR")
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--image", default=None)
+    parser.add_argument("--psm", type=int, default=6)
+    parser.add_argument("--lang", default="spa")
+    args = parser.parse_args()
+
+    img = cv2.imread(args.image, cv2.IMREAD_GRAYSCALE) if args.image else _synthetic_page()
+    config = f"--oem 3 --psm {args.psm} -l {args.lang}"
+    print(f"Imagen {img.shape[1]}x{img.shape[0]} | {args.calls} llamadas | config '{config}'")
+
+    t_py = _bench(PytesseractBackend(), img, config, args.calls)
+    print(f"pytesseract: {t_py * 1000:8.1f} ms/llamada")
+
+    if tesserocr is None:
+        print("tesserocr no está instalado (pip install tesserocr): solo se midió pytesseract")
+        return
+    t_api = _bench(TesserocrBackend(), img, config, args.calls)
+    print(f"tesserocr:   {t_api * 1000:8.1f} ms/llamada")
+    print(f"Aceleración por llamada: x{t_py / t_api:.2f}")
+
+
+if __name__ == "__main__":
+    main()
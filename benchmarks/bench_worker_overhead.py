@@ -0,0 +1,71 @@
+# benchmarks/bench_worker_overhead.py
+"""
+Benchmark: sobrecarga por archivo de los workers de la FASE 1.
+
+Compara:
+- ANTES:   un DataProcessorOptimized nuevo por archivo (get_languages + memory.json + caché)
+- DESPUÉS: un procesador por proceso creado en init_worker y reutilizado
+
+No ejecuta OCR: mide solo el costo fijo que se paga por archivo antes del OCR.
+
+Uso:
+    python benchmarks/bench_worker_overhead.py --files 200 --workers 4
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import MAX_WORKERS
+from modules import data_processing as dp_mod
+
+
+def _per_file_old(_: int) -> float:
+    """Comportamiento anterior: construir todo por cada archivo"""
+    from modules.ocr_cache import OCRCache
+    t0 = time.perf_counter()
+    cache = OCRCache()
+    dp = dp_mod.DataProcessorOptimized(ocr_cache=cache)
+    cache.close()
+    return time.perf_counter() - t0
+
+
+def _per_file_new(_: int) -> float:
+    """Comportamiento nuevo: procesador persistente del worker"""
+    t0 = time.perf_counter()
+    dp = dp_mod._get_worker_processor()
+    dp.reset_batch_memory()
+    return time.perf_counter() - t0
+
+
+def _run(fn, files: int, workers: int, initializer=None) -> tuple:
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer) as ex:
+        per_file = list(ex.map(fn, range(files)))
+    wall = time.perf_counter() - t0
+    return wall, sum(per_file) / len(per_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sobrecarga por archivo de los workers OCR")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    args = parser.parse_args()
+
+    print(f"Archivos simulados: {args.files} | workers: {args.workers}")
+
+    wall_old, avg_old = _run(_per_file_old, args.files, args.workers)
+    print(f"ANTES   (por archivo): total {wall_old:7.2f}s | sobrecarga media {avg_old * 1000:8.2f} ms/archivo")
+
+    wall_new, avg_new = _run(_per_file_new, args.files, args.workers, initializer=dp_mod.init_worker)
+    print(f"DESPUÉS (init_worker): total {wall_new:7.2f}s | sobrecarga media {avg_new * 1000:8.2f} ms/archivo")
+
+    if avg_new > 0:
+        print(f"Reducción de sobrecarga por archivo: x{avg_old / avg_new:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# cli.py
+"""
+Procesamiento por lotes sin interfaz gráfica (servidores / tareas programadas).
+
+Ejecuta las fases 1, 2 y 4 de la aplicación (la revisión manual queda fuera:
+los registros que la requieren se informan en el evento 'revision_pendiente').
+Emite un evento JSON por línea en stdout (o en --events); los mensajes
+de post-procesamiento van a stderr.
+
+Uso:
+    python cli.py --input Registro --output Export/boletas_procesadas.xlsx
+    python cli.py --workers 4 --cache-dir /var/cache/boletas --events run.jsonl
+    python cli.py --incremental            # solo archivos nuevos/modificados (manifiesto en Export/)
+    python cli.py --run-report Export/rendimiento.json
+
+Eventos: inicio, incremental, fase_inicio, archivo, fase_fin, revision_pendiente, excel,
+         excel_individual, excel_individuales, rendimiento, fin, error
+Código de salida: 0 = OK, 1 = sin resultados o error, 2 = sin archivos de entrada
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+import traceback
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from config import *
+from modules.utils import iter_files
+
+
+class EventWriter:
+    """Escribe eventos JSON-lines con marca de tiempo"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.t0 = time.perf_counter()
+
+    def emit(self, event: str, **data):
+        payload = {"evento": event, "ts": round(time.time(), 3),
+                   "transcurrido_s": round(time.perf_counter() - self.t0, 3)}
+        payload.update(data)
+        self.stream.write(json.dumps(payload, ensure_ascii=False, default=str) + "\n")
+        self.stream.flush()
+
+
+def _stderr_log(msg, level="info"):
+    print(msg, file=sys.stderr)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Procesamiento de boletas sin interfaz gráfica")
+    parser.add_argument("--input", "-i", default=str(REGISTRO_DIR), help="Carpeta con boletas (PDF/imágenes)")
+    parser.add_argument("--output", "-o", default=str(EXPORT_DIR / "boletas_procesadas.xlsx"), help="Excel de salida")
+    parser.add_argument("--workers", "-w", type=int, default=MAX_WORKERS, help="Procesos OCR en paralelo")
+    parser.add_argument("--cache-dir", default=None, help="Directorio del caché OCR (por defecto config.OCR_CACHE_DIR)")
+    parser.add_argument("--no-cache", action="store_true", help="No usar el caché OCR")
+    parser.add_argument("--no-reports", action="store_true", help="No generar hojas por convenio")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Procesar solo archivos nuevos/modificados y combinar con la corrida anterior")
+    parser.add_argument("--manifest", default=None,
+                        help="Manifiesto del modo incremental (por defecto config.RUN_MANIFEST_PATH)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Escribir el Excel fila a fila (constant_memory) sin importar el tamaño")
+    parser.add_argument("--individual", action="store_true", help="Generar Excel individual por profesional")
+    parser.add_argument("--run-report", default=None,
+                        help="Reporte JSON de tiempos por etapa (por defecto config.RUN_REPORT_PATH)")
+    parser.add_argument("--events", default="-", help="Archivo de eventos JSON-lines ('-' = stdout)")
+    parser.add_argument("--quiet", action="store_true", help="No mostrar mensajes de post-procesamiento en stderr")
+    return parser.parse_args(argv)
+
+
+def run(args, events: EventWriter) -> int:
+    from modules.data_processing import DataProcessorOptimized, BatchMemory
+    from modules.ocr_extraction import update_variant_stats, dpi_summary
+    from modules.pipeline import run_ocr_phase, render_review_previews, calculate_final_quality, write_excel
+    from modules.report_generator import ReportGenerator
+    from modules.manifest import RunManifest
+    from modules.instrumentation import build_run_report, write_run_report
+
+    input_dir = Path(args.input)
+    output_file = Path(args.output)
+    files = list(iter_files(input_dir))
+    total = len(files)
+    workers = max(1, args.workers)
+
+    events.emit("inicio", entrada=str(input_dir), salida=str(output_file), archivos=total,
+                workers=workers, cache=None if args.no_cache else (args.cache_dir or str(OCR_CACHE_DIR)))
+    if total == 0:
+        events.emit("fin", estado="sin_archivos")
+        return 2
+
+    # Modo incremental: solo lo agregado/modificado desde la última corrida
+    manifest, previos, eliminados = None, [], []
+    if args.incremental:
+        manifest = RunManifest(input_dir, path=args.manifest)
+        cambios = manifest.scan(files)
+        previos = manifest.previous_records()
+        eliminados = cambios['eliminados']
+        files = cambios['nuevos'] + cambios['modificados']
+        total = len(files)
+        events.emit("incremental", manifiesto=str(manifest.path), nuevos=len(cambios['nuevos']),
+                    modificados=len(cambios['modificados']), sin_cambios=len(cambios['sin_cambios']),
+                    eliminados=len(eliminados), ultima_corrida=manifest.last_run)
+        if total == 0 and not eliminados:
+            events.emit("fin", estado="sin_cambios", registros_previos=len(previos))
+            return 0
+
+    # ========== FASE 1: EXTRACCIÓN OCR ==========
+    fases_s = {}
+    t_fase = time.perf_counter()
+    events.emit("fase_inicio", fase=1, nombre="ocr")
+
+    def on_result(file_path, result, error, completed, total):
+        data = {"archivo": str(file_path), "completados": completed, "total": total, "ok": error is None}
+        if error is not None:
+            data["error"] = error
+        else:
+            data.update({
+                "confianza": round(float(result.get('confianza', 0) or 0), 3),
+                "cache": bool(result.get('ocr_cache')),
+                "variante": result.get('ocr_variante', ''),
+                "dpi": result.get('ocr_dpi'),
+                "llamadas_ocr": result.get('ocr_llamadas', 0),
+                "tiempo_ms": result.get('instrumentacion', {}).get('total_ms'),
+            })
+        events.emit("archivo", **data)
+
+    pipeline_stats = {}
+    all_results, errors = run_ocr_phase(
+        files,
+        max_workers=workers,
+        cache_dir=args.cache_dir,
+        use_cache=not args.no_cache,
+        on_result=on_result,
+        stats=pipeline_stats,
+    )
+    update_variant_stats(all_results)
+    fases_s['ocr'] = time.perf_counter() - t_fase
+    events.emit("fase_fin", fase=1, nombre="ocr", duracion_s=round(fases_s['ocr'], 3),
+                extraidos=len(all_results), errores=len(errors),
+                dpi_final={str(k): v for k, v in dpi_summary(all_results).items()}, pipeline=pipeline_stats)
+    if not all_results and not previos:
+        events.emit("fin", estado="sin_resultados", errores=errors)
+        return 1
+
+    # ========== FASE 2: POST-PROCESAMIENTO ==========
+    t_fase = time.perf_counter()
+    events.emit("fase_inicio", fase=2, nombre="post_proceso")
+    data_processor = DataProcessorOptimized(BatchMemory())
+    # Los registros anteriores alimentan la búsqueda cruzada del lote
+    for registro in previos:
+        data_processor.batch_memory.add_registro(registro)
+    log = None if args.quiet else _stderr_log
+    completos, para_revision = data_processor.batch_processor.post_process_batch(all_results, log_callback=log)
+    fases_s['post_proceso'] = time.perf_counter() - t_fase
+    events.emit("fase_fin", fase=2, nombre="post_proceso", duracion_s=round(fases_s['post_proceso'], 3),
+                completos=len(completos), para_revision=len(para_revision))
+    if para_revision:
+        # Sin revisión interactiva: las previews (reducidas) quedan listas para quien revise
+        render_review_previews(para_revision, log_callback=log)
+        events.emit("revision_pendiente", cantidad=len(para_revision),
+                    archivos=[r.get('archivo', '') for r in para_revision],
+                    previews=[r.get('preview_path', '') for r in para_revision])
+
+    # ========== FASE 4: GENERACIÓN DE REPORTES ==========
+    t_fase = time.perf_counter()
+    events.emit("fase_inicio", fase=4, nombre="reportes")
+    # Incremental: se exportan los registros anteriores + los de esta corrida
+    exportar = previos + completos
+    if exportar:
+        with data_processor.memory.batch():
+            for registro in completos:
+                if registro.get('rut'):
+                    data_processor.memory.learn(registro)
+
+        for registro in exportar:
+            registro['quality_score'] = calculate_final_quality(registro)
+
+        report_generator = ReportGenerator()
+        n_registros, written = write_excel(report_generator, exportar, output_file,
+                                           generate_reports=not args.no_reports,
+                                           streaming=True if args.streaming else None,
+                                           run_report=build_run_report(all_results, errors, fases_s, pipeline_stats))
+        events.emit("excel", ruta=str(written), registros=n_registros, destino_en_uso=written != output_file)
+
+        if args.individual:
+            import pandas as pd
+            individual_dir = output_file.parent / "Reportes_Individuales"
+
+            def on_report(rut, archivo, error, completados, total_rep):
+                data = {"rut": rut, "completados": completados, "total": total_rep, "ok": error is None}
+                data.update({"archivo": archivo} if error is None else {"error": error})
+                events.emit("excel_individual", **data)
+
+            resumen_ind = report_generator.generate_individual_professional_reports(
+                pd.DataFrame(exportar), individual_dir, max_workers=workers, progress_callback=on_report)
+            events.emit("excel_individuales", ruta=str(individual_dir), generados=len(resumen_ind['generados']),
+                        fallidos=resumen_ind['fallidos'])
+    if manifest is not None:
+        manifest.update(completos)
+        manifest.save()
+    fases_s['reportes'] = time.perf_counter() - t_fase
+    events.emit("fase_fin", fase=4, nombre="reportes", duracion_s=round(fases_s['reportes'], 3))
+
+    # Reporte de rendimiento (con la duración de todas las fases)
+    reporte = build_run_report(all_results, errors, fases_s, pipeline_stats)
+    ruta_reporte = write_run_report(reporte, args.run_report)
+    events.emit("rendimiento", ruta=str(ruta_reporte) if ruta_reporte else None,
+                tiempo_documento_ms=reporte['tiempo_documento_ms'], contadores=reporte['contadores'],
+                picos=reporte['picos'], llamadas_ocr_documento=reporte['llamadas_ocr_documento'],
+                etapas_s={etapa: st['total_s'] for etapa, st in reporte['etapas'].items()},
+                mas_lentos=[d['archivo'] for d in reporte['mas_lentos'][:5]])
+
+    calidad = (sum(r.get('quality_score', 0) for r in completos) / len(completos)) if completos else 0.0
+    events.emit("fin", estado="ok", archivos=total, completos=len(completos), registros_previos=len(previos),
+                para_revision=len(para_revision), errores=len(errors), calidad_promedio=round(calidad, 3))
+    return 0
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    stream = sys.stdout if args.events == "-" else open(args.events, "a", encoding="utf-8")
+    events = EventWriter(stream)
+    try:
+        # Los print() de los módulos van a stderr: stdout queda solo para eventos
+        with contextlib.redirect_stdout(sys.stderr):
+            return run(args, events)
+    except Exception as e:
+        events.emit("error", tipo=type(e).__name__, mensaje=str(e), traceback=traceback.format_exc())
+        return 1
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,7 @@
 #
 # proyecto_boletas/
 # ├── main.py                 # Aplicación principal con GUI
+# ├── cli.py                  # Procesamiento por lotes sin GUI (eventos JSON-lines)
 # ├── config.py               # Configuración global
 # ├── modules/
 # │   ├── __init__.py
@@ -43,6 +44,35 @@ for dir_path in [REVIEW_PREVIEW_DIR, EXPORT_DIR, REGISTRO_DIR]:
 # Control de hilos
 os.environ.setdefault("OMP_THREAD_LIMIT", "1")
 MAX_WORKERS = min(8, max(2, (os.cpu_count() or 8) - 2))
+# Procesos para los Excel individuales por profesional (1 = secuencial)
+INDIVIDUAL_REPORT_WORKERS = MAX_WORKERS
+
+# FASE 1 por etapas (modules/staged_pipeline): render (poppler) -> preproceso
+# (orientación) -> OCR, cada etapa con su propio pool de procesos. Las páginas
+# pasan entre etapas por memoria compartida (buffers reutilizables de
+# OCR_PAGE_BUFFER_MB); la cantidad de buffers acota las colas entre etapas.
+# Con menos de OCR_STAGED_MIN_FILES archivos se usa el pool único (hilos por documento).
+OCR_STAGED_PIPELINE = True
+OCR_STAGED_MIN_FILES = 16
+OCR_RENDER_WORKERS = max(1, MAX_WORKERS // 4)
+OCR_PREPROC_WORKERS = max(1, MAX_WORKERS // 4)
+OCR_STAGE_QUEUE_DEPTH = 2     # trabajos en espera por etapa además de los workers
+OCR_PAGE_BUFFER_MB = 40       # página carta/oficio RGB a 300 DPI: ~25-32 MB
+OCR_PAGE_BUFFERS = None       # None = workers de las tres etapas + OCR_STAGE_QUEUE_DEPTH
+
+# Excel principal: desde este N° de registros se escribe en modo streaming
+# (xlsxwriter constant_memory, fila a fila, sin armar el DataFrame completo)
+EXCEL_STREAMING_MIN_ROWS = 20_000
+
+# Modo incremental ("solo archivos nuevos"): manifiesto de la última corrida
+# (ruta, tamaño, mtime, hash y registro exportado de cada archivo)
+RUN_MANIFEST_PATH = EXPORT_DIR / "run_manifest.json"
+
+# Reporte de rendimiento de la corrida: tiempos por etapa y contadores
+# (llamadas a Tesseract, píxeles) agregados de todos los documentos.
+# También se escribe como hoja 'Rendimiento' del Excel principal.
+RUN_REPORT_PATH = EXPORT_DIR / "run_report.json"
+RUN_REPORT_TOP_N = 25  # documentos más lentos que se listan
 
 # Configuración de debug
 DEBUG_SAVE_PREPROC = False
@@ -65,8 +95,97 @@ RETENCION_PORCENTAJE_MAX = 0.17  # 17% retención máxima típica
 
 # Configuración de OCR
 OCR_DPI = 400  # Aumentado de 350 a 400 para mejor calidad
+# Escalera de DPI para PDFs escaneados: se parte barato y se sube solo si
+# faltan campos clave. El DPI final de cada archivo queda en 'ocr_dpi'.
+OCR_ADAPTIVE_DPI = True
+OCR_DPI_LADDER = (300, 450, 600)
 OCR_CONFIDENCE_THRESHOLD = 0.45
 
+# Carril rápido de PDF nativos: la primera página se clasifica por estructura
+# (fuentes, imágenes, productor). Una imagen de al menos esta resolución sobre
+# media página se considera escaneo; sin ella, el texto embebido (con sus líneas)
+# va directo a la extracción de campos, sin render ni OCR.
+PDF_SCAN_MIN_DPI = 100
+
+# Backend de Tesseract: "auto" usa tesserocr (motor en proceso, uno por worker/hilo)
+# si está instalado; si no, pytesseract (un proceso tesseract por llamada)
+OCR_BACKEND = "auto"
+
+# Orientación: antes de OSD se prueba un chequeo barato (perfiles de proyección +
+# OCR rápido del encabezado buscando palabras clave). La decisión se guarda por hash.
+OCR_ORIENT_FAST = True
+OCR_ORIENT_MIN_RATIO = 1.2      # varianza filas/columnas mínima para "texto horizontal"
+OCR_ORIENT_WORK_WIDTH = 1400    # ancho de la franja usada en el OCR rápido
+
+# Caché persistente de resultados OCR (clave = hash del archivo + versión del pipeline)
+# Subir OCR_PIPELINE_VERSION cada vez que cambie el preprocesamiento u OCR,
+# así las entradas antiguas dejan de usarse y terminan desalojadas.
+OCR_PIPELINE_VERSION = "3.1-ocr11"
+OCR_CACHE_ENABLED = True
+OCR_CACHE_DIR = BASE_DIR / "cache"
+OCR_CACHE_MAX_MB = 512        # Tamaño máximo del caché (se desalojan las entradas menos usadas)
+OCR_CACHE_MAX_AGE_DAYS = 180  # Entradas sin uso por más tiempo se eliminan
+
+# Previews de revisión manual: el OCR solo guarda cómo regenerarlas (archivo,
+# página, DPI, rotación, variante); se renderizan reducidas y únicamente para los
+# registros que quedan para revisión, en un almacén por contenido acotado.
+PREVIEW_FORMAT = "webp"         # "webp" o "jpg" (si falla WebP se usa JPEG)
+PREVIEW_QUALITY = 80
+PREVIEW_DPI = 150               # Tope de DPI al re-renderizar un PDF para la preview
+PREVIEW_MAX_SIZE = (900, 1000)  # Ancho x alto máximos (lo que muestra el diálogo)
+PREVIEW_STORE_MAX_MB = 200      # Se desalojan las previews menos usadas sobre este tamaño
+PREVIEW_MAX_AGE_DAYS = 30       # Previews sin uso por más tiempo se eliminan
+
+# Búsqueda escalonada de variantes OCR
+# Se detiene apenas el texto contiene RUT válido + Total Honorarios + fecha.
+# El orden inicial se reordena según el historial de victorias (OCR_STATS_PATH).
+OCR_EARLY_EXIT = True
+OCR_VARIANT_ORDER = ("otsu", "clahe_otsu", "gamma_otsu", "adaptive_gauss")
+OCR_PSM_ORDER = (6, 4, 11)  # 6=bloque uniforme, 4=columna única, 11=sparse
+OCR_STATS_PATH = EXPORT_DIR / "ocr_variant_stats.json"
+
+# OCR por zonas (ROI) del layout SII: encabezado (nombre/RUT/folio), fecha, glosa y
+# totales. Si las zonas ya entregan los campos clave, no se hace OCR de la página completa.
+# Se hace una sola vez, en el primer peldaño de DPI (~30% de la página a 300 DPI: del
+# orden de 1/13 de los píxeles de una pasada completa a 600 DPI).
+OCR_ROI_ENABLED = True
+# Plantilla de respaldo (fracciones x0, y0, x1, y1 de la página) si no se detecta la tabla.
+# Zonas disjuntas y ajustadas a las líneas de los campos: franja del emisor, línea de
+# fecha (mitad izquierda), columna de descripción de la glosa y columna de montos.
+ROI_TEMPLATE = {
+    "encabezado": (0.00, 0.02, 1.00, 0.14),
+    "fecha": (0.00, 0.16, 0.55, 0.24),
+    "glosa": (0.05, 0.32, 0.65, 0.42),
+    "totales": (0.55, 0.44, 1.00, 0.56),
+}
+_ROI_TOTALES_WHITELIST = "0123456789.,:$%-TOALHNRISQUDEMPGtoalhnrisqudempgíÍ"
+ROI_OCR_CONFIGS = {
+    "encabezado": "--oem 3 --psm 6",
+    "fecha": "--oem 3 --psm 6",
+    "glosa": "--oem 3 --psm 4",
+    "totales": f"--oem 3 --psm 6 -c tessedit_char_whitelist={_ROI_TOTALES_WHITELIST}",
+}
+
+# Tope de llamadas a Tesseract por PDF escaneado (sin contar la orientación): el peor
+# caso de procesar directo al DPI más alto (zonas + todas las variantes y PSM, con su
+# invertida, + doble pasada). La escalera de DPI nunca gasta más que eso: el último
+# peldaño solo usa lo que dejaron los anteriores.
+OCR_MAX_CALLS = len(ROI_TEMPLATE) + len(OCR_VARIANT_ORDER) * (len(OCR_PSM_ORDER) + 1) + 2
+# Si el primer peldaño queda bajo esta calidad (sin "Total Honorarios" ni monto legible),
+# se salta el peldaño intermedio y se va directo al DPI más alto
+OCR_DPI_SALTO_CALIDAD = 0.9
+
+# Timbre electrónico SII (PDF417, modules/timbre.py, requiere zxing-cpp): se lee
+# antes del OCR y aporta RUT, folio, fecha y monto; el OCR queda solo para la
+# glosa (convenio), y se omite si la memoria ya conoce nombre y convenio del RUT.
+TIMBRE_ENABLED = True
+TIMBRE_CONFIDENCE = 0.99
+
+# Memoria persistente (RUT ↔ nombre, convenios, patrones de pago)
+# "sqlite": Export/memory.sqlite3 (migra memory.json automáticamente la primera vez)
+# "json":   Export/memory.json (formato histórico)
+MEMORY_BACKEND = "sqlite"
+
 # Expresiones regulares y patrones
 import re
 
@@ -10,8 +10,8 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from pathlib import Path
 import threading
+import time
 import traceback
-from concurrent.futures import ProcessPoolExecutor, as_completed
 from PIL import Image, ImageTk
 import sys
 import os
@@ -23,8 +23,12 @@ sys.path.append(str(Path(__file__).parent))
 
 from config import *
 from modules.utils import *
-from modules.data_processing import DataProcessorOptimized, BatchMemory, IntelligentBatchProcessor, process_file_worker
+from modules.data_processing import DataProcessorOptimized, BatchMemory, IntelligentBatchProcessor, ocr_threads_for
+from modules.pipeline import run_ocr_phase, render_review_previews, calculate_final_quality, write_excel
 from modules.report_generator import ReportGenerator
+from modules.manifest import RunManifest
+from modules.instrumentation import build_run_report, write_run_report
+from modules.ocr_extraction import update_variant_stats, dpi_summary
 
 
 class ImprovedReviewDialog(tk.Toplevel):
@@ -83,12 +87,15 @@ class ImprovedReviewDialog(tk.Toplevel):
         canvas_frame.grid_rowconfigure(0, weight=1)
         canvas_frame.grid_columnconfigure(0, weight=1)
         
-        # Cargar imagen de preview
+        # Cargar imagen de preview (se genera aquí si aún no existe)
         preview_path = self.row.get("preview_path", "")
+        if not (preview_path and Path(preview_path).exists()) and self.row.get("preview"):
+            from modules.preview_store import PreviewStore
+            preview_path = PreviewStore().get_or_render(self.row["preview"])
         if preview_path and Path(preview_path).exists():
             try:
                 pil_img = Image.open(preview_path)
-                pil_img.thumbnail((900, 1000), Image.Resampling.LANCZOS)
+                pil_img.thumbnail(PREVIEW_MAX_SIZE, Image.Resampling.LANCZOS)
                 self.tk_image = ImageTk.PhotoImage(pil_img)
                 canvas.create_image(0, 0, anchor="nw", image=self.tk_image)
                 canvas.config(scrollregion=canvas.bbox("all"))
@@ -223,6 +230,7 @@ class BoletasApp(tk.Tk):
         self.var_manual_review = tk.BooleanVar(value=True)
         self.var_generate_reports = tk.BooleanVar(value=True)
         self.var_individual_reports = tk.BooleanVar(value=True)
+        self.var_incremental = tk.BooleanVar(value=False)
         
         # Procesadores
         self.batch_memory = BatchMemory()
@@ -273,6 +281,8 @@ class BoletasApp(tk.Tk):
                        variable=self.var_generate_reports).pack(anchor="w")
         ttk.Checkbutton(options_frame, text="👤 Generar reportes individuales por profesional (NUEVO v4.0)",
                        variable=self.var_individual_reports).pack(anchor="w")
+        ttk.Checkbutton(options_frame, text="⏩ Solo archivos nuevos o modificados (incremental)",
+                       variable=self.var_incremental).pack(anchor="w")
         
         # Botones control
         control_frame = ttk.Frame(main_frame)
@@ -410,10 +420,29 @@ class BoletasApp(tk.Tk):
         try:
             input_dir = Path(self.root_dir.get())
             files = list(iter_files(input_dir))
+            
+            # Modo incremental: solo lo agregado/modificado desde la última corrida
+            manifest, previos, eliminados = None, [], []
+            if self.var_incremental.get() and files:
+                manifest = RunManifest(input_dir)
+                cambios = manifest.scan(files)
+                previos = manifest.previous_records()
+                eliminados = cambios['eliminados']
+                files = cambios['nuevos'] + cambios['modificados']
+                self.log(f"Modo incremental: {len(cambios['nuevos'])} nuevo(s), "
+                         f"{len(cambios['modificados'])} modificado(s), {len(cambios['sin_cambios'])} sin cambios, "
+                         f"{len(eliminados)} eliminado(s)", "info")
+                # Los registros anteriores alimentan la búsqueda cruzada del lote
+                for registro in previos:
+                    self.batch_memory.add_registro(registro)
+            
             total = len(files)
             
-            if total == 0:
-                self.log("No se encontraron archivos", "warning")
+            if total == 0 and not eliminados:
+                if manifest is not None:
+                    self.log("Sin archivos nuevos ni modificados: el Excel ya está al día", "info")
+                else:
+                    self.log("No se encontraron archivos", "warning")
                 return
             
             self.log(f"Encontrados {total} archivo(s)", "info")
@@ -424,45 +453,48 @@ class BoletasApp(tk.Tk):
             self.log("FASE 1/4: EXTRACCIÓN OCR", "info")
             self.log("=" * 60, "info")
             
-            all_results = []
-            errors = []
+            n_procs, ocr_threads = ocr_threads_for(total)
+            if ocr_threads > 1:
+                self.log(f"Pocos archivos: {n_procs} proceso(s) × {ocr_threads} hilos OCR por documento", "info")
             
-            with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                futures = {executor.submit(process_file_worker, str(f)): f for f in files}
+            def on_result(file_path, result, error, completed, total):
+                progress = (completed / total) * 50  # 0-50%
+                self.progress_var.set(progress)
+                self.progress_label.config(text=f"OCR: {completed}/{total}")
                 
-                completed = 0
-                for future in as_completed(futures):
-                    if not self.processing:
-                        break
-                    
-                    completed += 1
-                    progress = (completed / total) * 50  # 0-50%
-                    self.progress_var.set(progress)
-                    self.progress_label.config(text=f"OCR: {completed}/{total}")
-                    
-                    file_path = futures[future]
-                    
-                    try:
-                        result = future.result()
-
-                        if result.get('error'):
-                            errors.append(str(file_path))
-                            self.log(f"✕ Error: {file_path.name} - {result.get('error')}", "error")
-                        else:
-                            all_results.append(result)
-                            conf = result.get('confianza', 0)
-                            self.log(f"✓ Extraído: {file_path.name} (Conf:{conf:.0%})", "success")
-                    
-                    except Exception as e:
-                        errors.append(str(file_path))
-                        self.log(f"✕ Error: {file_path.name} - {e}", "error")
-                    
-                    self.update_idletasks()
+                if error is not None:
+                    self.log(f"✕ Error: {file_path.name} - {error}", "error")
+                else:
+                    conf = result.get('confianza', 0)
+                    self.log(f"✓ Extraído: {file_path.name} (Conf:{conf:.0%})", "success")
+                
+                self.update_idletasks()
             
-            if not all_results:
+            t_fase = time.perf_counter()
+            pipeline_stats = {}
+            all_results, errors = run_ocr_phase(
+                files,
+                on_result=on_result,
+                should_continue=lambda: self.processing,
+                stats=pipeline_stats
+            )
+            fases_s = {'ocr': time.perf_counter() - t_fase}
+            if pipeline_stats.get('modo') == 'etapas':
+                self.log("Pipeline por etapas: " + ", ".join(
+                    f"{etapa} {st['workers']}w {st['utilizacion']:.0%}"
+                    for etapa, st in pipeline_stats['etapas'].items()), "info")
+            
+            if not all_results and not previos:
                 self.log("No se pudo procesar ningún archivo", "error")
                 return
             
+            # Consolidar qué variante/PSM ganó en cada archivo (ordena la próxima búsqueda)
+            update_variant_stats(all_results)
+            dpis = dpi_summary(all_results)
+            if dpis:
+                self.log("DPI final por archivo escaneado: " +
+                         ", ".join(f"{dpi} DPI → {n}" for dpi, n in dpis.items()), "info")
+            
             self.log("", "info")
             self.log(f"Fase 1 completada: {len(all_results)} boletas extraídas", "success")
             self.log("", "info")
@@ -475,10 +507,20 @@ class BoletasApp(tk.Tk):
             self.progress_var.set(50)
             self.progress_label.config(text="Post-procesando...")
             
+            t_fase = time.perf_counter()
             completos, para_revision = self.batch_processor.post_process_batch(
                 all_results, 
                 log_callback=self.log
             )
+            fases_s['post_proceso'] = time.perf_counter() - t_fase
+            
+            # Reporte de rendimiento (tiempos por etapa de la fase 1; la revisión manual no cuenta)
+            run_report = build_run_report(all_results, errors, fases_s, pipeline_stats)
+            ruta_reporte = write_run_report(run_report)
+            if ruta_reporte and run_report['etapas']:
+                etapa_max = max(run_report['etapas'].items(), key=lambda kv: kv[1]['total_s'])
+                self.log(f"Rendimiento: {run_report['tiempo_documento_ms'].get('media', 0):.0f} ms/documento, "
+                         f"etapa más costosa: {etapa_max[0]} ({etapa_max[1]['total_s']:.1f} s) → {ruta_reporte.name}", "info")
             
             self.progress_var.set(70)
             self.log("", "info")
@@ -489,6 +531,7 @@ class BoletasApp(tk.Tk):
                 self.log("FASE 3/4: REVISIÓN MANUAL", "info")
                 self.log("=" * 60, "info")
                 self.log(f"Boletas para revisar: {len(para_revision)}", "warning")
+                render_review_previews(para_revision, log_callback=self.log)
                 self.log("", "info")
                 
                 reviewed = self._manual_review_process_incremental(para_revision, completos)
@@ -505,19 +548,24 @@ class BoletasApp(tk.Tk):
             self.log("FASE 4/4: GENERACIÓN DE REPORTES", "info")
             self.log("=" * 60, "info")
             
-            if completos:
-                # Guardar en memoria persistente
-                for registro in completos:
-                    if registro.get('rut'):
-                        self.data_processor.memory.learn(registro)
-                self.data_processor.memory.save()
+            # Incremental: se exportan los registros anteriores + los de esta corrida
+            exportar = previos + completos
+            if exportar:
+                # Guardar en memoria persistente (una sola escritura para todo el lote)
+                with self.data_processor.memory.batch():
+                    for registro in completos:
+                        if registro.get('rut'):
+                            self.data_processor.memory.learn(registro)
                 
                 # Calcular quality_score final
-                for registro in completos:
-                    registro['quality_score'] = self._calculate_final_quality(registro)
+                for registro in exportar:
+                    registro['quality_score'] = calculate_final_quality(registro)
                 
                 # Generar Excel principal
-                self._generate_excel(completos)
+                if self._generate_excel(exportar, run_report) and manifest is not None:
+                    manifest.update(completos)
+                    manifest.save()
+                    self.log(f"Manifiesto actualizado: {len(previos)} registro(s) previos + {len(completos)} nuevo(s)", "info")
                 self.progress_var.set(95)
                 
                 # Reportes individuales (opcional)
@@ -526,11 +574,23 @@ class BoletasApp(tk.Tk):
                     individual_dir = Path(self.out_file.get()).parent / "Reportes_Individuales"
                     try:
                         import pandas as pd
-                        df = pd.DataFrame(completos)
-                        self.report_generator.generate_individual_professional_reports(df, individual_dir)
-                        self.log(f"✓ Reportes individuales en: {individual_dir}", "success")
+                        df = pd.DataFrame(exportar)
+                        
+                        def on_report(rut, archivo, error, completados, total_rep):
+                            self.progress_var.set(95 + 4 * completados / max(total_rep, 1))
+                        
+                        resumen_ind = self.report_generator.generate_individual_professional_reports(
+                            df, individual_dir, progress_callback=on_report
+                        )
+                        self.log(f"✓ {len(resumen_ind['generados'])} reportes individuales en: {individual_dir}", "success")
+                        for fallo in resumen_ind['fallidos']:
+                            self.log(f"⚠ Reporte individual fallido {fallo['rut']} ({fallo['nombre']}): {fallo['error']}", "warning")
                     except Exception as e:
                         self.log(f"⚠ Error generando reportes individuales: {e}", "warning")
+            elif manifest is not None:
+                # Solo hubo archivos eliminados o pendientes: el manifiesto los descarta
+                manifest.update(completos)
+                manifest.save()
             
             # Mostrar resumen
             self._show_summary(completos, para_revision, errors, total)
@@ -642,56 +702,28 @@ class BoletasApp(tk.Tk):
     
     def _calculate_final_quality(self, registro: Dict) -> float:
         """Calcula score de calidad final"""
-        score = 0.0
-        
-        pesos = {
-            'rut': 0.20,
-            'nombre': 0.15,
-            'monto': 0.20,
-            'fecha_documento': 0.10,
-            'convenio': 0.15,
-            'mes_nombre': 0.10,
-            'nro_boleta': 0.05,
-            'glosa': 0.05
-        }
-        
-        for campo, peso in pesos.items():
-            valor = registro.get(campo, '')
-            if valor and valor not in ['SIN_CONVENIO', 'SIN_PERIODO']:
-                score += peso * 0.6
-                conf_campo = registro.get(f'{campo}_confidence', 0.7)
-                score += peso * 0.4 * conf_campo
-        
-        return round(min(score, 1.0), 3)
+        return calculate_final_quality(registro)
     
-    def _generate_excel(self, results):
-        """Genera el archivo Excel con guardado seguro"""
+    def _generate_excel(self, results, run_report: Optional[Dict] = None) -> bool:
+        """Genera el archivo Excel con guardado seguro (True si se escribió)"""
         try:
             output_file = Path(self.out_file.get())
-            output_file.parent.mkdir(parents=True, exist_ok=True)
 
             self.log("Generando Excel principal...", "info")
 
-            # Crear en temporal
-            tmp_file = output_file.with_suffix(".tmp.xlsx")
-            df = self.report_generator.create_excel_with_reports(
+            n_registros, written = write_excel(
+                self.report_generator,
                 results,
-                str(tmp_file),
-                generate_reports=self.var_generate_reports.get()
+                output_file,
+                generate_reports=self.var_generate_reports.get(),
+                run_report=run_report
             )
-
-            # Reemplazo atómico
-            try:
-                os.replace(tmp_file, output_file)
+            if written == output_file:
                 self.log(f"✓ Excel generado: {output_file}", "success")
-            except PermissionError:
-                alt = output_file.with_name(
-                    f"{output_file.stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{output_file.suffix}"
-                )
-                os.replace(tmp_file, alt)
-                self.log(f"⚠ Archivo destino en uso. Guardado como: {alt}", "warning")
+            else:
+                self.log(f"⚠ Archivo destino en uso. Guardado como: {written}", "warning")
 
-            self.log(f"  Total registros: {len(df)}", "info")
+            self.log(f"  Total registros: {n_registros}", "info")
 
             if output_file.exists():
                 if messagebox.askyesno("Completado", "¿Abrir el archivo Excel?"):
@@ -699,16 +731,13 @@ class BoletasApp(tk.Tk):
                         os.startfile(str(output_file))
                     except Exception:
                         pass
+            return True
 
         except Exception as e:
             self.log(f"Error generando Excel: {e}", "error")
             self.log(f"Tipo de error: {type(e).__name__}", "error")
             self.log(f"Traceback: {traceback.format_exc()}", "error")
-            try:
-                if 'tmp_file' in locals() and Path(tmp_file).exists():
-                    Path(tmp_file).unlink(missing_ok=True)
-            except Exception:
-                pass
+            return False
     
     def _show_summary(self, completos, para_revision, errors, total):
         """Muestra resumen final"""
@@ -35,8 +35,8 @@ except ImportError:
 from .report_generator import ReportGenerator
 
 # MEMORIA PERSISTENTE - Instancia global
-from .memory import Memory
-MEMORY = Memory()  # Instancia única para todo el sistema
+from .memory import Memory, SQLiteMemory, open_memory
+MEMORY = open_memory()  # Instancia única para todo el sistema
 
 __version__ = "3.2.0"
 __author__ = "Sistema de Procesamiento de Boletas"
@@ -49,6 +49,8 @@ __all__ = [
     "ReportGenerator",
     # Memoria
     "Memory",
+    "SQLiteMemory",
+    "open_memory",
     "MEMORY",  # Instancia global
     # Utils
     "install_required_libraries",
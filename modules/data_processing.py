@@ -10,17 +10,20 @@ Versión 4.0 FINAL - Sistema con post-procesamiento inteligente:
 import re
 import difflib
 from pathlib import Path
-from typing import Optional, Dict, List, Tuple
-from datetime import datetime
+from typing import Optional, Dict, List, Tuple, Union
+from datetime import datetime, timedelta
 import sys
 import unicodedata
 from collections import defaultdict, Counter
+from functools import cached_property
 
 
 
 sys.path.append(str(Path(__file__).parent.parent))
 from config import *
 from modules.utils import *
+from modules.fuzzy_index import TrigramIndex
+from modules.instrumentation import StageTimer
 
 
 def mark_review_flags(r: dict) -> dict:
@@ -39,13 +42,51 @@ def mark_review_flags(r: dict) -> dict:
     r['review_reason'] = "; ".join(reasons)
     return r
 
+# Procesador persistente por proceso worker (lo construye init_worker una sola vez)
+_WORKER_PROCESSOR = None
+
+
+def ocr_threads_for(n_files: int, max_workers: int = MAX_WORKERS) -> Tuple[int, int]:
+    """
+    Reparto de núcleos para la FASE 1: (procesos, hilos_ocr_por_proceso).
+    Con menos archivos que MAX_WORKERS los núcleos sobrantes se usan dentro de
+    cada documento, repartiendo variantes/PSM entre hilos.
+    """
+    n_files = max(1, n_files)
+    if n_files >= max_workers:
+        return max_workers, 1
+    return n_files, max(1, -(-max_workers // n_files))  # redondeo hacia arriba
+
+
+def init_worker(cache_dir: Optional[str] = None, use_cache: bool = OCR_CACHE_ENABLED,
+                ocr_threads: int = 1):
+    """
+    Initializer de ProcessPoolExecutor: construye UNA vez por proceso el extractor OCR
+    (detección de idiomas de Tesseract), el extractor de campos, la memoria y el caché,
+    y los reutiliza para todos los archivos que procese ese worker.
+    """
+    global _WORKER_PROCESSOR
+    from modules.ocr_cache import OCRCache
+    cache = OCRCache(cache_dir=cache_dir) if use_cache else None
+    _WORKER_PROCESSOR = DataProcessorOptimized(ocr_cache=cache, ocr_threads=ocr_threads)
+
+
+def _get_worker_processor() -> "DataProcessorOptimized":
+    """Procesador del worker actual (se inicializa si el pool no usó init_worker)"""
+    if _WORKER_PROCESSOR is None:
+        init_worker()
+    return _WORKER_PROCESSOR
+
+
 def process_file_worker(file_path_str: str) -> dict:
     """
     Wrapper de nivel módulo para que ProcessPoolExecutor (spawn en Windows)
     pueda ejecutar sin problemas de pickling de métodos ligados.
     """
     from pathlib import Path
-    dp = DataProcessorOptimized()   # instancia local al worker
+    dp = _get_worker_processor()
+    # Cada archivo parte con batch vacío: la búsqueda cruzada real ocurre en el post-proceso
+    dp.reset_batch_memory()
     return dp.process_file(Path(file_path_str))
 
 class BatchMemory:
@@ -55,6 +96,7 @@ class BatchMemory:
         self.registros = []
         self.rut_to_data = {}
         self.nombre_to_data = {}
+        self.nombre_index = TrigramIndex()  # búsqueda difusa sobre nombre_to_data
         self.nombre_variations = {}
         # NUEVO v4.0: Mapeo decreto <-> convenio
         self.decreto_to_convenio = {}
@@ -98,6 +140,7 @@ class BatchMemory:
                     'convenios': [],
                     'decretos': []
                 }
+                self.nombre_index.add(nombre_norm)
             if rut and rut not in self.nombre_to_data[nombre_norm]['ruts']:
                 self.nombre_to_data[nombre_norm]['ruts'].append(rut)
             if convenio and convenio not in self.nombre_to_data[nombre_norm]['convenios']:
@@ -128,7 +171,7 @@ class BatchMemory:
         
         if not strict:
             # Búsqueda por similitud alta (85%)
-            mejores = difflib.get_close_matches(nombre_norm, self.nombre_to_data.keys(), n=1, cutoff=0.85)
+            mejores = self.nombre_index.get_close_matches(nombre_norm, n=1, cutoff=0.85)
             if mejores:
                 ruts = self.nombre_to_data[mejores[0]].get('ruts', [])
                 if ruts:
@@ -196,7 +239,7 @@ class BatchMemory:
                 if convenios_validos:
                     return Counter(convenios_validos).most_common(1)[0][0]
         
-        mejores = difflib.get_close_matches(nombre_norm, self.nombre_to_data.keys(), n=1, cutoff=0.8)
+        mejores = self.nombre_index.get_close_matches(nombre_norm, n=1, cutoff=0.8)
         if mejores:
             convenios = self.nombre_to_data[mejores[0]].get('convenios', [])
             if convenios:
@@ -365,25 +408,320 @@ class BatchMemory:
 
 
 
+# ============================================================================
+# Registro de expresiones compiladas de FieldExtractor
+# Se compilan una sola vez al importar el módulo (cada worker las hereda);
+# los métodos de extracción solo las ejecutan.
+# ============================================================================
+
+_PIPES_RE = re.compile(r'[|]+')
+_HSPACE_RE = re.compile(r'[ \t]+')
+_WS_RE = re.compile(r'\s+')
+_MULTISPACE_RE = re.compile(r'\s{2,}')
+_DIGIT_RE = re.compile(r'\d')
+_DIGITS_RE = re.compile(r'\d+')
+_NON_DIGIT_RE = re.compile(r'[^\d]')
+_MONEY_JUNK_RE = re.compile(r'[^\d,.\s]')
+
+# Nombre / RUT / folio
+_SENOR_RE = re.compile(r'Señor(?:es)?:\s*([^,\n]+)', re.IGNORECASE)
+_FOLIO_NUM_RE = re.compile(r'\b(\d{4,7})\b')
+_NOMBRE_ANCLA_RE = re.compile(
+    r'Razón\s*Social|Nombre|Contribuyente|Emisor|Señor(?:es)?|Prestador', re.IGNORECASE
+)
+_BOLETA_INICIO_RE = re.compile(r'BOLETA\s+DE\s+HONORARIOS', re.IGNORECASE)
+# La primera aparición de cualquiera de los cierres = el menor de sus inicios
+_BOLETA_FIN_RE = re.compile(
+    r'Fecha\s*/\s*Hora\s*Emisión|Verifique\s+este\s+documento|RES\.\s*EX\.', re.IGNORECASE
+)
+_NOMBRE_INICIO_INVALIDO_RE = re.compile(r'^[^a-zA-ZÁÉÍÓÚÑáéíóúñ]+')
+_NOMBRE_FRASES_RECHAZO_RE = re.compile(
+    r'por\s+atenci[oó]n\s+profesional|d\s*/\s*\.+|^\s*d\s+/|^\s*por\s+|^\s*de\s+|^\s*[:/\-\.]+\s*'
+)
+_LETRA_RE = re.compile(r'[a-zA-ZÁÉÍÓÚÑáéíóúñ]')
+_NOMBRE_PALABRAS_RECHAZO = (
+    'municipalidad', 'boleta', 'honorarios', 'rut', 'fecha',
+    'monto', 'total', 'documento', 'folio', 'servicio',
+    'atención', 'atencion', 'profesional', 'pago', 'decreto',
+    'convenio', 'glosa', 'periodo', 'por', 'd /', 'www', 'http'
+)
+_ARCHIVO_SEP_RE = re.compile(r'[_\-\.]+')
+_ARCHIVO_PARENTESIS_RE = re.compile(r'\([^)]*\)')
+_ARCHIVO_TOKEN_RE = re.compile(r'^[A-Za-zÁÉÍÓÚÑáéíóúñ]{2,}$')
+_ARCHIVO_PALABRAS_COMUNES = frozenset({'boleta', 'honorarios', 'aps', 'dir', 'pai', 'doc', 'scan'})
+
+# Fecha del documento
+_FECHA_RUIDO = (
+    'res ex', 'res. ex', 'verifique este documento', 'www.sii.cl',
+    'codigo verificador', 'código verificador', 'timbre', 'barra',
+    'resolución', 'resolucion', 'impresión', 'impresion'
+)
+_FECHA_RUIDO_RE = re.compile('|'.join(re.escape(kw) for kw in _FECHA_RUIDO))
+_FECHA_SIN_ETIQUETA_RUIDO = ('hora', 'timbre', 'res.', 'www', 'sii.cl')
+_FECHA_TEXTO_RE = re.compile(
+    r'(?i)\b(\d{1,2})\s*de\s*(enero|febrero|marzo|abril|mayo|junio|julio|agosto|'
+    r'septiembre|setiembre|octubre|noviembre|diciembre)\s*de\s*(\d{2,4})'
+)
+_FECHA_DMY_RE = re.compile(r'\b(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})\b')
+_FECHA_ETIQUETA_RE = re.compile(r'\bfecha\s*:')
+_FECHA_HORA_RE = re.compile(r'fecha\s*[/\s]*hora|fecha\s+emisi[oó]n')
+_FECHA_EMISION_RE = re.compile(r'fecha\s*[/\s]*hora\s*emisi[oó]n|fecha\s+emisi[oó]n')
+
+# Periodo de servicio (meses tolerantes a espacios intercalados por el OCR)
+_FECHA_PALABRA_RE = re.compile(r'(?i)\bfecha\b')
+_MESES_OCR = {
+    'enero': r'e\s*n\s*e\s*r\s*o', 'febrero': r'f\s*e\s*b\s*r\s*e\s*r\s*o',
+    'marzo': r'm\s*a\s*r\s*z\s*[o0]', 'abril': r'a\s*b\s*r\s*i\s*l',
+    'mayo': r'm\s*a\s*y\s*o', 'junio': r'j\s*u\s*n\s*i\s*o',
+    'julio': r'j\s*u\s*l\s*i\s*o', 'agosto': r'a\s*g\s*o\s*s\s*t\s*o',
+    'septiembre': r's\s*e\s*p\s*t\s*i\s*e\s*m\s*b\s*r\s*e',
+    'octubre': r'o\s*c\s*t\s*u\s*b\s*r\s*e', 'noviembre': r'n\s*o\s*v\s*i\s*e\s*m\s*b\s*r\s*e',
+    'diciembre': r'd\s*i\s*c\s*i\s*e\s*m\s*b\s*r\s*e'
+}
+_MESES_OCR_FULL = {nombre: re.compile(rx, re.IGNORECASE) for nombre, rx in _MESES_OCR.items()}
+_PERIODO_RE = re.compile(
+    r'\b(?:mes\s+)?(' + '|'.join(_MESES_OCR.values()) + r')\s*(?:de\s*)?(?:[-\s]?(\d{2,4}))?',
+    re.IGNORECASE
+)
+_OCR_IGUAL_RE = re.compile(r'[=]+')
+_OCR_PUNTUACION_RE = re.compile(r'[,;:]+')
+_OCR_MARZ0_RE = re.compile(r'(?i)marz0')
+_OCR_SETIEMBRE_RE = re.compile(r'(?i)setiembre')
+
+# Montos
+_TOTAL_HONORARIOS_RE = re.compile(r'Total\s+Honorarios\s*\$?\s*[:\-]?\s*([\d\.\s,]+)', re.IGNORECASE)
+_TOTAL_HONORARIOS_KW_RE = re.compile(r'(?i)total\s+honorarios?\b')
+_MONEY_RE = re.compile(r'\$\s*([\d\.\,\s]+)|\b(\d{1,3}(?:[.,]\d{3}){1,3})\b')
+_MONTO_BRUTO_RES = tuple(re.compile(p) for p in (
+    r'(?i)total\s+honorarios?\s*(?:brutos?)?\s*\$?\s*[:=\-]?\s*([\d\.\s,]+)',
+    r'(?i)honorarios?\s*(?:brutos?)?\s*total\s*\$?\s*[:=\-]?\s*([\d\.\s,]+)',
+    r'(?i)honorarios?\s+brutos?\s*\$?\s*[:=\-]?\s*([\d\.\s,]+)',
+    r'(?i)(?:monto|valor)\s+bruto\s*\$?\s*[:=\-]?\s*([\d\.\s,]+)',
+))
+_MONTO_LIQUIDO_RES = tuple(re.compile(p) for p in (
+    r'(?i)(?:monto\s+)?l[ií]quido(?:\s+(?:pagado|a\s+pagar))?\s*\$?\s*[:=\-]?\s*([\d\.\s,]+)',
+    r'(?i)(?:monto\s+)?neto\s*(?:pagado)?\s*\$?\s*[:=\-]?\s*([\d\.\s,]+)',
+    r'(?i)total\s+a\s+pagar\s*\$?\s*[:=\-]?\s*([\d\.\s,]+)',
+    r'(?i)l[ií]quido\s+a\s+cancelar\s*\$?\s*[:=\-]?\s*([\d\.\s,]+)',
+))
+_MONTO_PESOS_RE = re.compile(r'\$\s*([\d\.\s,]{6,})')
+
+# Convenios: (convenio, confianza, patrones) en orden de prioridad.
+# Con igual confianza gana el primero de la lista
+CONVENIO_PATTERNS = (
+    ('AIDIA', 0.90, (r'\bA\.?I\.?D\.?I\.?A\b', r'\bAIDIA\b', r'\bPRAPS-?AIDIA\b', r'\bAYDIA\b')),
+    ('PASMI', 0.90, (r'\bPASMI\b', r'\bP\.?A\.?S\.?M\.?I\b')),
+    ('MEJOR NIÑEZ', 0.90, (r'\bMEJOR\s+NI[ÑN]EZ\b', r'\bSENAME\b', r'\bSPE\b', r'\bNINEZ/SENAME\b')),
+    ('ACOMPAÑAMIENTO', 0.95, (r'\bACOMP[AÑN]AMIENTO\b', r'PROGRAMA\s+ACOMP', r'PSICOSOCIAL', r'PSICOSICIAL')),
+    ('ESPACIOS_AMIGABLES', 0.90, (r'\bESPACIOS?\s+AMIGABLES?\b', r'\bEEAA\b', r'\bPAI\b')),
+    ('DIR', 0.90, (r'\bPROGRAMA\s+DIR\b', r'\bDIR\s+APS\b', r'\bDIR\b')),
+    # El encabezado "MUNICIPALIDAD" se reemplaza por MUNI_HDR antes de buscar:
+    # solo cuenta "CONVENIO/PROGRAMA MUNICIPAL" explícito
+    ('MUNICIPAL', 0.85, (r'\b(?:CONVENIO|CONV\.?|PROGRAMA)\s+MUNICIPAL\b',)),
+    ('SALUD MENTAL', 0.90, (r'\bSALUD\s+MENTAL\b',)),
+)
+# Una alternancia compilada por convenio, ordenadas por confianza (orden estable:
+# a igual confianza se respeta la lista). Una alternancia única con todos los
+# convenios resultó más lenta: sin prefijo literal, el motor prueba ~20 ramas en
+# cada posición del texto.
+# Cada convenio lleva además una "pista": sus patrones sin el \b inicial. Empiezan
+# con un literal, así que el motor salta directo a las apariciones; solo donde
+# aparece la pista se evalúa el patrón completo (que nunca calza antes)
+def _sin_borde_inicial(pat: str) -> str:
+    return pat[2:] if pat.startswith(r'\b') else pat
+
+
+_CONVENIO_RES = tuple(
+    (conv, conf, re.compile('|'.join(map(_sin_borde_inicial, pats))), re.compile('|'.join(pats)))
+    for conv, conf, pats in sorted(CONVENIO_PATTERNS, key=lambda c: -c[1])
+)
+_MUNICIPALIDAD_RE = re.compile(r'\bMUNICIPALIDAD\b')
+_CONVENIO_DECRETO_RES = (
+    re.compile(r'\bD\s*\.?\s*A\s*\.?\s*(\d{3,5})\b'),
+    re.compile(r'\bDECRETO\s+ALCALDICIO\s*(?:N[ºO]\s*)?(\d{3,5})\b'),
+)
+DECREE_TO_CONV = {
+    "612": "ACOMPAÑAMIENTO",
+    "1928": "ACOMPAÑAMIENTO",
+    "1845": "DIR",
+}
+
+# Horas, decreto, tipo y glosa
+_HORAS_RE = re.compile(r'(\d{1,3})\s*(?:h|hrs?|horas)', re.IGNORECASE)
+_DECRETO_RES = (
+    re.compile(r'\bD[\. ]?A[\. ]?\s*(\d{3,5})\b'),
+    re.compile(r'(?i)\bdecreto(?:\s+alcaldicio)?\s*(?:n[ºo]\s*)?(\d{3,5})\b'),
+    re.compile(r'(?i)\bdcto\.?\s*(\d{3,5})\b'),
+)
+_SEMANAL_RE = re.compile(r'\bsemanal(?:es)?\b')
+_MENSUAL_RE = re.compile(r'\bmensual(?:es)?\b')
+_GLOSA_LINEA_RE = re.compile(r'(?i)(servicio|programa|acomp(a|á)ñamiento|honorario|hrs?|semanales|mensuales)')
+_GLOSA_SEPARADOR_RE = re.compile(r'[\=\|\_]{1,2}')
+_GLOSA_DA_RE = re.compile(r'\bD\s*A\b', re.IGNORECASE)
+
+
+def _fecha_en_ventana(dt: datetime) -> bool:
+    """Descarta fechas futuras (más de 1 mes) o de hace más de 10 años"""
+    ahora = datetime.now()
+    return ahora - timedelta(days=3650) <= dt <= ahora + timedelta(days=31)
+
+
+def _parse_fecha_num(m) -> Optional[datetime]:
+    """Parsea formato numérico DD/MM/YYYY o DD-MM-YYYY"""
+    d = int(m.group(1))
+    mm = int(m.group(2))
+    y = int(m.group(3))
+    y = y + 2000 if y < 100 else y
+
+    # Validar rangos básicos
+    if not (2015 <= y <= 2035):
+        return None
+
+    # Intentar como DD/MM/YYYY (formato chileno común)
+    if 1 <= d <= 31 and 1 <= mm <= 12:
+        try:
+            dt = datetime(y, mm, d)
+            if _fecha_en_ventana(dt):
+                return dt
+        except ValueError:
+            pass
+
+    # Si falla, intentar como MM/DD/YYYY (menos común en Chile)
+    if 1 <= mm <= 31 and 1 <= d <= 12:
+        try:
+            dt = datetime(y, d, mm)  # swap d y mm
+            if _fecha_en_ventana(dt):
+                return dt
+        except ValueError:
+            pass
+
+    return None
+
+
+def _norm_num(s: str) -> str:
+    """Deja solo los dígitos de un monto ('1.234.567' -> '1234567')"""
+    return _MONEY_JUNK_RE.sub('', s).replace(' ', '').replace(',', '').replace('.', '')
+
+
+def _norm_money(s: str) -> Optional[float]:
+    """Normaliza string de monto a float (None si no es plausible)"""
+    try:
+        val = float(_norm_num(s))
+    except ValueError:
+        return None
+    return val if plaus_amount(val) else None
+
+
+def _es_nro_boleta(s: str) -> bool:
+    """Excluir números de boleta/folio (1-4 dígitos)"""
+    return len(_NON_DIGIT_RE.sub('', s)) <= 4
+
 
+def _mayusculas(texto: str) -> str:
+    """Mayúsculas con espacios colapsados; el encabezado MUNICIPALIDAD pasa a MUNI_HDR"""
+    return _MUNICIPALIDAD_RE.sub('MUNI_HDR', _WS_RE.sub(' ', texto.upper()).strip())
+
+
+class OCRDocument:
+    """
+    Texto OCR de un documento pre-tokenizado para FieldExtractor.
+
+    Cada vista (líneas, texto normalizado, mayúsculas, zona de la boleta,
+    anclas de fecha, montos por línea) se calcula una sola vez, la primera vez
+    que un extractor la pide, y la comparten todos los extractores del documento.
+    """
+
+    def __init__(self, text: str):
+        self.text = text or ''
+        self._montos: Dict[int, List[str]] = {}
+
+    @classmethod
+    def of(cls, text: Union[str, 'OCRDocument']) -> 'OCRDocument':
+        return text if isinstance(text, OCRDocument) else cls(text)
+
+    @cached_property
+    def lineas_crudas(self) -> List[str]:
+        return self.text.split('\n')
+
+    @cached_property
+    def sin_barras(self) -> str:
+        return _PIPES_RE.sub(' ', self.text)
+
+    @cached_property
+    def lineas(self) -> List[str]:
+        """Líneas no vacías, sin '|' y sin espacios en los extremos"""
+        return [l.strip() for l in self.sin_barras.split('\n') if l.strip()]
+
+    @cached_property
+    def lineas_compactas(self) -> List[str]:
+        """Como `lineas`, con espacios/tabs repetidos colapsados"""
+        return [l.strip() for l in _HSPACE_RE.sub(' ', self.sin_barras).split('\n') if l.strip()]
+
+    @cached_property
+    def normalizado(self) -> str:
+        """Texto en una línea, sin espacios repetidos ni caracteres no imprimibles"""
+        if not self.text:
+            return ""
+        text = _WS_RE.sub(' ', self.text)
+        text = text.replace('..', '.').replace(',,', ',')
+        if not text.isprintable():
+            text = ''.join(c for c in text if c.isprintable() or c in '\n\t')
+        return text.strip()
+
+    @cached_property
+    def mayusculas(self) -> str:
+        return _mayusculas(self.text)
+
+    @cached_property
+    def zona_boleta(self) -> str:
+        """Desde 'BOLETA DE HONORARIOS' hasta el pie (emisión / verificación / resolución)"""
+        start = _BOLETA_INICIO_RE.search(self.text)
+        if not start:
+            return self.text
+        end = _BOLETA_FIN_RE.search(self.text, start.start())
+        return self.text[start.start():end.start() if end else None]
+
+    @cached_property
+    def encabezado_fecha(self) -> List[Tuple[int, str, str]]:
+        """(índice, línea, línea en minúsculas) de las 25 primeras líneas, sin timbre/verificación"""
+        lineas = self.lineas_compactas[:25]
+        bloque = '\n'.join(lineas).lower()
+        # Una búsqueda sobre el bloque marca las líneas con palabras de ruido
+        ruido = {bloque.count('\n', 0, m.start()) for m in _FECHA_RUIDO_RE.finditer(bloque)}
+        return [(i, line, ll) for i, (line, ll) in enumerate(zip(lineas, bloque.split('\n')))
+                if i not in ruido]
+
+    def montos_en_linea(self, i: int) -> List[str]:
+        """Montos ('$ 1.234' o '1.234.567') de la línea i de `lineas` ('S$' se lee como '$')"""
+        if i not in self._montos:
+            linea = self.lineas[i].replace('S$', '$')
+            self._montos[i] = [m.group(1) or m.group(2) for m in _MONEY_RE.finditer(linea)]
+        return self._montos[i]
+
+    @cached_property
+    def lineas_total_honorarios(self) -> List[int]:
+        """Índices de las líneas con la etiqueta 'Total Honorarios'"""
+        return [i for i, l in enumerate(self.lineas) if _TOTAL_HONORARIOS_KW_RE.search(l)]
 
 
 class FieldExtractor:
     """Extractor de campos con inteligencia mejorada"""
-    
+
     def __init__(self):
         self.meses = MESES
         self.convenios_conocidos = KNOWN_CONVENIOS
-    
-    def extract_from_glosa(self, glosa: str, campo: str) -> Tuple[str, float]:
+        self._meses_lower = {k.lower(): v for k, v in self.meses.items()}
+
+    def extract_from_glosa(self, glosa: Union[str, OCRDocument], campo: str) -> Tuple[str, float]:
         """Extrae un campo específico desde la glosa si no se encontró en el texto principal"""
-        if not glosa:
+        glosa = OCRDocument.of(glosa)
+        if not glosa.text:
             return "", 0.0
-        
+
         if campo == 'fecha':
             return self.extract_fecha(glosa)
         elif campo == 'convenio':
-            return self.extract_convenio(glosa, glosa)
+            return self.extract_convenio(glosa, glosa.text)
         elif campo == 'periodo':
             return self.extract_periodo_servicio(glosa, "")
         elif campo == 'decreto':
@@ -394,186 +732,108 @@ class FieldExtractor:
         elif campo == 'rut':
             return self.extract_rut(glosa)
         elif campo == 'nombre':
-            match = re.search(r'Señor(?:es)?:\s*([^,\n]+)', glosa, re.IGNORECASE)
+            match = _SENOR_RE.search(glosa.text)
             if match:
                 nombre_candidato = match.group(1).strip()
                 if self._is_valid_name(nombre_candidato):
                     return nombre_candidato, 0.65
-        
+
         return "", 0.0
-    
-    def extract_rut(self, text: str) -> Tuple[str, float]:
+
+    def extract_rut(self, text: Union[str, OCRDocument]) -> Tuple[str, float]:
         """Extrae RUT con validación"""
+        text = OCRDocument.of(text).text
         for match in RUT_ANCHOR_RE.finditer(text):
             rut = match.group(1)
             if dv_ok(rut):
                 return rut.strip(), 0.95
-        
+
         for match in RUT_RE.finditer(text):
             rut = match.group(1)
             if dv_ok(rut):
                 return rut.strip(), 0.85
-        
+
         return "", 0.0
-    
-    def extract_folio(self, text: str) -> Tuple[str, float]:
+
+    def extract_folio(self, text: Union[str, OCRDocument]) -> Tuple[str, float]:
         """Extrae número de folio"""
-        match = FOLIO_RE.search(text)
+        doc = OCRDocument.of(text)
+        match = FOLIO_RE.search(doc.text)
         if match:
             return match.group(1).strip(), 0.90
-        
-        lines = text.split('\n')[:15]
-        for line in lines:
-            nums = re.findall(r'\b(\d{4,7})\b', line)
+
+        for line in doc.lineas_crudas[:15]:
+            nums = _FOLIO_NUM_RE.findall(line)
             for num in nums:
                 if 1000 <= int(num) <= 9999999:
                     return num, 0.60
-        
-        return "", 0.0
-    
-    def extract_fecha(self, text: str) -> Tuple[str, float]:
-        """Extrae SOLO fecha del encabezado, nunca de impresión"""
-        t = re.sub(r'[|]+', ' ', text)
-        t = re.sub(r'[ \t]+', ' ', t)
-        lines = [l.strip() for l in t.split('\n') if l.strip()]
-
-        ruido_keywords = (
-            'res ex', 'res. ex', 'verifique este documento', 'www.sii.cl',
-            'codigo verificador', 'código verificador', 'timbre', 'barra',
-            'resolución', 'resolucion', 'impresión', 'impresion'
-        )
 
-        rex_texto = re.compile(
-            r'(?i)\b(\d{1,2})\s*de\s*(enero|febrero|marzo|abril|mayo|junio|julio|agosto|'
-            r'septiembre|setiembre|octubre|noviembre|diciembre)\s*de\s*(\d{2,4})'
-        )
-        rex_num = re.compile(r'\b(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})\b')
+        return "", 0.0
 
-        def parse_texto(m):
-            """Parsea formato texto: '15 de marzo de 2025'"""
-            d = int(m.group(1))
-            mes = m.group(2).lower().replace('setiembre', 'septiembre')
-            y = int(m.group(3))
-            y = y + 2000 if y < 100 else y
-            mm = self.meses.get(mes, 0)
+    def _parse_fecha_texto(self, m) -> Optional[datetime]:
+        """Parsea formato texto: '15 de marzo de 2025'"""
+        d = int(m.group(1))
+        mes = m.group(2).lower().replace('setiembre', 'septiembre')
+        y = int(m.group(3))
+        y = y + 2000 if y < 100 else y
+        mm = self.meses.get(mes, 0)
 
-            if 1 <= d <= 31 and 1 <= mm <= 12 and 2015 <= y <= 2035:
-                try:
-                    dt = datetime(y, mm, d)
-                    # Validar que no sea fecha futura o muy antigua
-                    from datetime import timedelta
-                    max_future = datetime.now() + timedelta(days=31)
-                    min_past = datetime.now() - timedelta(days=3650)  # 10 años
-                    if min_past <= dt <= max_future:
-                        return dt
-                except:
-                    return None
-            return None
-
-        def parse_num(m):
-            """Parsea formato numérico DD/MM/YYYY o DD-MM-YYYY"""
-            d = int(m.group(1))
-            mm = int(m.group(2))
-            y = int(m.group(3))
-            y = y + 2000 if y < 100 else y
-
-            # Validar rangos básicos
-            if not (2015 <= y <= 2035):
+        if 1 <= d <= 31 and 1 <= mm <= 12 and 2015 <= y <= 2035:
+            try:
+                dt = datetime(y, mm, d)
+            except ValueError:
                 return None
+            if _fecha_en_ventana(dt):
+                return dt
+        return None
 
-            # Intentar como DD/MM/YYYY (formato chileno común)
-            if 1 <= d <= 31 and 1 <= mm <= 12:
-                try:
-                    dt = datetime(y, mm, d)
-                    # Validar que no sea fecha futura (permitir hasta 1 mes adelante)
-                    from datetime import timedelta
-                    max_future = datetime.now() + timedelta(days=31)
-                    min_past = datetime.now() - timedelta(days=3650)  # 10 años
-                    if min_past <= dt <= max_future:
-                        return dt
-                except:
-                    pass
-
-            # Si falla, intentar como MM/DD/YYYY (menos común en Chile)
-            if 1 <= mm <= 31 and 1 <= d <= 12:
-                try:
-                    dt = datetime(y, d, mm)  # swap d y mm
-                    from datetime import timedelta
-                    max_future = datetime.now() + timedelta(days=31)
-                    min_past = datetime.now() - timedelta(days=3650)
-                    if min_past <= dt <= max_future:
-                        return dt
-                except:
-                    pass
-
-            return None
+    def _fecha_en_linea(self, line: str) -> Optional[datetime]:
+        """Primera fecha válida de la línea: formato texto y luego numérico"""
+        m1 = _FECHA_TEXTO_RE.search(line)
+        if m1:
+            dt = self._parse_fecha_texto(m1)
+            if dt:
+                return dt
+        m2 = _FECHA_DMY_RE.search(line)
+        if m2:
+            return _parse_fecha_num(m2)
+        return None
+
+    def extract_fecha(self, text: Union[str, OCRDocument]) -> Tuple[str, float]:
+        """Extrae SOLO fecha del encabezado, nunca de impresión"""
+        encabezado = OCRDocument.of(text).encabezado_fecha
 
         candidatos = []
 
-        for i, line in enumerate(lines[:25]):
-            ll = line.lower()
-            if any(kw in ll for kw in ruido_keywords):
-                continue
-            if re.search(r'\bfecha\s*:', ll):
-                if not re.search(r'fecha\s*[/\s]*hora|fecha\s+emisi[oó]n', ll):
-                    m1 = rex_texto.search(line)
-                    if m1:
-                        dt = parse_texto(m1)
-                        if dt:
-                            candidatos.append((100, dt, i))
-                            continue
-                    m2 = rex_num.search(line)
-                    if m2:
-                        dt = parse_num(m2)
-                        if dt:
-                            candidatos.append((100, dt, i))
-                            continue
+        for i, line, ll in encabezado:
+            if _FECHA_ETIQUETA_RE.search(ll) and not _FECHA_HORA_RE.search(ll):
+                dt = self._fecha_en_linea(line)
+                if dt:
+                    candidatos.append((100, dt, i))
 
         if not candidatos:
-            for i, line in enumerate(lines[:25]):
-                ll = line.lower()
-                if any(kw in ll for kw in ruido_keywords):
-                    continue
-                if re.search(r'fecha\s*[/\s]*hora\s*emisi[oó]n|fecha\s+emisi[oó]n', ll):
-                    m1 = rex_texto.search(line)
-                    if m1:
-                        dt = parse_texto(m1)
-                        if dt:
-                            candidatos.append((50, dt, i))
-                            continue
-                    m2 = rex_num.search(line)
-                    if m2:
-                        dt = parse_num(m2)
-                        if dt:
-                            candidatos.append((50, dt, i))
-                            continue
+            for i, line, ll in encabezado:
+                if _FECHA_EMISION_RE.search(ll):
+                    dt = self._fecha_en_linea(line)
+                    if dt:
+                        candidatos.append((50, dt, i))
 
         if not candidatos:
-            for i, line in enumerate(lines[:15]):
-                ll = line.lower()
-                if any(kw in ll for kw in ruido_keywords):
-                    continue
-                if any(x in ll for x in ['hora', 'timbre', 'res.', 'www', 'sii.cl']):
+            for i, line, ll in encabezado:
+                if i >= 15:
+                    break
+                if any(x in ll for x in _FECHA_SIN_ETIQUETA_RUIDO):
                     continue
-                m1 = rex_texto.search(line)
-                if m1:
-                    dt = parse_texto(m1)
-                    if dt:
-                        candidatos.append((10, dt, i))
-                        continue
-                m2 = rex_num.search(line)
-                if m2:
-                    dt = parse_num(m2)
-                    if dt:
-                        candidatos.append((10, dt, i))
-                        continue
+                dt = self._fecha_en_linea(line)
+                if dt:
+                    candidatos.append((10, dt, i))
 
         if not candidatos:
             return "", 0.0
 
         candidatos.sort(key=lambda x: (x[0], x[1]), reverse=True)
         best_score, best_dt, _ = candidatos[0]
-        
+
         if best_score >= 100:
             conf = 0.98
         elif best_score >= 50:
@@ -582,53 +842,39 @@ class FieldExtractor:
             conf = 0.75
 
         return best_dt.strftime("%Y-%m-%d"), conf
-    
-    def extract_periodo_servicio(self, text: str, fecha_doc_iso: str = "") -> Tuple[str, float]:
+
+    def extract_periodo_servicio(self, text: Union[str, OCRDocument], fecha_doc_iso: str = "") -> Tuple[str, float]:
         """
         Respaldo: intenta detectar mes/año SOLO alrededor de la línea 'Fecha'.
         Si no encuentra, cae al comportamiento previo.
         """
         # 1) recorta a 20-30 primeras líneas y busca la línea que contiene 'Fecha'
-        t = re.sub(r'[|]+', ' ', text)
-        lines = [l.strip() for l in t.split('\n') if l.strip()]
-        header_zone = '\n'.join(lines[:30])
+        lines = OCRDocument.of(text).lineas
 
         # intenta hallar la línea 'Fecha' para acotar el scope
         mline = None
         for ln in lines[:30]:
-            if re.search(r'(?i)\bfecha\b', ln):
+            if _FECHA_PALABRA_RE.search(ln):
                 mline = ln
                 break
-        scope = mline if mline else header_zone
+        scope = mline if mline else '\n'.join(lines[:30])
 
         # ---- desde aquí, el mismo parsing que ya usas, pero aplicado a 'scope' ----
         base = self._norm_ocr_es(scope)
-        meses_map = {k.lower(): v for k, v in self.meses.items()}
-        meses_regex = {
-            'enero': r'e\s*n\s*e\s*r\s*o', 'febrero': r'f\s*e\s*b\s*r\s*e\s*r\s*o',
-            'marzo': r'm\s*a\s*r\s*z\s*[o0]', 'abril': r'a\s*b\s*r\s*i\s*l',
-            'mayo': r'm\s*a\s*y\s*o', 'junio': r'j\s*u\s*n\s*i\s*o',
-            'julio': r'j\s*u\s*l\s*i\s*o', 'agosto': r'a\s*g\s*o\s*s\s*t\s*o',
-            'septiembre': r's\s*e\s*p\s*t\s*i\s*e\s*m\s*b\s*r\s*e',
-            'octubre': r'o\s*c\s*t\s*u\s*b\s*r\s*e','noviembre': r'n\s*o\s*v\s*i\s*e\s*m\s*b\s*r\s*e',
-            'diciembre': r'd\s*i\s*c\s*i\s*e\s*m\s*b\s*r\s*e'
-        }
-        mes_union = '|'.join(meses_regex[m] for m in meses_regex)
-        patron = rf'(?i)\b(?:mes\s+)?({mes_union})\s*(?:de\s*)?(?:[-\s]?(\d{{2,4}}))?'
-
-        m = re.search(patron, base, flags=re.I)
+        m = _PERIODO_RE.search(base)
         if not m:
             return "", 0.0
 
         mes_canonico = None
-        for nombre, rx in meses_regex.items():
-            if re.fullmatch(rf'(?i){rx}', m.group(1).strip(), flags=re.I):
+        token = m.group(1).strip()
+        for nombre, rx in _MESES_OCR_FULL.items():
+            if rx.fullmatch(token):
                 mes_canonico = nombre
                 break
         if not mes_canonico:
             return "", 0.0
 
-        mes_num = meses_map.get(mes_canonico, 0)
+        mes_num = self._meses_lower.get(mes_canonico, 0)
         if not mes_num:
             return "", 0.0
 
@@ -650,10 +896,11 @@ class FieldExtractor:
                 pass
 
         return f"XXXX-{mes_num:02d}", 0.60
-    
-    def extract_monto(self, text: str) -> Tuple[str, float]:
+
+    def extract_monto(self, text: Union[str, OCRDocument]) -> Tuple[str, float]:
         """Extrae MONTO BRUTO priorizando 'Total Honorarios $'"""
-        m1 = re.search(r'Total\s+Honorarios\s*\$?\s*[:\-]?\s*([\d\.\s,]+)', text, re.IGNORECASE)
+        doc = OCRDocument.of(text)
+        m1 = _TOTAL_HONORARIOS_RE.search(doc.text)
         if m1:
             normalized = normaliza_monto(m1.group(1))
             if normalized:
@@ -664,61 +911,32 @@ class FieldExtractor:
                 except ValueError:
                     pass
 
-        t = text.replace('S$', '$').replace(' $', ' $')
-        t = re.sub(r'[|]+', ' ', t)
-        lines = [l.strip() for l in t.split('\n') if l.strip()]
-
-        def norm_num(s: str) -> str:
-            s = re.sub(r'[^\d,.\s]', '', s)
-            s = s.replace(' ', '')
-            if s.count('.') + s.count(',') > 1:
-                s = s.replace(',', '').replace('.', '')
-            else:
-                s = s.replace(',', '').replace('.', '')
-            return s
-
-        # Usar la función global plaus_amount en lugar de una local más restrictiva
-        def plausible(v: float) -> bool:
-            return plaus_amount(v)
+        n_lineas = len(doc.lineas)
 
-        kw_re = re.compile(r'(?i)total\s+honorarios?\b')
-        money_re = re.compile(r'\$\s*([\d\.\,\s]+)|\b(\d{1,3}(?:[.,]\d{3}){1,3})\b')
+        def montos(i: int, conf: float) -> List[Tuple[float, float]]:
+            encontrados = []
+            for raw in doc.montos_en_linea(i):
+                val_s = _norm_num(raw)
+                if not val_s:
+                    continue
+                try:
+                    val = float(val_s)
+                except ValueError:
+                    continue
+                if plaus_amount(val):
+                    encontrados.append((conf, val))
+            return encontrados
 
         candidatos: List[Tuple[float, float]] = []
 
-        for i, line in enumerate(lines):
-            if kw_re.search(line):
-                nums = [m.group(1) or m.group(2) for m in money_re.finditer(line)]
-                if i + 1 < len(lines):
-                    nums += [m.group(1) or m.group(2) for m in money_re.finditer(lines[i + 1])]
-                for raw in nums:
-                    if not raw:
-                        continue
-                    val_s = norm_num(raw)
-                    if not val_s:
-                        continue
-                    try:
-                        val = float(val_s)
-                        if plausible(val):
-                            candidatos.append((0.95, val))
-                    except Exception:
-                        pass
+        for i in doc.lineas_total_honorarios:
+            candidatos += montos(i, 0.95)
+            if i + 1 < n_lineas:
+                candidatos += montos(i + 1, 0.95)
 
         if not candidatos:
-            for line in lines:
-                for m in money_re.finditer(line):
-                    raw = m.group(1) or m.group(2)
-                    if not raw:
-                        continue
-                    val_s = norm_num(raw)
-                    if not val_s:
-                        continue
-                    try:
-                        val = float(val_s)
-                        if plausible(val):
-                            candidatos.append((0.75, val))
-                    except Exception:
-                        pass
+            for i in range(n_lineas):
+                candidatos += montos(i, 0.75)
 
         if not candidatos:
             return "", 0.0
@@ -726,8 +944,8 @@ class FieldExtractor:
         candidatos.sort(key=lambda x: (x[0], x[1]))
         conf, best = candidatos[-1]
         return str(int(best)), conf
-    
-    def extract_montos_prefer_bruto(self, text: str):
+
+    def extract_montos_prefer_bruto(self, text: Union[str, OCRDocument]):
         """
         Devuelve (monto_bruto, monto_liquido, conf, origen)
         - Búsqueda MEJORADA con detección de todos los montos posibles
@@ -735,45 +953,8 @@ class FieldExtractor:
         - Validación de coherencia: líquido < bruto con diferencia razonable
         - Prioriza etiquetas explícitas sobre posición
         """
-        t = re.sub(r'[|]+', ' ', text or '')
-
-        # Patrones MÁS ROBUSTOS con múltiples variantes
-        bruto_patterns = [
-            r'(?i)total\s+honorarios?\s*(?:brutos?)?\s*\$?\s*[:=\-]?\s*([\d\.\s,]+)',
-            r'(?i)honorarios?\s*(?:brutos?)?\s*total\s*\$?\s*[:=\-]?\s*([\d\.\s,]+)',
-            r'(?i)honorarios?\s+brutos?\s*\$?\s*[:=\-]?\s*([\d\.\s,]+)',
-            r'(?i)(?:monto|valor)\s+bruto\s*\$?\s*[:=\-]?\s*([\d\.\s,]+)',
-        ]
-
-        liq_patterns = [
-            r'(?i)(?:monto\s+)?l[ií]quido(?:\s+(?:pagado|a\s+pagar))?\s*\$?\s*[:=\-]?\s*([\d\.\s,]+)',
-            r'(?i)(?:monto\s+)?neto\s*(?:pagado)?\s*\$?\s*[:=\-]?\s*([\d\.\s,]+)',
-            r'(?i)total\s+a\s+pagar\s*\$?\s*[:=\-]?\s*([\d\.\s,]+)',
-            r'(?i)l[ií]quido\s+a\s+cancelar\s*\$?\s*[:=\-]?\s*([\d\.\s,]+)',
-        ]
-
-        # Patrón adicional para buscar TODOS los montos en formato $
-        all_amounts_pattern = r'\$\s*([\d\.\s,]{6,})'
-
-        def is_likely_boleta_num(s: str) -> bool:
-            """Excluir números de boleta/folio (1-4 dígitos)"""
-            clean = re.sub(r'[^\d]', '', s)
-            return len(clean) <= 4
-
-        def norm_money(s):
-            """Normaliza string de monto a float"""
-            s = re.sub(r'[^\d,.\s]', '', s).replace(' ', '')
-            if s.count('.') + s.count(',') > 1:
-                s = s.replace('.', '').replace(',', '')
-            else:
-                s = s.replace('.', '').replace(',', '')
-            try:
-                val = float(s)
-                if plaus_amount(val):
-                    return val
-                return None
-            except:
-                return None
+        doc = OCRDocument.of(text)
+        t = doc.sin_barras
 
         # Buscar TODOS los candidatos con sus prioridades
         bruto_candidates = []
@@ -781,38 +962,38 @@ class FieldExtractor:
         all_amounts = []
 
         # Buscar bruto con diferentes patrones (orden = prioridad)
-        for priority, pattern in enumerate(bruto_patterns):
-            for m in re.finditer(pattern, t):
+        for priority, pattern in enumerate(_MONTO_BRUTO_RES):
+            for m in pattern.finditer(t):
                 raw = m.group(1)
-                if is_likely_boleta_num(raw):
+                if _es_nro_boleta(raw):
                     continue
-                v = norm_money(raw)
+                v = _norm_money(raw)
                 if v and v >= 10000:
                     # Score: prioridad del patrón + boost si tiene "total"
-                    score = (len(bruto_patterns) - priority) * 10
+                    score = (len(_MONTO_BRUTO_RES) - priority) * 10
                     if 'total' in m.group(0).lower():
                         score += 20
                     bruto_candidates.append((score, v, m.group(0), 'explicito_honorarios'))
 
         # Buscar líquido
-        for priority, pattern in enumerate(liq_patterns):
-            for m in re.finditer(pattern, t):
+        for priority, pattern in enumerate(_MONTO_LIQUIDO_RES):
+            for m in pattern.finditer(t):
                 raw = m.group(1)
-                if is_likely_boleta_num(raw):
+                if _es_nro_boleta(raw):
                     continue
-                v = norm_money(raw)
+                v = _norm_money(raw)
                 if v and v >= 10000:
-                    score = (len(liq_patterns) - priority) * 10
+                    score = (len(_MONTO_LIQUIDO_RES) - priority) * 10
                     if 'líquido' in m.group(0).lower() or 'liquido' in m.group(0).lower():
                         score += 15
                     liq_candidates.append((score, v, m.group(0), 'explicito_liquido'))
 
         # Buscar TODOS los montos para análisis posterior
-        for m in re.finditer(all_amounts_pattern, t):
+        for m in _MONTO_PESOS_RE.finditer(t):
             raw = m.group(1)
-            if is_likely_boleta_num(raw):
+            if _es_nro_boleta(raw):
                 continue
-            v = norm_money(raw)
+            v = _norm_money(raw)
             if v and v >= 10000:
                 all_amounts.append(v)
 
@@ -830,7 +1011,7 @@ class FieldExtractor:
         # Fallback: si no encontramos nada, usar extractor legacy
         conf = 0.0
         if bruto is None and liq is None:
-            monto_legacy, conf_legacy = self.extract_monto(text)
+            monto_legacy, conf_legacy = self.extract_monto(doc)
             if monto_legacy:
                 bruto = float(monto_legacy)
                 origen_b = 'ocr_legacy'
@@ -887,214 +1068,129 @@ class FieldExtractor:
         # Sin datos
         return None, None, 0.0, ''
 
-    
-    
-    def extract_nombre(self, text: str, file_path: Optional[Path] = None) -> Tuple[str, float]:
+
+
+    def extract_nombre(self, text: Union[str, OCRDocument], file_path: Optional[Path] = None) -> Tuple[str, float]:
         """Extrae nombre con múltiples estrategias"""
         zona = self._recortar_boleta(text)
-        
-        nombre_anclas = [
-            r'Razón\s*Social',
-            r'Nombre',
-            r'Contribuyente',
-            r'Emisor',
-            r'Señor(?:es)?',
-            r'Prestador',
-        ]
-        
+
+        # Anclas: Razón Social, Nombre, Contribuyente, Emisor, Señor(es), Prestador
         lines = zona.split('\n')
         for i, line in enumerate(lines):
-            for ancla in nombre_anclas:
-                if re.search(ancla, line, re.IGNORECASE):
-                    if ':' in line:
-                        candidate = line.split(':', 1)[1].strip()
-                        if self._is_valid_name(candidate):
-                            return candidate[:120], 0.85
-                    
-                    for j in range(i + 1, min(i + 3, len(lines))):
-                        candidate = lines[j].strip(' :')
-                        if self._is_valid_name(candidate):
-                            return candidate[:120], 0.80
-        
+            if _NOMBRE_ANCLA_RE.search(line):
+                if ':' in line:
+                    candidate = line.split(':', 1)[1].strip()
+                    if self._is_valid_name(candidate):
+                        return candidate[:120], 0.85
+
+                for j in range(i + 1, min(i + 3, len(lines))):
+                    candidate = lines[j].strip(' :')
+                    if self._is_valid_name(candidate):
+                        return candidate[:120], 0.80
+
         rut_match = RUT_RE.search(zona)
         if rut_match:
             texto_antes_rut = zona[:rut_match.start()]
             lines_antes = texto_antes_rut.split('\n')
-            
+
             for line in lines_antes[-3:]:
                 line = line.strip(' :')
                 if self._is_valid_name(line) and len(line) > 10:
                     return line, 0.75
-        
+
         if file_path:
             nombre_archivo = self._extract_name_from_filename(file_path)
             if nombre_archivo:
                 return nombre_archivo, 0.60
-        
-        return "", 0.0
-    
-    def extract_convenio(self, text: str, glosa: str = "") -> Tuple[str, float]:
-        """Extrae convenio evitando falsos positivos"""
-        base = f"{glosa or ''}\n{text or ''}"
-        t = re.sub(r'\s+', ' ', (base or '').upper()).strip()
-        t = re.sub(r'\bMUNICIPALIDAD\b', 'MUNI_HDR', t)
-
-        CONVENIO_PATTERNS = {
-            'AIDIA': [
-                r'\bA\.?I\.?D\.?I\.?A\b', r'\bAIDIA\b', r'\bPRAPS-?AIDIA\b', r'\bAYDIA\b'
-            ],
-            'PASMI': [
-                r'\bPASMI\b', r'\bP\.?A\.?S\.?M\.?I\b'
-            ],
-            'MEJOR NIÑEZ': [
-                r'\bMEJOR\s+NI[ÑN]EZ\b', r'\bSENAME\b', r'\bSPE\b', r'\bNINEZ/SENAME\b'
-            ],
-            'ACOMPAÑAMIENTO': [
-                r'\bACOMP[AÑN]AMIENTO\b',
-                r'PROGRAMA\s+ACOMP',
-                r'PSICOSOCIAL',
-                r'PSICOSICIAL'
-            ],
-            'ESPACIOS_AMIGABLES': [
-                r'\bESPACIOS?\s+AMIGABLES?\b', r'\bEEAA\b', r'\bPAI\b'
-            ],
-            'DIR': [
-                r'\bPROGRAMA\s+DIR\b',
-                r'\bDIR\s+APS\b',
-                r'(?:(?<=\W)|^)\bDIR\b(?:(?=\W)|$)'
-            ],
-            'MUNICIPAL': [
-                r'\b(CONVENIO|CONV\.?|PROGRAMA)\s+MUNICIPAL\b'
-            ],
-            'SALUD MENTAL': [
-                r'\bSALUD\s+MENTAL\b'
-            ],
-        }
 
-        hits = []
-        for conv, pats in CONVENIO_PATTERNS.items():
-            for pat in pats:
-                if re.search(pat, t):
-                    if conv == 'MUNICIPAL':
-                        if 'MUNI_HDR' in t and not re.search(r'\b(CONVENIO|CONV\.?|PROGRAMA)\s+MUNICIPAL\b', t):
-                            continue
-                        conf = 0.85
-                    elif conv == 'ACOMPAÑAMIENTO':
-                        conf = 0.95
-                    else:
-                        conf = 0.90
-                    hits.append((conv, conf))
-                    break
-
-        if hits:
-            hits.sort(key=lambda x: x[1], reverse=True)
-            return hits[0]
+        return "", 0.0
 
-        m_dec = re.search(r'\bD\s*\.?\s*A\s*\.?\s*(\d{3,5})\b', t) or \
-                re.search(r'\bDECRETO\s+ALCALDICIO\s*(?:N[ºO]\s*)?(\d{3,5})\b', t)
+    def extract_convenio(self, text: Union[str, OCRDocument], glosa: str = "") -> Tuple[str, float]:
+        """Extrae convenio evitando falsos positivos"""
+        # Glosa + texto en mayúsculas; la parte del texto viene precalculada
+        t = OCRDocument.of(text).mayusculas
+        glosa = _mayusculas(glosa) if glosa else ''
+        if glosa:
+            t = f"{glosa} {t}" if t else glosa
+
+        # El primer convenio presente (por confianza y orden de la lista) gana
+        for conv, conf, pista, rx in _CONVENIO_RES:
+            m = pista.search(t)
+            if m and rx.search(t, m.start()):
+                return conv, conf
+
+        m_dec = _CONVENIO_DECRETO_RES[0].search(t) or _CONVENIO_DECRETO_RES[1].search(t)
         if m_dec:
-            DECREE_TO_CONV = {
-                "612": "ACOMPAÑAMIENTO",
-                "1928": "ACOMPAÑAMIENTO",
-                "1845": "DIR",
-            }
             conv = DECREE_TO_CONV.get(m_dec.group(1))
             if conv:
                 return conv, 0.70
 
         return "", 0.0
-    
+
     def _norm_ocr_es(self, s: str) -> str:
         """Normaliza errores OCR típicos"""
         t = s
         t = t.replace('\u00AD', '')
-        t = re.sub(r'[=]+', ' ', t, flags=re.I)
-        t = re.sub(r'[,;:]+', ' ', t)
-        t = re.sub(r'\s+', ' ', t)
-        t = re.sub(r'(?i)marz0', 'marzo', t)
-        t = re.sub(r'(?i)setiembre', 'septiembre', t)
+        t = _OCR_IGUAL_RE.sub(' ', t)
+        t = _OCR_PUNTUACION_RE.sub(' ', t)
+        t = _WS_RE.sub(' ', t)
+        t = _OCR_MARZ0_RE.sub('marzo', t)
+        t = _OCR_SETIEMBRE_RE.sub('septiembre', t)
         return t.strip()
-    
-    def extract_horas(self, text: str, glosa: str = "") -> str:
+
+    def extract_horas(self, text: Union[str, OCRDocument], glosa: str = "") -> str:
         """Extrae horas trabajadas"""
-        texto_completo = text + " " + glosa
-        match = re.search(r'(\d{1,3})\s*(?:h|hrs?|horas)', texto_completo, re.IGNORECASE)
+        texto_completo = OCRDocument.of(text).text + " " + glosa
+        match = _HORAS_RE.search(texto_completo)
         if match:
             horas = int(match.group(1))
             if 4 <= horas <= 200:
                 return match.group(1)
         return ""
-    
-    def extract_decreto(self, text: str) -> str:
+
+    def extract_decreto(self, text: Union[str, OCRDocument]) -> str:
         """Extrae decreto alcaldicio"""
-        t = self._normalize(text)
-        patrones = [
-            r'\bD[\. ]?A[\. ]?\s*(\d{3,5})\b',
-            r'(?i)\bdecreto(?:\s+alcaldicio)?\s*(?:n[ºo]\s*)?(\d{3,5})\b',
-            r'(?i)\bdcto\.?\s*(\d{3,5})\b',
-        ]
-        for p in patrones:
-            m = re.search(p, t)
+        t = OCRDocument.of(text).normalizado
+        for p in _DECRETO_RES:
+            m = p.search(t)
             if m:
                 return m.group(1)
         return ''
 
-    def extract_tipo(self, text: str, glosa: str = "") -> str:
+    def extract_tipo(self, text: Union[str, OCRDocument], glosa: str = "") -> str:
         """Extrae tipo de pago"""
-        texto = (text + " " + glosa).lower()
-        if re.search(r'\bsemanal(?:es)?\b', texto):
+        texto = (OCRDocument.of(text).text + " " + glosa).lower()
+        if _SEMANAL_RE.search(texto):
             return "semanales"
-        if re.search(r'\bmensual(?:es)?\b', texto):
+        if _MENSUAL_RE.search(texto):
             return "mensuales"
         return "semanales"
 
-    def extract_glosa(self, text: str) -> str:
+    def extract_glosa(self, text: Union[str, OCRDocument]) -> str:
         """Extrae glosa descriptiva"""
-        t = self._normalize(text)
-        candidatos = []
-        for line in t.splitlines():
-            if re.search(r'(?i)(servicio|programa|acomp(a|á)ñamiento|honorario|hrs?|semanales|mensuales)', line):
-                candidatos.append(line)
+        t = OCRDocument.of(text).normalizado
+        candidatos = [line for line in t.splitlines() if _GLOSA_LINEA_RE.search(line)]
 
         glosa = ' | '.join(candidatos)[:300] if candidatos else t[:300]
-        glosa = re.sub(r'[\=\|\_]{1,2}', ' ', glosa)
-        glosa = re.sub(r'\s{2,}', ' ', glosa).strip()
-        glosa = re.sub(r'\bD\s*A\b', 'D.A', glosa, flags=re.I)
+        glosa = _GLOSA_SEPARADOR_RE.sub(' ', glosa)
+        glosa = _MULTISPACE_RE.sub(' ', glosa).strip()
+        glosa = _GLOSA_DA_RE.sub('D.A', glosa)
         return glosa
-    
-    def _recortar_boleta(self, text: str) -> str:
+
+    def _recortar_boleta(self, text: Union[str, OCRDocument]) -> str:
         """Recorta texto a zona relevante"""
-        start = re.search(r'BOLETA\s+DE\s+HONORARIOS', text, re.IGNORECASE)
-        if not start:
-            return text
-        
-        end_patterns = [
-            r'Fecha\s*/\s*Hora\s*Emisión',
-            r'Verifique\s+este\s+documento',
-            r'RES\.\s*EX\.',
-        ]
-        
-        end_positions = []
-        for pattern in end_patterns:
-            match = re.search(pattern, text[start.start():], re.IGNORECASE)
-            if match:
-                end_positions.append(start.start() + match.start())
-        
-        if end_positions:
-            return text[start.start():min(end_positions)]
-        else:
-            return text[start.start():]
-    
+        return OCRDocument.of(text).zona_boleta
+
     def _is_valid_name(self, text: str) -> bool:
         """Valida si texto es nombre válido"""
         if not text or len(text) < 5 or len(text) > 100:
             return False
 
         # Limpiar espacios múltiples
-        text_clean = re.sub(r'\s+', ' ', text).strip()
+        text_clean = _WS_RE.sub(' ', text).strip()
 
         # Rechazar si tiene demasiados números (más de 2)
-        if len(re.findall(r'\d', text_clean)) > 2:
+        if len(_DIGIT_RE.findall(text_clean)) > 2:
             return False
 
         # Rechazar si contiene demasiadas barras o caracteres especiales raros
@@ -1102,35 +1198,18 @@ class FieldExtractor:
             return False
 
         # Rechazar si empieza con caracteres raros
-        if re.match(r'^[^a-zA-ZÁÉÍÓÚÑáéíóúñ]+', text_clean):
+        if _NOMBRE_INICIO_INVALIDO_RE.match(text_clean):
             return False
 
-        # Palabras de rechazo expandidas
-        palabras_rechazo = {
-            'municipalidad', 'boleta', 'honorarios', 'rut', 'fecha',
-            'monto', 'total', 'documento', 'folio', 'servicio',
-            'atención', 'atencion', 'profesional', 'pago', 'decreto',
-            'convenio', 'glosa', 'periodo', 'por', 'd /', 'www', 'http'
-        }
-
         text_lower = text_clean.lower()
 
         # Rechazar si contiene cualquier palabra de rechazo
-        if any(palabra in text_lower for palabra in palabras_rechazo):
+        if any(palabra in text_lower for palabra in _NOMBRE_PALABRAS_RECHAZO):
             return False
 
         # Rechazar frases completas comunes de OCR basura
-        frases_rechazo = [
-            r'por\s+atenci[oó]n\s+profesional',
-            r'd\s*/\s*\.+',
-            r'^\s*d\s+/',
-            r'^\s*por\s+',
-            r'^\s*de\s+',
-            r'^\s*[:/\-\.]+\s*',
-        ]
-        for frase in frases_rechazo:
-            if re.search(frase, text_lower):
-                return False
+        if _NOMBRE_FRASES_RECHAZO_RE.search(text_lower):
+            return False
 
         # Debe tener al menos 2 palabras
         palabras = text_clean.split()
@@ -1138,41 +1217,31 @@ class FieldExtractor:
             return False
 
         # Debe tener al menos un 50% de letras
-        total_chars = len(re.sub(r'\s', '', text_clean))
-        letras = len(re.findall(r'[a-zA-ZÁÉÍÓÚÑáéíóúñ]', text_clean))
+        total_chars = len(_WS_RE.sub('', text_clean))
+        letras = len(_LETRA_RE.findall(text_clean))
         if total_chars > 0 and (letras / total_chars) < 0.5:
             return False
 
         return True
-    
+
     def _extract_name_from_filename(self, path: Path) -> str:
         """Extrae nombre del archivo"""
         stem = path.stem
-        nombre = re.sub(r'[_\-\.]+', ' ', stem)
-        nombre = re.sub(r'\([^)]*\)', ' ', nombre)
-        nombre = re.sub(r'\d+', ' ', nombre)
-        
-        palabras_comunes = {
-            'boleta', 'honorarios', 'aps', 'dir', 'pai', 'doc', 'scan'
-        }
-        
-        tokens = [t for t in nombre.split() if t.lower() not in palabras_comunes]
-        tokens = [t for t in tokens if re.match(r'^[A-Za-zÁÉÍÓÚÑáéíóúñ]{2,}$', t)]
-        
+        nombre = _ARCHIVO_SEP_RE.sub(' ', stem)
+        nombre = _ARCHIVO_PARENTESIS_RE.sub(' ', nombre)
+        nombre = _DIGITS_RE.sub(' ', nombre)
+
+        tokens = [t for t in nombre.split() if t.lower() not in _ARCHIVO_PALABRAS_COMUNES]
+        tokens = [t for t in tokens if _ARCHIVO_TOKEN_RE.match(t)]
+
         if len(tokens) >= 2:
             return ' '.join(tokens[:5]).title()
-        
+
         return ""
-    
+
     def _normalize(self, text: str) -> str:
         """Normaliza texto"""
-        if not text:
-            return ""
-        text = re.sub(r'\s+', ' ', text)
-        text = text.replace('..', '.').replace(',,', ',')
-        text = ''.join(c for c in text if c.isprintable() or c in '\n\t')
-        return text.strip()
-
+        return OCRDocument(text).normalizado
 
 
 class IntelligentBatchProcessor:
@@ -1484,12 +1553,14 @@ class IntelligentBatchProcessor:
 class DataProcessorOptimized:
     """Procesador v4.0 FINAL con post-procesamiento inteligente"""
     
-    def __init__(self, batch_memory: Optional[BatchMemory] = None):
+    def __init__(self, batch_memory: Optional[BatchMemory] = None, ocr_cache=None, ocr_threads: int = 1):
         from modules.ocr_extraction import OCRExtractorOptimized
-        from modules.memory import Memory
-        self.ocr_extractor = OCRExtractorOptimized()
+        from modules.memory import open_memory
+        self.ocr_cache = ocr_cache  # OCRCache opcional (None = sin caché)
+        self.memory = open_memory()
+        self.ocr_extractor = OCRExtractorOptimized(orientation_store=ocr_cache, ocr_threads=ocr_threads,
+                                                   memory=self.memory)
         self.field_extractor = FieldExtractor()
-        self.memory = Memory()
         self.batch_memory = batch_memory or BatchMemory()
         self.batch_processor = IntelligentBatchProcessor(self.batch_memory, self.memory)
         self.month_names = {
@@ -1498,52 +1569,90 @@ class DataProcessorOptimized:
             9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
         }
     
-    def process_file(self, file_path: Path) -> Dict:
-        """Procesa archivo (FASE 1: solo extracción OCR)"""
+    def reset_batch_memory(self, batch_memory: Optional[BatchMemory] = None):
+        """Reemplaza la memoria del batch (el extractor y la memoria persistente se conservan)"""
+        self.batch_memory = batch_memory or BatchMemory()
+        self.batch_processor.batch_memory = self.batch_memory
+    
+    def process_file(self, file_path: Path, file_hash: str = "", previa=None,
+                     timer: Optional[StageTimer] = None) -> Dict:
+        """
+        Procesa archivo (FASE 1: solo extracción OCR).
+        Desde el pipeline por etapas llegan el hash ya calculado, la primera página
+        (PaginaPrevia, implica caché sin acierto) y el timer con las etapas previas.
+        """
+        # Tiempos por etapa y contadores del documento (también los del OCR)
+        timer = self.ocr_extractor.timer = timer or StageTimer()
         try:
-            # Paso 1: OCR
-            ext = file_path.suffix.lower()
-            
-            if ext == '.pdf':
-                texts, confidences, preview = self.ocr_extractor.process_pdf_optimized(file_path)
+            # Paso 1: OCR (consultando primero el caché persistente)
+            cached = None
+            if self.ocr_cache is not None and previa is None:
+                from modules.ocr_cache import file_sha256
+                with timer.stage('cache'):
+                    file_hash = file_hash or file_sha256(file_path)
+                    cached = self.ocr_cache.get(file_hash)
+
+            if cached:
+                texts = cached.get('texts', [])
+                confidences = cached.get('confidences', [])
+                # La clave del caché es el contenido: la ruta guardada puede ser de otra copia
+                preview = ({**cached['preview'], 'archivo': str(file_path), 'hash': file_hash}
+                           if cached.get('preview') else {})
+                ocr_info = cached.get('ocr_info', {})
             else:
-                import cv2
-                img = cv2.imread(str(file_path))
-                if img is None:
-                    raise ValueError(f"No se pudo leer: {file_path}")
-                
-                text, conf, preview_img = self.ocr_extractor.process_image_optimized(img)
-                texts = [text] if text else []
-                confidences = [conf] if conf else []
-                preview = self.ocr_extractor._save_preview(preview_img, file_path, 0) if preview_img is not None else ""
+                texts, confidences, preview = self._run_ocr(file_path, file_hash, previa)
+                ocr_info = dict(self.ocr_extractor.last_run)
+                if self.ocr_cache is not None and (texts or ocr_info.get('timbre')):
+                    with timer.stage('cache'):
+                        self.ocr_cache.put(file_hash, texts, confidences,
+                                           extra={'ocr_info': ocr_info, 'preview': preview})
             
-            if not texts:
+            # Con timbre electrónico los textos pueden venir vacíos (sin OCR)
+            timbre = ocr_info.get('timbre')
+            if not texts and not timbre:
                 raise ValueError("No se pudo extraer texto")
+            if timbre and not confidences:
+                confidences = [TIMBRE_CONFIDENCE]
             
             texto_completo = "\n".join(texts)
             confianza_promedio = sum(confidences) / len(confidences) if confidences else 0.0
             
             # Paso 2: PRIMERA PASADA - Extracción inicial
-            campos = self._extract_all_fields(texto_completo, file_path)
+            with timer.stage('extraccion'):
+                campos = self._extract_all_fields(texto_completo, file_path)
             
             # Paso 3: SEGUNDA PASADA - Reintentar desde glosa
-            campos = self._segunda_pasada_desde_glosa(campos, texto_completo)
-            
-            # Paso 4: Búsqueda cruzada en batch actual (ligera)
-            campos = self._busqueda_cruzada_batch_basica(campos)
+            with timer.stage('segunda_pasada'):
+                campos = self._segunda_pasada_desde_glosa(campos, texto_completo)
+                if timbre:
+                    campos = self._aplicar_timbre(campos, timbre)
             
-            # Paso 5: Validar monto/horas
-            campos = self._validate_monto_horas(campos)
-            
-            # Paso 6: Calcular periodo básico
-            campos = self._calculate_periodo_basic(campos)
+            with timer.stage('validacion'):
+                # Paso 4: Búsqueda cruzada en batch actual (ligera)
+                campos = self._busqueda_cruzada_batch_basica(campos)
+                
+                # Paso 5: Validar monto/horas
+                campos = self._validate_monto_horas(campos)
+                
+                # Paso 6: Calcular periodo básico
+                campos = self._calculate_periodo_basic(campos)
             
             # Paso 7: Metadata
             campos['archivo'] = str(file_path)
             campos['paginas'] = len(texts)
             campos['confianza'] = round(confianza_promedio, 3)
             campos['confianza_max'] = round(max(confidences), 3) if confidences else 0.0
-            campos['preview_path'] = preview
+            # La preview se renderiza solo si el registro queda para revisión (modules/preview_store)
+            campos['preview'] = preview
+            campos['preview_path'] = ""
+            campos['ocr_cache'] = bool(cached)
+            campos['ocr_variante'] = ocr_info.get('variante', '')
+            campos['ocr_psm'] = ocr_info.get('psm')
+            campos['ocr_llamadas'] = 0 if cached else ocr_info.get('llamadas_ocr', 0)
+            campos['ocr_dpi'] = ocr_info.get('dpi')
+            campos['pdf_tipo'] = ocr_info.get('pdf_tipo', '')
+            campos['timbre'] = bool(timbre)
+            campos['instrumentacion'] = timer.as_dict()
             
             # NO decidir needs_review aquí - se hace en post-procesamiento
             campos['needs_review'] = None  # Pendiente de post-procesamiento
@@ -1559,18 +1668,42 @@ class DataProcessorOptimized:
                 'error': str(e),
                 'needs_review': True,
                 'confianza': 0.0,
-                'quality_score': 0.0
+                'quality_score': 0.0,
+                'instrumentacion': timer.as_dict()
             }
     
+    def _run_ocr(self, file_path: Path, file_hash: str = "", previa=None) -> Tuple[List[str], List[float], Dict]:
+        """Ejecuta el OCR de un archivo: (textos, confianzas, especificación de la preview)"""
+        ext = file_path.suffix.lower()
+
+        if ext == '.pdf':
+            return self.ocr_extractor.process_pdf_optimized(file_path, file_hash=file_hash, previa=previa)
+
+        if previa is not None and previa.imagen is not None:
+            img = previa.imagen
+        else:
+            import cv2
+            with self.ocr_extractor.timer.stage('render'):
+                img = cv2.imread(str(file_path))
+        if img is None:
+            raise ValueError(f"No se pudo leer: {file_path}")
+
+        text, conf, _ = self.ocr_extractor.process_image_optimized(img, file_hash=file_hash, previa=previa)
+        texts = [text] if text else []
+        confidences = [conf] if conf else []
+        return texts, confidences, self.ocr_extractor.preview_spec(file_path, file_hash)
+
     def _extract_all_fields(self, text: str, file_path: Path) -> Dict:
         """Primera pasada de extracción (robusta con inicialización de montos)."""
         extractor = self.field_extractor
+        # Líneas, normalizaciones y anclas se calculan una vez y las comparten los extractores
+        doc = OCRDocument(text)
 
-        glosa = extractor.extract_glosa(text)
+        glosa = extractor.extract_glosa(doc)
 
-        rut, rut_conf = extractor.extract_rut(text)
-        folio, folio_conf = extractor.extract_folio(text)
-        fecha, fecha_conf = extractor.extract_fecha(text)
+        rut, rut_conf = extractor.extract_rut(doc)
+        folio, folio_conf = extractor.extract_folio(doc)
+        fecha, fecha_conf = extractor.extract_fecha(doc)
 
         # --- Inicialización defensiva para evitar UnboundLocalError ---
         monto_bruto: Optional[int] = None
@@ -1580,7 +1713,7 @@ class DataProcessorOptimized:
 
         # Intento principal (preferir bruto)
         try:
-            mb, ml, mc, mo = extractor.extract_montos_prefer_bruto(text)
+            mb, ml, mc, mo = extractor.extract_montos_prefer_bruto(doc)
             if mb is not None:
                 monto_bruto = int(mb)
             if ml is not None:
@@ -1598,7 +1731,7 @@ class DataProcessorOptimized:
 
         # Fallback legacy si no salió nada
         if monto_bruto is None and monto_liquido is None:
-            m_legacy, c_legacy = extractor.extract_monto(text)
+            m_legacy, c_legacy = extractor.extract_monto(doc)
             if m_legacy:
                 monto_bruto = int(m_legacy)
                 monto_conf = max(monto_conf, (c_legacy or 0.75))
@@ -1610,12 +1743,12 @@ class DataProcessorOptimized:
             monto_liquido if monto_liquido is not None else None
         )
 
-        nombre, nombre_conf = extractor.extract_nombre(text, file_path)
-        convenio, convenio_conf = extractor.extract_convenio(text, glosa)
-        periodo_servicio, periodo_conf = extractor.extract_periodo_servicio(text, fecha)
-        horas = extractor.extract_horas(text, glosa)
-        decreto = extractor.extract_decreto(text)
-        tipo = extractor.extract_tipo(text, glosa)
+        nombre, nombre_conf = extractor.extract_nombre(doc, file_path)
+        convenio, convenio_conf = extractor.extract_convenio(doc, glosa)
+        periodo_servicio, periodo_conf = extractor.extract_periodo_servicio(doc, fecha)
+        horas = extractor.extract_horas(doc, glosa)
+        decreto = extractor.extract_decreto(doc)
+        tipo = extractor.extract_tipo(doc, glosa)
 
         return {
             'nombre': nombre,
@@ -1652,30 +1785,31 @@ class DataProcessorOptimized:
             return campos
         
         extractor = self.field_extractor
+        glosa_doc = OCRDocument(glosa)
         
         if not campos.get('fecha_documento') or campos.get('fecha_confidence', 0) < 0.6:
-            fecha_glosa, fecha_conf_glosa = extractor.extract_from_glosa(glosa, 'fecha')
+            fecha_glosa, fecha_conf_glosa = extractor.extract_from_glosa(glosa_doc, 'fecha')
             if fecha_glosa and fecha_conf_glosa > campos.get('fecha_confidence', 0):
                 campos['fecha_documento'] = fecha_glosa
                 campos['fecha_confidence'] = fecha_conf_glosa
                 campos['fecha_origen'] = 'glosa'
         
         if not campos.get('convenio') or campos.get('convenio_confidence', 0) < 0.4:
-            convenio_glosa, convenio_conf_glosa = extractor.extract_from_glosa(glosa, 'convenio')
+            convenio_glosa, convenio_conf_glosa = extractor.extract_from_glosa(glosa_doc, 'convenio')
             if convenio_glosa and convenio_conf_glosa > campos.get('convenio_confidence', 0):
                 campos['convenio'] = convenio_glosa
                 campos['convenio_confidence'] = convenio_conf_glosa
                 campos['convenio_origen'] = 'glosa'
         
         if not campos.get('rut'):
-            rut_glosa, rut_conf_glosa = extractor.extract_from_glosa(glosa, 'rut')
+            rut_glosa, rut_conf_glosa = extractor.extract_from_glosa(glosa_doc, 'rut')
             if rut_glosa:
                 campos['rut'] = rut_glosa
                 campos['rut_confidence'] = rut_conf_glosa
                 campos['rut_origen'] = 'glosa'
         
         if not campos.get('nombre') or campos.get('nombre_confidence', 0) < 0.5:
-            nombre_glosa, nombre_conf_glosa = extractor.extract_from_glosa(glosa, 'nombre')
+            nombre_glosa, nombre_conf_glosa = extractor.extract_from_glosa(glosa_doc, 'nombre')
             if nombre_glosa:
                 campos['nombre'] = nombre_glosa
                 campos['nombre_confidence'] = nombre_conf_glosa
@@ -1683,6 +1817,28 @@ class DataProcessorOptimized:
         
         return campos
     
+    def _aplicar_timbre(self, campos: Dict, timbre: Dict) -> Dict:
+        """
+        Campos del timbre electrónico (PDF417): reemplazan a los del OCR con confianza
+        alta. Nombre y convenio, que el timbre no trae, se completan desde la memoria.
+        """
+        for campo, conf_key, origen_key in (('rut', 'rut_confidence', 'rut_origen'),
+                                            ('nro_boleta', 'folio_confidence', 'folio_origen'),
+                                            ('fecha_documento', 'fecha_confidence', 'fecha_origen')):
+            if timbre.get(campo):
+                campos[campo] = timbre[campo]
+                campos[conf_key] = TIMBRE_CONFIDENCE
+                campos[origen_key] = 'timbre'
+
+        # MNT del TED = total de la boleta (bruto, "Total Honorarios")
+        if timbre.get('monto'):
+            campos['monto'] = timbre['monto']
+            campos['monto_bruto'] = int(timbre['monto'])
+            campos['monto_confidence'] = TIMBRE_CONFIDENCE
+            campos['monto_origen'] = 'timbre'
+
+        return self.memory.autofill(campos)
+
     def _busqueda_cruzada_batch_basica(self, campos: Dict) -> Dict:
         """Búsqueda cruzada básica (no tan agresiva como en post-proceso)"""
         rut = campos.get('rut', '').strip()
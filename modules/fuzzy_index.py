@@ -0,0 +1,95 @@
+# modules/fuzzy_index.py
+"""
+Índice difuso de nombres por trigramas (índice invertido)
+
+Reemplaza difflib.get_close_matches(nombre, todas_las_claves, n, cutoff) sin
+recorrer todas las claves:
+1) Poda: solo se puntúan claves que comparten suficientes trigramas con la
+   consulta. El mínimo exigido se deriva del cutoff y de los largos, de modo
+   que ninguna clave con ratio >= cutoff queda fuera (poda sin pérdidas).
+2) Puntaje exacto: difflib.get_close_matches sobre los candidatos, con el mismo
+   cutoff y desempate, por lo que el resultado es idéntico al recorrido lineal.
+
+Lo comparten Memory/SQLiteMemory (memoria persistente) y BatchMemory (lote).
+"""
+import difflib
+import math
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List
+
+Q = 3
+_PAD = " " * (Q - 1)
+
+
+def _grams(text: str) -> Counter:
+    padded = f"{_PAD}{text}{_PAD}"
+    return Counter(padded[i:i + Q] for i in range(len(padded) - Q + 1))
+
+
+def min_shared_grams(len_a: int, len_b: int, cutoff: float) -> int:
+    """
+    Cota inferior de trigramas compartidos (multiconjunto) entre dos textos con
+    SequenceMatcher.ratio() >= cutoff.
+
+    ratio = 2M/T con T = len_a + len_b y M caracteres coincidentes (subsecuencia
+    común). Borrar los T - 2M caracteres no coincidentes deja la misma cadena S
+    en ambos; cada borrado destruye a lo más Q trigramas, así que
+    compartidos >= T + Q - 1 - Q·(T - 2M) - M, mínimo en M = cutoff·T/2.
+    """
+    total = len_a + len_b
+    bound = total + Q - 1 - Q * total * (1 - cutoff) - cutoff * total / 2
+    return max(0, math.ceil(bound - 1e-9))
+
+
+class TrigramIndex:
+    """Índice invertido de trigramas sobre un conjunto de claves (solo crece)"""
+
+    def __init__(self, keys: Iterable[str] = ()):
+        self._keys: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._postings: Dict[str, List[tuple]] = defaultdict(list)  # trigrama -> [(id, veces)]
+        for key in keys:
+            self.add(key)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._ids
+
+    def add(self, key: str):
+        if not key or key in self._ids:
+            return
+        idx = len(self._keys)
+        self._keys.append(key)
+        self._ids[key] = idx
+        for gram, count in _grams(key).items():
+            self._postings[gram].append((idx, count))
+
+    def candidates(self, query: str, cutoff: float) -> List[str]:
+        """Claves que pueden alcanzar ratio >= cutoff con la consulta (cutoff >= 0.8)"""
+        shared: Dict[int, int] = defaultdict(int)
+        for gram, qcount in _grams(query).items():
+            for idx, count in self._postings.get(gram, ()):
+                shared[idx] += min(qcount, count)
+
+        # ratio <= 2·min(la, lb)/(la + lb): ventana de largos admisibles
+        qlen = len(query)
+        min_len = qlen * cutoff / (2 - cutoff) - 1e-9
+        max_len = qlen * (2 - cutoff) / cutoff + 1e-9
+        result = []
+        for idx, n in shared.items():
+            key = self._keys[idx]
+            if min_len <= len(key) <= max_len and n >= min_shared_grams(qlen, len(key), cutoff):
+                result.append(key)
+        return result
+
+    def get_close_matches(self, query: str, n: int = 1, cutoff: float = 0.6) -> List[str]:
+        """Equivalente a difflib.get_close_matches(query, claves, n, cutoff)"""
+        if not query or not self._keys:
+            return []
+        if cutoff < 0.8:
+            # Bajo 0.8 la cota se anula para textos largos (claves sin trigramas
+            # comunes podrían calificar): recorrido completo
+            return difflib.get_close_matches(query, self._keys, n=n, cutoff=cutoff)
+        return difflib.get_close_matches(query, self.candidates(query, cutoff), n=n, cutoff=cutoff)
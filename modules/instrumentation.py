@@ -0,0 +1,226 @@
+# modules/instrumentation.py
+"""
+Instrumentación liviana del procesamiento por documento
+
+- StageTimer: tiempos por etapa (perf_counter), contadores y picos (máximos, p. ej.
+  memoria de los artefactos de página) de UN documento.
+  Las etapas pueden anidarse: cada una registra su tiempo propio, sin el de las
+  etapas internas (p. ej. 'variantes' no incluye el 'tesseract' que contiene),
+  así la suma de etapas se aproxima al tiempo total del documento. Con hilos OCR
+  (ocr_threads > 1) 'tesseract' suma el tiempo de todos los hilos.
+- build_run_report / write_run_report: agregan el resultado de cada documento
+  (campo 'instrumentacion') en el reporte de la corrida (config.RUN_REPORT_PATH),
+  que también se escribe como hoja 'Rendimiento' del Excel principal.
+"""
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import *
+
+# Orden de presentación (las etapas no listadas van al final, alfabéticas)
+ETAPAS = (
+    "cache", "texto_embebido", "render", "timbre", "orientacion", "roi", "preproceso",
+    "variantes", "tesseract", "doble_pasada",
+    "extraccion", "segunda_pasada", "validacion",
+)
+
+
+class StageTimer:
+    """Tiempos por etapa y contadores de un documento (seguro entre hilos)"""
+
+    def __init__(self):
+        self.tiempos: Dict[str, float] = defaultdict(float)
+        self.contadores: Dict[str, int] = defaultdict(int)
+        self.picos: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._t0 = time.perf_counter()
+        self._previo_s = 0.0  # tiempo del documento en otros procesos (absorb)
+
+    @contextmanager
+    def stage(self, nombre: str):
+        """Mide el bloque como etapa `nombre` (tiempo propio, sin etapas internas)"""
+        pila = getattr(self._local, "pila", None)
+        if pila is None:
+            pila = self._local.pila = []
+        internas = [0.0]
+        pila.append(internas)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            pila.pop()
+            if pila:
+                pila[-1][0] += elapsed
+            with self._lock:
+                self.tiempos[nombre] += elapsed - internas[0]
+
+    def count(self, nombre: str, n: int = 1):
+        with self._lock:
+            self.contadores[nombre] += n
+
+    def peak(self, nombre: str, valor: int):
+        """Registra `valor` si supera el máximo visto para `nombre` en el documento"""
+        with self._lock:
+            if valor > self.picos.get(nombre, 0):
+                self.picos[nombre] = valor
+
+    def absorb(self, previo: Optional[Dict]):
+        """
+        Suma la instrumentación (as_dict) que el documento acumuló en otro proceso,
+        p. ej. en las etapas de render y preproceso de modules/staged_pipeline
+        """
+        if not previo:
+            return
+        with self._lock:
+            for etapa, ms in previo.get('etapas_ms', {}).items():
+                self.tiempos[etapa] += ms / 1000
+            for nombre, n in previo.get('contadores', {}).items():
+                self.contadores[nombre] += n
+            for nombre, valor in previo.get('picos', {}).items():
+                self.picos[nombre] = max(self.picos.get(nombre, 0), valor)
+            self._previo_s += previo.get('total_ms', 0.0) / 1000
+
+    def as_dict(self) -> Dict:
+        """{'total_ms', 'etapas_ms': {etapa: ms}, 'contadores': {nombre: n}, 'picos': {nombre: máx.}}"""
+        with self._lock:
+            return {
+                'total_ms': round((time.perf_counter() - self._t0 + self._previo_s) * 1000, 1),
+                'etapas_ms': {k: round(v * 1000, 1) for k, v in self.tiempos.items()},
+                'contadores': dict(self.contadores),
+                'picos': dict(self.picos),
+            }
+
+
+def _ordenar_etapas(nombres: Iterable[str]) -> List[str]:
+    prioridad = {e: i for i, e in enumerate(ETAPAS)}
+    return sorted(nombres, key=lambda e: (prioridad.get(e, len(ETAPAS)), e))
+
+
+def _percentil(valores_ordenados: List[float], p: float) -> float:
+    """Percentil por rango más cercano (lista ya ordenada, no vacía)"""
+    idx = min(len(valores_ordenados), max(1, math.ceil(p * len(valores_ordenados)))) - 1
+    return valores_ordenados[idx]
+
+
+def build_run_report(results: List[Dict], errores: Optional[List[str]] = None,
+                     fases_s: Optional[Dict[str, float]] = None,
+                     pipeline: Optional[Dict] = None,
+                     top_n: int = RUN_REPORT_TOP_N) -> Dict:
+    """
+    Agrega la instrumentación de los resultados de la fase 1:
+    - etapas: total, media, p50, p95 y máximo (ms) por etapa, sobre los
+      documentos en que la etapa ocurrió
+    - contadores: totales de la corrida (llamadas_ocr, pixeles_ocr, ...)
+    - picos: p50, p95 y máximo por documento (memoria_pagina_bytes, ...)
+    - llamadas_ocr_documento: p50, p95 y máximo de llamadas a Tesseract por
+      documento leído (sin caché) junto al tope OCR_MAX_CALLS, que no cuenta la
+      detección de orientación
+    - mas_lentos: los top_n documentos de mayor tiempo, con su etapa dominante
+    - pipeline: utilización de los pools de la fase 1 (stats de run_ocr_phase)
+    """
+    por_etapa: Dict[str, List[float]] = defaultdict(list)
+    contadores: Dict[str, int] = defaultdict(int)
+    por_pico: Dict[str, List[int]] = defaultdict(list)
+    llamadas: List[int] = []
+    documentos = []
+    desde_cache = 0
+
+    for r in results:
+        inst = r.get('instrumentacion') or {}
+        if not inst:
+            continue
+        etapas = inst.get('etapas_ms', {})
+        for etapa, ms in etapas.items():
+            por_etapa[etapa].append(ms)
+        for nombre, n in inst.get('contadores', {}).items():
+            contadores[nombre] += n
+        for nombre, valor in inst.get('picos', {}).items():
+            por_pico[nombre].append(valor)
+        desde_cache += bool(r.get('ocr_cache'))
+        if not r.get('ocr_cache'):
+            llamadas.append(inst.get('contadores', {}).get('llamadas_ocr', 0))
+        dominante = max(etapas, key=etapas.get) if etapas else ""
+        documentos.append({
+            'archivo': r.get('archivo', ''),
+            'total_ms': inst.get('total_ms', 0.0),
+            'etapa_dominante': dominante,
+            'etapa_dominante_ms': etapas.get(dominante, 0.0),
+            'llamadas_ocr': inst.get('contadores', {}).get('llamadas_ocr', 0),
+            'variante': r.get('ocr_variante', ''),
+            'dpi': r.get('ocr_dpi'),
+            'cache': bool(r.get('ocr_cache')),
+        })
+
+    resumen_etapas = {}
+    for etapa in _ordenar_etapas(por_etapa):
+        valores = sorted(por_etapa[etapa])
+        total = sum(valores)
+        resumen_etapas[etapa] = {
+            'documentos': len(valores),
+            'total_s': round(total / 1000, 3),
+            'media_ms': round(total / len(valores), 1),
+            'p50_ms': _percentil(valores, 0.50),
+            'p95_ms': _percentil(valores, 0.95),
+            'max_ms': valores[-1],
+        }
+
+    picos = {}
+    for nombre in sorted(por_pico):
+        valores = sorted(por_pico[nombre])
+        picos[nombre] = {'p50': _percentil(valores, 0.50), 'p95': _percentil(valores, 0.95),
+                         'max': valores[-1]}
+
+    llamadas.sort()
+    totales = sorted(d['total_ms'] for d in documentos)
+    documentos.sort(key=lambda d: d['total_ms'], reverse=True)
+    return {
+        'generado': datetime.now().isoformat(timespec="seconds"),
+        'documentos': len(documentos),
+        'desde_cache': desde_cache,
+        'errores': len(errores or []),
+        'fases_s': {k: round(v, 3) for k, v in (fases_s or {}).items()},
+        'tiempo_documento_ms': {
+            'total': round(sum(totales), 1),
+            'media': round(sum(totales) / len(totales), 1),
+            'p50': _percentil(totales, 0.50),
+            'p95': _percentil(totales, 0.95),
+            'max': totales[-1],
+        } if totales else {},
+        'etapas': resumen_etapas,
+        'contadores': dict(contadores),
+        'picos': picos,
+        'llamadas_ocr_documento': {
+            'p50': _percentil(llamadas, 0.50),
+            'p95': _percentil(llamadas, 0.95),
+            'max': llamadas[-1],
+            'tope': OCR_MAX_CALLS,
+        } if llamadas else {},
+        'mas_lentos': documentos[:top_n],
+        'pipeline': pipeline or {},
+    }
+
+
+def write_run_report(report: Dict, path: Path = None) -> Optional[Path]:
+    """Escritura atómica del reporte JSON (temporal + reemplazo)"""
+    path = Path(path) if path else RUN_REPORT_PATH
+    tmp = path.with_suffix(".tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps(report, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+        os.replace(tmp, path)
+        return path
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar el reporte de rendimiento: {e}")
+        return None
@@ -0,0 +1,107 @@
+# modules/layout.py
+"""
+Detección de layout de boletas de honorarios SII
+- Encabezado: nombre y RUT del emisor, N° de boleta (franja superior)
+- Fecha: línea de fecha sobre la tabla (mitad izquierda)
+- Glosa: "Por atención profesional" (columna de descripción de la tabla)
+- Totales: Total Honorarios / Impto. Retenido / Total (columna de montos, al pie)
+
+Se busca la tabla principal por contornos sobre una copia reducida de la página;
+si no aparece, se usa la plantilla fija ROI_TEMPLATE de config.
+"""
+import sys
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import *
+
+Box = Tuple[int, int, int, int]  # x0, y0, x1, y1 en píxeles de la página original
+
+
+class BoletaLayoutDetector:
+    """Encuentra las zonas de interés de una boleta renderizada"""
+
+    WORK_WIDTH = 1000  # Ancho de trabajo para la detección (rápido)
+    PAD = 0.01         # Margen horizontal de cada zona (fracción de la página); en
+                       # vertical las zonas se tocan sin solaparse
+    FECHA_ALTO = 0.10    # Banda sobre la tabla con la fecha (fracción del alto de la página)
+    TOTALES_DESDE = 0.60  # Fracción del alto de la tabla donde empiezan los totales
+    GLOSA_ANCHO = 0.65    # Columna de descripción (fracción del ancho de la tabla)
+    MONTOS_DESDE = 0.50   # Columna de montos con sus rótulos (idem)
+
+    def detect(self, gray: np.ndarray) -> Tuple[Dict[str, Box], str]:
+        """
+        Retorna ({zona: caja}, método) con método 'contornos' o 'plantilla'.
+        """
+        h, w = gray.shape[:2]
+        table = self._find_table(gray)
+        if table is not None:
+            return self._zones_from_table(table, w, h), "contornos"
+        return self._zones_from_template(w, h), "plantilla"
+
+    def _find_table(self, gray: np.ndarray) -> Optional[Box]:
+        """Rectángulo más grande con centro en la banda media de la página"""
+        h, w = gray.shape[:2]
+        scale = min(1.0, self.WORK_WIDTH / float(w))
+        small = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+        sh, sw = small.shape[:2]
+
+        _, inv = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+        # Conservar solo trazos largos (bordes de tabla), no texto
+        horiz = cv2.morphologyEx(inv, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (max(10, sw // 8), 1)))
+        vert = cv2.morphologyEx(inv, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(10, sh // 20))))
+        grid = cv2.dilate(cv2.bitwise_or(horiz, vert), np.ones((3, 3), np.uint8))
+
+        contours, _ = cv2.findContours(grid, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        best = None
+        best_area = 0
+        for c in contours:
+            x, y, bw, bh = cv2.boundingRect(c)
+            area = bw * bh
+            if bw < 0.5 * sw or bh < 0.10 * sh or area > 0.9 * sw * sh:
+                continue
+            cy = (y + bh / 2.0) / sh
+            if not (0.25 <= cy <= 0.75):
+                continue
+            if area > best_area:
+                best, best_area = (x, y, x + bw, y + bh), area
+
+        if best is None:
+            return None
+        x0, y0, x1, y1 = best
+        return (int(x0 / scale), int(y0 / scale), int(x1 / scale), int(y1 / scale))
+
+    def _zones_from_table(self, table: Box, w: int, h: int) -> Dict[str, Box]:
+        x0, y0, x1, y1 = table
+        tw, th = x1 - x0, y1 - y0
+        encabezado = self._zones_from_template(w, h)["encabezado"]
+        y_totales = y0 + int(self.TOTALES_DESDE * th)
+        return {
+            "encabezado": encabezado,
+            # La fecha va justo sobre la tabla, a la izquierda
+            "fecha": self._clip((0, max(encabezado[3], y0 - int(self.FECHA_ALTO * h)), w // 2, y0), w, h),
+            "glosa": self._clip((x0, y0, x0 + int(self.GLOSA_ANCHO * tw), y_totales), w, h),
+            # Los totales están al pie de la tabla (y justo bajo ella), en la columna de montos
+            "totales": self._clip((x0 + int(self.MONTOS_DESDE * tw), y_totales, x1, y1 + int(0.04 * h)), w, h),
+        }
+
+    def _zones_from_template(self, w: int, h: int) -> Dict[str, Box]:
+        zones = {}
+        for name, (fx0, fy0, fx1, fy1) in ROI_TEMPLATE.items():
+            zones[name] = self._clip((int(fx0 * w), int(fy0 * h), int(fx1 * w), int(fy1 * h)), w, h)
+        return zones
+
+    def _clip(self, box: Box, w: int, h: int) -> Box:
+        pad_x = int(self.PAD * w)
+        x0, y0, x1, y1 = box
+        return (max(0, x0 - pad_x), max(0, y0), min(w, x1 + pad_x), min(h, y1))
+
+
+def crop(img: np.ndarray, box: Box) -> np.ndarray:
+    """Recorte (vista, sin copia) de una zona"""
+    x0, y0, x1, y1 = box
+    return img[y0:y1, x0:x1]
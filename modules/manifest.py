@@ -0,0 +1,161 @@
+# modules/manifest.py
+"""
+Manifiesto de corridas para el modo incremental ("solo archivos nuevos")
+
+Se guarda junto al Excel en Export/ (config.RUN_MANIFEST_PATH):
+- files:   ruta relativa a la carpeta de entrada -> {size, mtime, hash, result_id}
+- records: result_id -> registro post-procesado que se exportó
+
+Una corrida incremental procesa solo los archivos agregados o modificados,
+combina sus registros con los de corridas anteriores y regenera el Excel.
+El hash (el mismo SHA-256 del caché OCR) solo se recalcula cuando cambian
+tamaño o mtime; result_id = hash abreviado + ruta relativa.
+"""
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import *
+from modules.ocr_cache import file_sha256
+
+
+def _json_default(value):
+    """Tipos numpy/pandas -> nativos; el resto como texto"""
+    if hasattr(value, "item"):
+        try:
+            return value.item()
+        except Exception:
+            pass
+    return str(value)
+
+
+class RunManifest:
+    """Estado de la última corrida: qué archivo produjo qué registro"""
+
+    VERSION = 1
+
+    def __init__(self, root_dir: Path, path: Path = None):
+        self.root_dir = Path(root_dir)
+        self.path = Path(path) if path else RUN_MANIFEST_PATH
+        self.files: Dict[str, Dict] = {}
+        self.records: Dict[str, Dict] = {}
+        self.last_run = ""
+        self._pending: Dict[str, Dict] = {}   # ruta absoluta -> {rel, size, mtime, hash}
+        self._removed: List[str] = []
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("version") != self.VERSION:
+                print(f"⚠️ Manifiesto {self.path.name} de otra versión: se procesará todo de nuevo")
+                return
+            self.files = data.get("files", {})
+            self.records = data.get("records", {})
+            self.last_run = data.get("last_run", "")
+        except Exception as e:
+            print(f"⚠️ No se pudo cargar el manifiesto: {e}")
+
+    def save(self):
+        """Escritura atómica (temporal + reemplazo)"""
+        data = {
+            "version": self.VERSION,
+            "root_dir": str(self.root_dir),
+            "last_run": datetime.now().isoformat(timespec="seconds"),
+            "files": self.files,
+            "records": self.records,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        try:
+            tmp.write_text(json.dumps(data, ensure_ascii=False, default=_json_default), encoding="utf-8")
+            os.replace(tmp, self.path)
+            self.last_run = data["last_run"]
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar el manifiesto: {e}")
+
+    def _rel(self, file_path: Path) -> str:
+        try:
+            return Path(file_path).resolve().relative_to(self.root_dir.resolve()).as_posix()
+        except ValueError:
+            return Path(file_path).resolve().as_posix()
+
+    def scan(self, files: Iterable[Path]) -> Dict[str, List]:
+        """
+        Compara los archivos actuales con el manifiesto.
+        Retorna {'nuevos': [Path], 'modificados': [Path], 'sin_cambios': [rel], 'eliminados': [rel]}
+        """
+        cambios = {'nuevos': [], 'modificados': [], 'sin_cambios': [], 'eliminados': []}
+        self._pending = {}
+        vistos = set()
+
+        for file_path in files:
+            rel = self._rel(file_path)
+            vistos.add(rel)
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+            meta = {'rel': rel, 'size': st.st_size, 'mtime': round(st.st_mtime, 3), 'hash': ''}
+            previo = self.files.get(rel)
+
+            if previo and previo.get('result_id') in self.records:
+                if previo.get('size') == meta['size'] and previo.get('mtime') == meta['mtime']:
+                    cambios['sin_cambios'].append(rel)
+                    continue
+                # Tamaño/mtime distintos: el contenido decide (p. ej. archivo copiado o tocado)
+                meta['hash'] = file_sha256(file_path)
+                if meta['hash'] == previo.get('hash'):
+                    previo.update(size=meta['size'], mtime=meta['mtime'])
+                    cambios['sin_cambios'].append(rel)
+                    continue
+                cambios['modificados'].append(Path(file_path))
+            else:
+                cambios['nuevos'].append(Path(file_path))
+            self._pending[str(file_path)] = meta
+
+        self._removed = [rel for rel in self.files if rel not in vistos]
+        cambios['eliminados'] = list(self._removed)
+        return cambios
+
+    def previous_records(self) -> List[Dict]:
+        """Registros de corridas anteriores cuyos archivos siguen sin cambios"""
+        pendientes = {meta['rel'] for meta in self._pending.values()}
+        removed = set(self._removed)
+        return [dict(self.records[info['result_id']]) for rel, info in self.files.items()
+                if rel not in pendientes and rel not in removed and info.get('result_id') in self.records]
+
+    def update(self, registros: Iterable[Dict]):
+        """
+        Registra el resultado de la corrida: los archivos procesados cuyo registro
+        quedó completo pasan al manifiesto; los que quedaron pendientes de revisión
+        o con error se quitan, para reintentarlos en la próxima corrida.
+        """
+        for rel in self._removed:
+            info = self.files.pop(rel, None)
+            if info:
+                self.records.pop(info.get('result_id'), None)
+        for meta in self._pending.values():
+            info = self.files.pop(meta['rel'], None)
+            if info:
+                self.records.pop(info.get('result_id'), None)
+
+        for registro in registros:
+            meta = self._pending.get(str(registro.get('archivo', '')))
+            if meta is None:
+                continue
+            file_hash = meta['hash'] or file_sha256(Path(registro['archivo']))
+            # Un id por archivo: dos copias idénticas en rutas distintas no se pisan
+            result_id = f"{file_hash[:16]}:{meta['rel']}"
+            self.files[meta['rel']] = {'size': meta['size'], 'mtime': meta['mtime'],
+                                       'hash': file_hash, 'result_id': result_id}
+            self.records[result_id] = registro
+
+        self._pending = {}
+        self._removed = []
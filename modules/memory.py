@@ -7,13 +7,18 @@ Sistema de memoria con búsqueda BIDIRECCIONAL y normalización de pagos:
 - RUT + Decreto → Monto/Horas (NUEVO v4.1)
 - Historial completo
 """
+import functools
 import json
+import os
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 from collections import Counter, defaultdict
 from typing import Dict, Optional
-import difflib
 from datetime import datetime
 
+from .fuzzy_index import TrigramIndex
+
 class Memory:
     """Sistema de memoria bidireccional para autocompletado inteligente"""
 
@@ -39,6 +44,11 @@ class Memory:
             "processing_history": [],     # Historial
             "rut_decreto_to_payment": {} # NUEVO v4.1: RUT + Decreto → Monto/Horas
         }
+        # Persistencia agrupada: dentro de batch() los cambios solo marcan la memoria
+        # como modificada y se escribe UNA vez al cerrar el bloque (o con flush())
+        self._batch_depth = 0
+        self._dirty = False
+        self._name_index = None  # TrigramIndex de name_to_rut (se construye en la 1ª búsqueda difusa)
         self._load()
     
     def _load(self):
@@ -53,6 +63,36 @@ class Memory:
             except Exception as e:
                 print(f"⚠️ No se pudo cargar memoria: {e}")
     
+    @contextmanager
+    def batch(self):
+        """
+        Agrupa varias escrituras en una sola:
+
+            with memory.batch():
+                for registro in completos:
+                    memory.learn(registro)
+
+        Los bloques se pueden anidar; se guarda al cerrar el más externo.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.flush()
+
+    def flush(self):
+        """Guarda solo si hay cambios pendientes"""
+        if self._dirty:
+            self.save()
+
+    def _changed(self):
+        """Marca cambios; fuera de un batch() se guarda de inmediato (comportamiento histórico)"""
+        self._dirty = True
+        if self._batch_depth == 0:
+            self.save()
+
     def save(self):
         """Guarda memoria en JSON con manejo robusto de errores"""
         try:
@@ -61,13 +101,12 @@ class Memory:
 
             # Intentar guardar primero en archivo temporal
             temp_path = self.path.with_suffix('.tmp')
-            temp_path.write_text(
-                json.dumps(self.data, ensure_ascii=False, indent=2),
-                encoding="utf-8"
-            )
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(self.data, ensure_ascii=False, indent=2))
+                f.flush()
+                os.fsync(f.fileno())
 
             # Reemplazar atómicamente el archivo original
-            import os
             try:
                 os.replace(temp_path, self.path)
             except Exception:
@@ -75,6 +114,7 @@ class Memory:
                 import shutil
                 shutil.copy2(temp_path, self.path)
                 temp_path.unlink(missing_ok=True)
+            self._dirty = False
 
         except PermissionError as e:
             print(f"⚠️ Error de permisos al guardar memoria en {self.path}: {e}")
@@ -94,6 +134,11 @@ class Memory:
         if not rut:
             return
         
+        with self.batch():
+            self._learn(rut, nombre, convenio, decreto, monto, horas, campos.get('fecha_documento', ''))
+
+    def _learn(self, rut: str, nombre: str, convenio: str, decreto: str,
+               monto: str, horas: str, fecha_documento: str):
         # Aprender RUT → Nombre
         if nombre:
             if rut not in self.data["rut_to_name"]:
@@ -109,6 +154,7 @@ class Memory:
             nombre_normalizado = self._normalize_name(nombre)
             if nombre_normalizado:
                 self.data.setdefault("name_to_rut", {})[nombre_normalizado] = rut
+                self._index_name(nombre_normalizado)
         
         # Aprender RUT → Convenio
         if convenio:
@@ -135,9 +181,9 @@ class Memory:
             }
         
         self.data["rut_stats"][rut]["count"] += 1
-        self.data["rut_stats"][rut]["last_seen"] = campos.get('fecha_documento', '')
+        self.data["rut_stats"][rut]["last_seen"] = fecha_documento
         
-        self.save()
+        self._changed()
     
     def learn_payment_pattern(self, rut: str, decreto: str, monto: str, horas: str):
         """
@@ -171,7 +217,7 @@ class Memory:
                 "last_updated": datetime.now().isoformat()
             }
         
-        self.save()
+        self._changed()
     
     def get_payment_by_rut_decreto(self, rut: str, decreto: str) -> Dict:
         """
@@ -253,10 +299,9 @@ class Memory:
         if nombre_norm in name_to_rut:
             return name_to_rut[nombre_norm]
         
-        # Búsqueda difusa (similar)
-        mejores_matches = difflib.get_close_matches(
+        # Búsqueda difusa (similar): solo se puntúan nombres con trigramas comunes
+        mejores_matches = self._fuzzy_index().get_close_matches(
             nombre_norm, 
-            name_to_rut.keys(), 
             n=1, 
             cutoff=0.85  # 85% de similitud
         )
@@ -266,13 +311,28 @@ class Memory:
         
         return ""
     
+    def _indexed_names(self):
+        """Nombres normalizados conocidos (claves de la búsqueda difusa)"""
+        return self.data.get("name_to_rut", {}).keys()
+    
+    def _fuzzy_index(self) -> TrigramIndex:
+        if self._name_index is None:
+            self._name_index = TrigramIndex(self._indexed_names())
+        return self._name_index
+    
+    def _index_name(self, nombre_norm: str):
+        """Mantiene el índice difuso al día sin reconstruirlo"""
+        if self._name_index is not None:
+            self._name_index.add(nombre_norm)
+    
     def set_name_for_rut(self, rut: str, nombre: str):
         """Asocia manualmente nombre a RUT"""
         self.data.setdefault("rut_to_name", {})[rut] = nombre
         nombre_norm = self._normalize_name(nombre)
         if nombre_norm:
             self.data.setdefault("name_to_rut", {})[nombre_norm] = rut
-        self.save()
+            self._index_name(nombre_norm)
+        self._changed()
     
     def get_convenio_by_rut(self, rut: str) -> str:
         """Obtiene convenio más común de un RUT"""
@@ -337,4 +397,368 @@ class Memory:
             "processing_history": [],
             "rut_decreto_to_payment": {}
         }
-        self.save()
+        self._name_index = None
+        self._changed()
+
+
+def _sincronizado(metodo):
+    """Ejecuta el método bajo el RLock de la instancia (conexión compartida entre hilos)"""
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        with self._lock:
+            return metodo(self, *args, **kwargs)
+    return envoltura
+
+
+class SQLiteMemory(Memory):
+    """
+    Misma interfaz que Memory, respaldada en SQLite (WAL):
+    - Tablas indexadas por RUT, nombre normalizado y RUT + Decreto
+    - Cada cambio es una fila, no se reescribe el archivo completo
+    - Historial append-only de aprendizajes (tabla history)
+    - Migración automática (una vez) desde memory.json
+    - Una sola conexión, usable desde cualquier hilo (la GUI crea la memoria en
+      el hilo de Tk y la usa en el hilo de procesamiento): cada operación corre
+      bajo un RLock, así las escrituras de un batch() siguen en una transacción
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS persons (
+            rut        TEXT PRIMARY KEY,
+            name       TEXT NOT NULL DEFAULT '',
+            count      INTEGER NOT NULL DEFAULT 0,
+            last_seen  TEXT NOT NULL DEFAULT ''
+        );
+        CREATE TABLE IF NOT EXISTS name_index (
+            norm_name  TEXT PRIMARY KEY,
+            rut        TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_name_index_rut ON name_index(rut);
+        CREATE TABLE IF NOT EXISTS name_variations (
+            rut        TEXT NOT NULL,
+            name       TEXT NOT NULL,
+            PRIMARY KEY (rut, name)
+        );
+        CREATE TABLE IF NOT EXISTS rut_convenio (
+            rut        TEXT NOT NULL,
+            convenio   TEXT NOT NULL,
+            count      INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (rut, convenio)
+        );
+        CREATE TABLE IF NOT EXISTS payments (
+            rut          TEXT NOT NULL,
+            decreto      TEXT NOT NULL,
+            monto        TEXT NOT NULL DEFAULT '',
+            horas        TEXT NOT NULL DEFAULT '',
+            count        INTEGER NOT NULL DEFAULT 1,
+            last_updated TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (rut, decreto)
+        );
+        CREATE TABLE IF NOT EXISTS history (
+            id              INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts              TEXT NOT NULL,
+            rut             TEXT NOT NULL,
+            nombre          TEXT NOT NULL DEFAULT '',
+            convenio        TEXT NOT NULL DEFAULT '',
+            decreto         TEXT NOT NULL DEFAULT '',
+            monto           TEXT NOT NULL DEFAULT '',
+            horas           TEXT NOT NULL DEFAULT '',
+            fecha_documento TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS idx_history_rut ON history(rut);
+        CREATE TABLE IF NOT EXISTS meta (
+            key   TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: Path = None, json_path: Path = None):
+        if path is None or json_path is None:
+            import sys
+            sys.path.append(str(Path(__file__).parent.parent))
+            try:
+                from config import EXPORT_DIR
+                base = EXPORT_DIR
+            except:
+                base = Path(".")
+            path = path or base / "memory.sqlite3"
+            json_path = json_path or base / "memory.json"
+        self.path = Path(path)
+        self.json_path = Path(json_path)
+        self._batch_depth = 0
+        self._dirty = False
+        self._conn = None
+        self._lock = threading.RLock()
+        self._name_index = None  # TrigramIndex de name_index para la búsqueda difusa
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Conexión / persistencia
+    # ------------------------------------------------------------------
+    @_sincronizado
+    def _connect(self):
+        if self._conn is None:
+            import sqlite3
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @_sincronizado
+    def _load(self):
+        """Abre la base y migra memory.json la primera vez"""
+        try:
+            conn = self._connect()
+            migrated = conn.execute("SELECT value FROM meta WHERE key = 'migrated_from'").fetchone()
+            if migrated is None:
+                if self.json_path.exists():
+                    self.migrate_from_json(self.json_path)
+                else:
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from', '')")
+                    conn.commit()
+        except Exception as e:
+            print(f"⚠️ No se pudo cargar memoria: {e}")
+
+    @_sincronizado
+    def migrate_from_json(self, json_path: Path) -> int:
+        """Importa un memory.json (formato de Memory). Retorna RUTs importados."""
+        data = json.loads(Path(json_path).read_text(encoding="utf-8"))
+        conn = self._connect()
+        with conn:
+            ruts = set(data.get("rut_to_name", {})) | set(data.get("rut_stats", {}))
+            for rut in ruts:
+                stats = data.get("rut_stats", {}).get(rut, {})
+                conn.execute(
+                    "INSERT OR REPLACE INTO persons (rut, name, count, last_seen) VALUES (?, ?, ?, ?)",
+                    (rut, data.get("rut_to_name", {}).get(rut, ""),
+                     int(stats.get("count", 0)), str(stats.get("last_seen", "")))
+                )
+            conn.executemany(
+                "INSERT OR REPLACE INTO name_index (norm_name, rut) VALUES (?, ?)",
+                list(data.get("name_to_rut", {}).items())
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO name_variations (rut, name) VALUES (?, ?)",
+                [(rut, n) for rut, names in data.get("name_variations", {}).items() for n in names]
+            )
+            for rut, convs in data.get("rut_to_convenio", {}).items():
+                if isinstance(convs, str):
+                    convs = {convs: 1}
+                conn.executemany(
+                    "INSERT OR REPLACE INTO rut_convenio (rut, convenio, count) VALUES (?, ?, ?)",
+                    [(rut, c, int(n)) for c, n in convs.items()]
+                )
+            for rut, pagos in data.get("rut_decreto_to_payment", {}).items():
+                conn.executemany(
+                    "INSERT OR REPLACE INTO payments (rut, decreto, monto, horas, count, last_updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(rut, dec, p.get("monto", ""), p.get("horas", ""), int(p.get("count", 1)),
+                      p.get("last_updated", "")) for dec, p in pagos.items()]
+                )
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from', ?)",
+                         (str(json_path),))
+        self._name_index = None
+        return len(ruts)
+
+    @_sincronizado
+    def save(self):
+        """Confirma la transacción en curso"""
+        try:
+            if self._conn is not None:
+                self._conn.commit()
+            self._dirty = False
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar memoria: {e}")
+
+    @_sincronizado
+    def close(self):
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # ------------------------------------------------------------------
+    # Aprendizaje
+    # ------------------------------------------------------------------
+    @_sincronizado
+    def _learn(self, rut: str, nombre: str, convenio: str, decreto: str,
+               monto: str, horas: str, fecha_documento: str):
+        conn = self._connect()
+        conn.execute("INSERT OR IGNORE INTO persons (rut) VALUES (?)", (rut,))
+
+        # RUT → Nombre (se conserva el primero), variaciones y Nombre → RUT
+        if nombre:
+            conn.execute("UPDATE persons SET name = ? WHERE rut = ? AND name = ''", (nombre, rut))
+            conn.execute("INSERT OR IGNORE INTO name_variations (rut, name) VALUES (?, ?)", (rut, nombre))
+            nombre_normalizado = self._normalize_name(nombre)
+            if nombre_normalizado:
+                conn.execute("INSERT OR REPLACE INTO name_index (norm_name, rut) VALUES (?, ?)",
+                             (nombre_normalizado, rut))
+                self._index_name(nombre_normalizado)
+
+        # RUT → Convenio
+        if convenio:
+            conn.execute(
+                "INSERT INTO rut_convenio (rut, convenio, count) VALUES (?, ?, 1) "
+                "ON CONFLICT(rut, convenio) DO UPDATE SET count = count + 1",
+                (rut, convenio)
+            )
+
+        # RUT + Decreto → Monto/Horas
+        if decreto and (monto or horas):
+            self.learn_payment_pattern(rut, decreto, monto, horas)
+
+        # Estadísticas
+        conn.execute("UPDATE persons SET count = count + 1, last_seen = ? WHERE rut = ?",
+                     (fecha_documento, rut))
+
+        # Historial append-only
+        conn.execute(
+            "INSERT INTO history (ts, rut, nombre, convenio, decreto, monto, horas, fecha_documento) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (datetime.now().isoformat(), rut, nombre, convenio, decreto, monto, horas, fecha_documento)
+        )
+        self._changed()
+
+    @_sincronizado
+    def learn_payment_pattern(self, rut: str, decreto: str, monto: str, horas: str):
+        """Aprende el patrón de pago RUT + Decreto → Monto/Horas (misma regla que Memory)"""
+        if not rut or not decreto:
+            return
+
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT monto, horas, count FROM payments WHERE rut = ? AND decreto = ?", (rut, decreto)
+        ).fetchone()
+        if row is not None:
+            ex_monto, ex_horas, count = row
+            if ex_monto == monto and ex_horas == horas:
+                conn.execute("UPDATE payments SET count = count + 1 WHERE rut = ? AND decreto = ?",
+                             (rut, decreto))
+            elif count < 5:  # Si tiene pocas ocurrencias, actualizar
+                conn.execute(
+                    "UPDATE payments SET monto = ?, horas = ?, count = 1 WHERE rut = ? AND decreto = ?",
+                    (monto, horas, rut, decreto)
+                )
+        else:
+            conn.execute(
+                "INSERT INTO payments (rut, decreto, monto, horas, count, last_updated) VALUES (?, ?, ?, ?, 1, ?)",
+                (rut, decreto, monto, horas, datetime.now().isoformat())
+            )
+        self._changed()
+
+    @_sincronizado
+    def set_name_for_rut(self, rut: str, nombre: str):
+        """Asocia manualmente nombre a RUT"""
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO persons (rut, name) VALUES (?, ?) ON CONFLICT(rut) DO UPDATE SET name = excluded.name",
+            (rut, nombre)
+        )
+        nombre_norm = self._normalize_name(nombre)
+        if nombre_norm:
+            conn.execute("INSERT OR REPLACE INTO name_index (norm_name, rut) VALUES (?, ?)", (nombre_norm, rut))
+            self._index_name(nombre_norm)
+        self._changed()
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    @_sincronizado
+    def get_payment_by_rut_decreto(self, rut: str, decreto: str) -> Dict:
+        if not rut or not decreto:
+            return {}
+        row = self._connect().execute(
+            "SELECT monto, horas, count, last_updated FROM payments WHERE rut = ? AND decreto = ?",
+            (rut, decreto)
+        ).fetchone()
+        if row is None:
+            return {}
+        return {"monto": row[0], "horas": row[1], "count": row[2], "last_updated": row[3]}
+
+    @_sincronizado
+    def get_name_by_rut(self, rut: str) -> str:
+        row = self._connect().execute("SELECT name FROM persons WHERE rut = ?", (rut,)).fetchone()
+        return row[0] if row else ""
+
+    @_sincronizado
+    def get_rut_by_name(self, nombre: str) -> str:
+        if not nombre:
+            return ""
+
+        nombre_norm = self._normalize_name(nombre)
+        conn = self._connect()
+
+        # Búsqueda exacta (índice)
+        row = conn.execute("SELECT rut FROM name_index WHERE norm_name = ?", (nombre_norm,)).fetchone()
+        if row:
+            return row[0]
+
+        # Búsqueda difusa (similar)
+        mejores_matches = self._fuzzy_index().get_close_matches(nombre_norm, n=1, cutoff=0.85)
+        if mejores_matches:
+            row = conn.execute("SELECT rut FROM name_index WHERE norm_name = ?", (mejores_matches[0],)).fetchone()
+            return row[0] if row else ""
+        return ""
+
+    @_sincronizado
+    def _indexed_names(self):
+        """Nombres normalizados de name_index (claves de la búsqueda difusa)"""
+        return [row[0] for row in self._connect().execute("SELECT norm_name FROM name_index")]
+
+    @_sincronizado
+    def get_convenio_by_rut(self, rut: str) -> str:
+        row = self._connect().execute(
+            "SELECT convenio FROM rut_convenio WHERE rut = ? ORDER BY count DESC, rowid ASC LIMIT 1", (rut,)
+        ).fetchone()
+        return row[0] if row else ""
+
+    @_sincronizado
+    def get_stats(self) -> Dict:
+        conn = self._connect()
+        one = lambda sql: conn.execute(sql).fetchone()[0]
+        return {
+            "total_ruts": one("SELECT COUNT(*) FROM persons WHERE name != ''"),
+            "total_nombres": one("SELECT COUNT(*) FROM name_index"),
+            "total_convenios_únicos": one("SELECT COUNT(DISTINCT convenio) FROM rut_convenio"),
+            "procesados_total": one("SELECT COALESCE(SUM(count), 0) FROM persons"),
+            "patrones_pago": one("SELECT COUNT(*) FROM payments"),
+        }
+
+    @_sincronizado
+    def clear(self):
+        """Limpia toda la memoria (el historial también)"""
+        conn = self._connect()
+        for table in ("persons", "name_index", "name_variations", "rut_convenio", "payments", "history"):
+            conn.execute(f"DELETE FROM {table}")
+        self._name_index = None
+        self._changed()
+
+
+def open_memory(path: Path = None) -> Memory:
+    """Memoria persistente según config.MEMORY_BACKEND ('sqlite' o 'json')"""
+    import sys
+    sys.path.append(str(Path(__file__).parent.parent))
+    try:
+        from config import MEMORY_BACKEND
+    except Exception:
+        MEMORY_BACKEND = "json"
+    if MEMORY_BACKEND == "sqlite":
+        return SQLiteMemory(path)
+    return Memory(path)
+
+
+if __name__ == "__main__":
+    # Migración explícita: python -m modules.memory [memory.json] [memory.sqlite3]
+    import sys
+    args = sys.argv[1:]
+    mem = SQLiteMemory(path=Path(args[1]) if len(args) > 1 else None,
+                       json_path=Path(args[0]) if args else None)
+    print(f"Memoria SQLite: {mem.path}")
+    for k, v in mem.get_stats().items():
+        print(f"  {k}: {v}")
+    mem.close()
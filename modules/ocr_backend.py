@@ -0,0 +1,210 @@
+# modules/ocr_backend.py
+"""
+Backends de Tesseract para OCRExtractorOptimized
+- TesserocrBackend: motor Tesseract en proceso (binding tesserocr), un motor
+  inicializado por hilo y por (idioma, OEM); las imágenes numpy se pasan como
+  buffer, sin PNG temporal ni recarga de traineddata por llamada
+- PytesseractBackend: respaldo vía pytesseract (un proceso tesseract por llamada)
+
+Ambos exponen la misma interfaz:
+    image_to_data(image, config)   -> DataFrame (formato TSV de Tesseract)
+    image_to_string(image, config) -> str
+    osd_rotation(image)            -> grados a rotar (0/90/180/270) o None
+    get_languages()                -> set de idiomas instalados
+
+Selección con config.OCR_BACKEND: "auto" (tesserocr si está instalado), "tesserocr" o "pytesseract".
+"""
+import io
+import os
+import re
+import shlex
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+import pytesseract
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import *
+from modules.utils import detect_tesseract_cmd
+
+try:
+    import tesserocr
+except ImportError:  # binding opcional
+    tesserocr = None
+
+_TSV_COLUMNS = ["level", "page_num", "block_num", "par_num", "line_num", "word_num",
+                "left", "top", "width", "height", "conf", "text"]
+
+
+def parse_config(config: str) -> Tuple[Optional[int], Optional[int], str, Dict[str, str]]:
+    """
+    Interpreta un string de configuración estilo CLI de Tesseract
+    ("--oem 3 --psm 6 -l spa -c var=valor") -> (oem, psm, lang, variables)
+    """
+    oem, psm, lang, variables = None, None, "", {}
+    tokens = shlex.split(config or "", posix=True)
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else ""
+        if tok == "--oem":
+            oem, i = int(nxt), i + 2
+        elif tok == "--psm":
+            psm, i = int(nxt), i + 2
+        elif tok == "-l":
+            lang, i = nxt, i + 2
+        elif tok == "-c" and "=" in nxt:
+            k, v = nxt.split("=", 1)
+            variables[k] = v
+            i += 2
+        else:
+            i += 1
+    return oem, psm, lang, variables
+
+
+class PytesseractBackend:
+    """Respaldo: cada llamada ejecuta el binario tesseract"""
+
+    name = "pytesseract"
+
+    def image_to_data(self, image, config: str) -> pd.DataFrame:
+        return pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DATAFRAME)
+
+    def image_to_string(self, image, config: str) -> str:
+        return pytesseract.image_to_string(image, config=config)
+
+    def osd_rotation(self, image) -> Optional[int]:
+        osd = pytesseract.image_to_osd(image, config="--psm 0")
+        rotation = re.search(r'Rotate:\s+(\d+)', osd)
+        return int(rotation.group(1)) if rotation else None
+
+    def get_languages(self) -> Set[str]:
+        return set(pytesseract.get_languages(config=''))
+
+
+class TesserocrBackend:
+    """
+    Tesseract en proceso. Los motores (PyTessBaseAPI) no son seguros entre hilos,
+    por eso se mantienen en un threading.local: cada hilo de cada worker
+    inicializa su motor una sola vez y lo reutiliza en todas las llamadas.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, tessdata_path: str = None):
+        self.tessdata_path = tessdata_path or self._detect_tessdata()
+        self._local = threading.local()
+
+    @staticmethod
+    def _detect_tessdata() -> str:
+        env = os.getenv("TESSDATA_PREFIX")
+        if env and Path(env).exists():
+            return env
+        cmd = detect_tesseract_cmd()
+        if cmd:
+            candidate = Path(cmd).parent / "tessdata"
+            if candidate.exists():
+                return str(candidate)
+        return ""
+
+    def _engine(self, lang: str, oem: Optional[int], psm: Optional[int] = None):
+        """Motor inicializado para (idioma, OEM) del hilo actual"""
+        engines = getattr(self._local, "engines", None)
+        if engines is None:
+            engines = self._local.engines = {}
+        key = (lang or "eng", 3 if oem is None else oem)
+        api = engines.get(key)
+        if api is None:
+            # OEM/PSM de tesserocr son espacios de nombres de constantes int, no enums instanciables
+            kwargs = {"lang": key[0], "oem": key[1]}
+            if self.tessdata_path:
+                kwargs["path"] = self.tessdata_path
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+            engines[key] = api
+        api.SetPageSegMode(3 if psm is None else psm)
+        return api
+
+    @staticmethod
+    def _set_image(api, image):
+        """Pasa el buffer numpy directo al motor (sin PNG intermedio)"""
+        if isinstance(image, Image.Image) and image.mode not in ("L", "RGB"):
+            image = image.convert("L")
+        arr = np.asarray(image)
+        if arr.dtype != np.uint8:
+            arr = arr.astype(np.uint8)
+        arr = np.ascontiguousarray(arr)
+        h, w = arr.shape[:2]
+        bpp = 1 if arr.ndim == 2 else arr.shape[2]
+        api.SetImageBytes(arr.tobytes(), w, h, bpp, w * bpp)
+
+    def _run(self, image, config: str, fn):
+        oem, psm, lang, variables = parse_config(config)
+        api = self._engine(lang, oem, psm)
+        for k, v in variables.items():
+            api.SetVariable(k, v)
+        try:
+            self._set_image(api, image)
+            return fn(api)
+        finally:
+            # Las variables son del motor, no de la llamada: restaurarlas
+            for k in variables:
+                api.SetVariable(k, "")
+            api.Clear()
+
+    def image_to_data(self, image, config: str) -> pd.DataFrame:
+        tsv = self._run(image, config, lambda api: api.GetTSVText(0))
+        if not tsv:
+            return pd.DataFrame(columns=_TSV_COLUMNS)
+        return pd.read_csv(io.StringIO(tsv), sep="\t", header=None, names=_TSV_COLUMNS,
+                           quoting=3, dtype={"text": str})
+
+    def image_to_string(self, image, config: str) -> str:
+        return self._run(image, config, lambda api: api.GetUTF8Text())
+
+    def osd_rotation(self, image) -> Optional[int]:
+        api = self._engine("osd", 0, 0)
+        try:
+            self._set_image(api, image)
+            osd = api.DetectOrientationScript()
+        finally:
+            api.Clear()
+        if not osd:
+            return None
+        # orient_deg es la orientación del texto; la rotación a aplicar es la complementaria
+        return (360 - int(osd.get("orient_deg", 0))) % 360
+
+    def get_languages(self) -> Set[str]:
+        _, langs = tesserocr.get_languages(self.tessdata_path) if self.tessdata_path else tesserocr.get_languages()
+        return set(langs)
+
+
+_BACKEND = None
+
+
+def get_backend():
+    """Backend del proceso (se crea una vez por worker)"""
+    global _BACKEND
+    if _BACKEND is None:
+        _BACKEND = create_backend(OCR_BACKEND)
+    return _BACKEND
+
+
+def create_backend(kind: str = "auto"):
+    if kind in ("auto", "tesserocr") and tesserocr is not None:
+        try:
+            backend = TesserocrBackend()
+            langs = backend.get_languages()
+            lang = next((l for l in ("spa", "eng") if l in langs), "")
+            # Una llamada OCR real: listar idiomas no prueba que el motor funcione
+            # y los llamadores tratan cualquier excepción como "sin texto"
+            backend.image_to_string(np.full((32, 96), 255, np.uint8),
+                                    f"--psm 7 -l {lang}" if lang else "--psm 7")
+            return backend
+        except Exception:
+            pass  # binding instalado pero sin tessdata o motor utilizable
+    return PytesseractBackend()
@@ -0,0 +1,318 @@
+# modules/ocr_cache.py
+"""
+Caché persistente de resultados OCR (SQLite)
+- Clave: hash SHA-256 del contenido del archivo + versión/config del pipeline OCR
+- Un acierto devuelve textos/confianzas sin invocar Tesseract
+- Desalojo por tamaño máximo (LRU) y por antigüedad
+- Orientación detectada por archivo (independiente de la versión del pipeline)
+
+Uso desde consola:
+    python -m modules.ocr_cache stats
+    python -m modules.ocr_cache prune
+    python -m modules.ocr_cache clear
+    python -m modules.ocr_cache invalidate <archivo> [<archivo> ...]
+"""
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import *
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Hash SHA-256 del contenido de un archivo (lectura por bloques)"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def config_fingerprint() -> str:
+    """
+    Versión efectiva del pipeline OCR. Incluye los parámetros que cambian
+    el texto resultante, para que un cambio de configuración invalide el caché.
+    """
+    from modules.ocr_backend import get_backend
+    return (f"{OCR_PIPELINE_VERSION}|dpi={'-'.join(map(str, OCR_DPI_LADDER))}|adaptive={int(OCR_ADAPTIVE_DPI)}|early={int(OCR_EARLY_EXIT)}"
+            f"|roi={int(OCR_ROI_ENABLED)}|backend={get_backend().name}")
+
+
+class OCRCache:
+    """Caché de resultados OCR en disco, seguro para varios procesos (WAL)"""
+
+    PRUNE_EVERY = 25  # Revisar límites cada N escrituras
+
+    def __init__(self, cache_dir: Path = None, max_mb: float = None,
+                 max_age_days: float = None, version: str = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else OCR_CACHE_DIR
+        self.db_path = self.cache_dir / "ocr_cache.sqlite3"
+        self.max_bytes = int((OCR_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024)
+        self.max_age_days = OCR_CACHE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+        self.version = version or config_fingerprint()
+        self._puts = 0
+        self._conn = None
+
+    # ------------------------------------------------------------------
+    # Conexión
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ocr_results (
+                    file_hash   TEXT NOT NULL,
+                    version     TEXT NOT NULL,
+                    payload     TEXT NOT NULL,
+                    size_bytes  INTEGER NOT NULL,
+                    created_at  REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (file_hash, version)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_last_access ON ocr_results(last_access)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS orientations (
+                    file_hash   TEXT PRIMARY KEY,
+                    angle       INTEGER NOT NULL,
+                    method      TEXT NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        """Cierra la conexión (se reabre sola si se vuelve a usar)"""
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    # ------------------------------------------------------------------
+    # Lectura / escritura
+    # ------------------------------------------------------------------
+    def get(self, file_hash: str) -> Optional[Dict]:
+        """
+        Retorna {'texts', 'confidences', ...} o None si no hay acierto.
+        Cualquier error del caché se trata como 'no acierto'.
+        """
+        if not file_hash:
+            return None
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT payload FROM ocr_results WHERE file_hash = ? AND version = ?",
+                (file_hash, self.version)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE ocr_results SET last_access = ? WHERE file_hash = ? AND version = ?",
+                (time.time(), file_hash, self.version)
+            )
+            conn.commit()
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError):
+            return None
+
+    def put(self, file_hash: str, texts: List[str], confidences: List[float],
+            extra: Optional[Dict] = None):
+        """Guarda el resultado OCR de un archivo"""
+        if not file_hash:
+            return
+        payload = {
+            'texts': list(texts),
+            'confidences': [float(c) for c in confidences],
+        }
+        if extra:
+            payload.update(extra)
+        data = json.dumps(payload, ensure_ascii=False)
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO ocr_results "
+                "(file_hash, version, payload, size_bytes, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (file_hash, self.version, data, len(data.encode('utf-8')), now, now)
+            )
+            conn.commit()
+        except sqlite3.Error:
+            return
+
+        self._puts += 1
+        if self._puts % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def get_orientation(self, file_hash: str) -> Optional[int]:
+        """Rotación (0/90/180/270) ya decidida para este archivo, o None"""
+        if not file_hash:
+            return None
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT angle FROM orientations WHERE file_hash = ?", (file_hash,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE orientations SET last_access = ? WHERE file_hash = ?", (time.time(), file_hash)
+            )
+            conn.commit()
+            return int(row[0])
+        except sqlite3.Error:
+            return None
+
+    def put_orientation(self, file_hash: str, angle: int, method: str = ""):
+        """Guarda la rotación decidida para un archivo"""
+        if not file_hash:
+            return
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO orientations (file_hash, angle, method, last_access) VALUES (?, ?, ?, ?)",
+                (file_hash, int(angle), method or "", time.time())
+            )
+            conn.commit()
+        except sqlite3.Error:
+            return
+
+    # ------------------------------------------------------------------
+    # Mantenimiento
+    # ------------------------------------------------------------------
+    def prune(self) -> int:
+        """
+        Aplica límites: elimina entradas de versiones antiguas, entradas sin uso
+        por más de max_age_days y, si se supera max_bytes, las menos usadas.
+        Retorna la cantidad de entradas eliminadas.
+        """
+        try:
+            conn = self._connect()
+            removed = conn.execute(
+                "DELETE FROM ocr_results WHERE version != ?", (self.version,)
+            ).rowcount
+
+            if self.max_age_days:
+                limite = time.time() - self.max_age_days * 86400
+                removed += conn.execute(
+                    "DELETE FROM ocr_results WHERE last_access < ?", (limite,)
+                ).rowcount
+                conn.execute("DELETE FROM orientations WHERE last_access < ?", (limite,))
+
+            total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM ocr_results").fetchone()[0]
+            if self.max_bytes and total > self.max_bytes:
+                exceso = total - self.max_bytes
+                rows = conn.execute(
+                    "SELECT file_hash, version, size_bytes FROM ocr_results ORDER BY last_access ASC"
+                ).fetchall()
+                victimas = []
+                for file_hash, version, size in rows:
+                    if exceso <= 0:
+                        break
+                    victimas.append((file_hash, version))
+                    exceso -= size
+                conn.executemany(
+                    "DELETE FROM ocr_results WHERE file_hash = ? AND version = ?", victimas
+                )
+                removed += len(victimas)
+
+            conn.commit()
+            return removed
+        except sqlite3.Error:
+            return 0
+
+    def invalidate(self, file_hash: str) -> int:
+        """Elimina todas las versiones cacheadas de un archivo"""
+        try:
+            conn = self._connect()
+            n = conn.execute("DELETE FROM ocr_results WHERE file_hash = ?", (file_hash,)).rowcount
+            conn.execute("DELETE FROM orientations WHERE file_hash = ?", (file_hash,))
+            conn.commit()
+            return n
+        except sqlite3.Error:
+            return 0
+
+    def clear(self) -> int:
+        """Vacía el caché completo"""
+        try:
+            conn = self._connect()
+            n = conn.execute("DELETE FROM ocr_results").rowcount
+            conn.execute("DELETE FROM orientations")
+            conn.commit()
+            conn.execute("VACUUM")
+            return n
+        except sqlite3.Error:
+            return 0
+
+    def stats(self) -> Dict:
+        """Estadísticas del caché"""
+        try:
+            conn = self._connect()
+            total, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM ocr_results"
+            ).fetchone()
+            vigentes = conn.execute(
+                "SELECT COUNT(*) FROM ocr_results WHERE version = ?", (self.version,)
+            ).fetchone()[0]
+            orientaciones = conn.execute("SELECT COUNT(*) FROM orientations").fetchone()[0]
+        except sqlite3.Error:
+            total, size, vigentes, orientaciones = 0, 0, 0, 0
+        return {
+            "entradas": total,
+            "entradas_version_actual": vigentes,
+            "orientaciones": orientaciones,
+            "tamano_mb": round(size / (1024 * 1024), 2),
+            "limite_mb": round(self.max_bytes / (1024 * 1024), 2),
+            "version": self.version,
+            "ruta": str(self.db_path),
+        }
+
+
+def main(argv=None):
+    """Comandos de mantenimiento del caché OCR"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mantenimiento del caché OCR")
+    parser.add_argument("--cache-dir", default=None, help="Directorio del caché (por defecto config.OCR_CACHE_DIR)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="Muestra estadísticas")
+    sub.add_parser("prune", help="Aplica límites de tamaño/antigüedad y elimina versiones antiguas")
+    sub.add_parser("clear", help="Vacía el caché completo")
+    inv = sub.add_parser("invalidate", help="Invalida archivos específicos")
+    inv.add_argument("archivos", nargs="+")
+    args = parser.parse_args(argv)
+
+    cache = OCRCache(cache_dir=args.cache_dir)
+    if args.cmd == "stats":
+        for k, v in cache.stats().items():
+            print(f"{k}: {v}")
+    elif args.cmd == "prune":
+        print(f"Entradas eliminadas: {cache.prune()}")
+    elif args.cmd == "clear":
+        print(f"Entradas eliminadas: {cache.clear()}")
+    elif args.cmd == "invalidate":
+        total = 0
+        for archivo in args.archivos:
+            p = Path(archivo)
+            if not p.is_file():
+                print(f"⚠️ No existe: {archivo}")
+                continue
+            total += cache.invalidate(file_sha256(p))
+        print(f"Entradas eliminadas: {total}")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
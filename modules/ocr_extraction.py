@@ -6,18 +6,24 @@ Versión 3.1 - Combina lo mejor del código original con mejoras
 import cv2
 import numpy as np
 from pdf2image import convert_from_path
-from PIL import Image, ImageOps, ImageFilter
+from PIL import Image
 import pytesseract
 from pypdf import PdfReader
 from pathlib import Path
 import re
 import sys
-from typing import Tuple, List, Optional
-from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, List, Optional, Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import os
 
 sys.path.append(str(Path(__file__).parent.parent))
 from config import *
 from modules.utils import *
+from modules.ocr_backend import get_backend
+from modules.instrumentation import StageTimer
+from modules.timbre import decode_timbre
+from modules.page_artifacts import PageArtifacts, gamma_lut, unsharp_into
 
 # Configurar Tesseract
 _TESS_CMD = detect_tesseract_cmd()
@@ -31,77 +37,66 @@ class ImagePreprocessor:
     """Preprocesamiento de imágenes simplificado"""
     
     @staticmethod
-    def correct_orientation(img: np.ndarray) -> np.ndarray:
-        """Corrige orientación si es necesario"""
+    def detect_rotation(img: np.ndarray) -> int:
+        """Grados a rotar (0/90/180/270) según OSD de Tesseract"""
         try:
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if len(img.shape) == 3 else img
-            pil_img = Image.fromarray(gray)
-            osd = pytesseract.image_to_osd(pil_img, config="--psm 0")
-            
-            rotation = re.search(r'Rotate:\s+(\d+)', osd)
-            if rotation:
-                angle = int(rotation.group(1))
-                if angle == 90:
-                    return cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE)
-                elif angle == 180:
-                    return cv2.rotate(img, cv2.ROTATE_180)
-                elif angle == 270:
-                    return cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE)
+            return get_backend().osd_rotation(gray) or 0
         except Exception:
-            pass
-        
+            return 0
+
+    @staticmethod
+    def rotate(img: np.ndarray, angle: int) -> np.ndarray:
+        """Aplica una rotación detectada con detect_rotation"""
+        if angle == 90:
+            return cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE)
+        elif angle == 180:
+            return cv2.rotate(img, cv2.ROTATE_180)
+        elif angle == 270:
+            return cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE)
         return img
+
+    @staticmethod
+    def text_line_ratio(gray: np.ndarray, work_width: int = 800) -> float:
+        """
+        Perfiles de proyección sobre una copia reducida: con líneas de texto
+        horizontales las filas alternan tinta/blanco (varianza alta) y las columnas no.
+        Retorna varianza_filas / varianza_columnas (>1 = texto horizontal).
+        """
+        h, w = gray.shape[:2]
+        scale = min(1.0, work_width / float(max(h, w)))
+        small = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        _, inv = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+        ink = inv.astype(np.float32) / 255.0
+        rows, cols = ink.mean(axis=1), ink.mean(axis=0)
+        if rows.mean() <= 0 or cols.mean() <= 0:
+            return 0.0
+        var_rows = float((rows / rows.mean()).var())
+        var_cols = float((cols / cols.mean()).var())
+        return var_rows / var_cols if var_cols > 0 else float('inf')
+
+    @staticmethod
+    def correct_orientation(img: np.ndarray) -> np.ndarray:
+        """Corrige orientación si es necesario"""
+        return ImagePreprocessor.rotate(img, ImagePreprocessor.detect_rotation(img))
     
     @staticmethod
     def unsharp_mask(gray: np.ndarray, amount: float = 1.5, sigma: float = 1.0) -> np.ndarray:
         """Aplica unsharp mask para mejorar nitidez"""
-        blur = cv2.GaussianBlur(gray, (0, 0), sigmaX=sigma)
-        return cv2.addWeighted(gray, amount, blur, -(amount - 1), 0)
+        return unsharp_into(gray, amount, sigma)
     
     @staticmethod
     def apply_gamma(gray: np.ndarray, gamma: float = 0.7) -> np.ndarray:
-        """Ajusta gamma para aclarar/oscurecer"""
-        normalized = np.clip(gray, 0, 255).astype(np.float32) / 255.0
-        corrected = np.power(normalized, gamma)
-        return np.clip(corrected * 255.0, 0, 255).astype(np.uint8)
+        """Ajusta gamma para aclarar/oscurecer (LUT uint8)"""
+        return cv2.LUT(gray, gamma_lut(gamma))
 
 
-def _enhance_for_text_pil(img: Image.Image) -> Image.Image:
-    """
-    Mejora suave para texto (CLAHE si hay OpenCV, si no PIL).
-    Evita binarizados agresivos que borren trazos finos.
-    """
-    if not isinstance(img, Image.Image):
-        img = Image.fromarray(img)
-
-    # Con OpenCV (mejor)
-    try:
-        import cv2, numpy as np
-        arr = np.array(img.convert("RGB"))
-        gray = cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
-        gray = cv2.bilateralFilter(gray, d=5, sigmaColor=50, sigmaSpace=50)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        eq = clahe.apply(gray)
-        th = cv2.adaptiveThreshold(eq, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                   cv2.THRESH_BINARY, 31, 10)
-        kernel = np.ones((2, 2), np.uint8)
-        th = cv2.morphologyEx(th, cv2.MORPH_OPEN, kernel, iterations=1)
-        return Image.fromarray(th)
-    except Exception:
-        # Solo PIL (fallback)
-        pil = img.convert("RGB")
-        pil = ImageOps.autocontrast(pil)
-        pil = pil.filter(ImageFilter.MedianFilter(size=3))
-        g = pil.convert("L")
-        arr = np.array(g)
-        thr = (arr > 180).astype("uint8") * 255
-        return Image.fromarray(thr)
-
-
-def _tesseract_simple(img: Image.Image, psm: int = 6, oem: int = 1, lang: str = "spa") -> str:
+def _tesseract_simple(img: np.ndarray, psm: int = 6, oem: int = 1, lang: str = "spa") -> str:
     config = f"--oem {oem} --psm {psm}"
     try:
-        return pytesseract.image_to_string(img, lang=lang, config=config)
+        if lang:
+            config += f" -l {lang}"
+        return get_backend().image_to_string(img, config)
     except Exception:
         return ""
 
@@ -109,14 +104,16 @@ def _tesseract_simple(img: Image.Image, psm: int = 6, oem: int = 1, lang: str =
 def ocr_two_passes(image) -> str:
     """
     1) Pasada sin binarizar agresivo (gris + autocontrast).
-    2) Pasada con mejora (CLAHE/threshold suave).
+    2) Pasada con mejora (CLAHE/threshold suave, PageArtifacts.texto, también la preview de revisión).
     Se elige el texto con mejor 'puntaje' semántico para boletas.
     """
-    pil = image if isinstance(image, Image.Image) else Image.fromarray(image)
+    if isinstance(image, Image.Image):
+        image = np.array(image.convert("L"))
+    pagina = PageArtifacts.of(image)
     # Pasada 1 (gris, sin binarizar fuerte)
-    txt1 = _tesseract_simple(ImageOps.autocontrast(pil.convert("L")), psm=6, oem=1)
+    txt1 = _tesseract_simple(pagina.autocontraste, psm=6, oem=1)
     # Pasada 2 (mejorada)
-    txt2 = _tesseract_simple(_enhance_for_text_pil(pil), psm=6, oem=1)
+    txt2 = _tesseract_simple(pagina.texto, psm=6, oem=1)
 
     def score(t: str) -> int:
         s = 0
@@ -128,16 +125,259 @@ def ocr_two_passes(image) -> str:
 
     return txt1 if score(txt1) >= score(txt2) else txt2
 
+
+_ORIENT_KEYWORDS_RE = re.compile(r'(?i)boleta|honorario|\bR\.?U\.?T\b|se[ñn]or|fecha|total')
+_KEY_TOTAL_RE = re.compile(r'(?i)total\s+honorarios?\s*\$?\s*[:\-]?\s*(\d{1,3}(?:[.,]\d{3})+|\d{5,9})(?!\d)')
+_KEY_FECHA_RE = re.compile(
+    r'(?i)\b\d{1,2}\s*de\s*(?:enero|febrero|marzo|abril|mayo|junio|julio|agosto|'
+    r'septiembre|setiembre|octubre|noviembre|diciembre)\s*de\s*\d{2,4}'
+    r'|\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b'
+)
+
+
+def key_fields_found(text: str) -> Dict[str, bool]:
+    """
+    Campos clave presentes en un texto OCR (criterio de salida temprana):
+    RUT con DV válido, monto 'Total Honorarios' plausible y una fecha.
+    """
+    found = {'rut': False, 'monto': False, 'fecha': False}
+    if not text:
+        return found
+
+    found['rut'] = any(dv_ok(m.group(1)) for m in RUT_RE.finditer(text))
+
+    for m in _KEY_TOTAL_RE.finditer(text):
+        normalized = normaliza_monto(m.group(1))
+        try:
+            if normalized and plaus_amount(float(normalized)):
+                found['monto'] = True
+                break
+        except ValueError:
+            continue
+
+    found['fecha'] = bool(_KEY_FECHA_RE.search(text))
+    return found
+
+
+def has_key_fields(text: str) -> bool:
+    """True si el texto ya trae RUT válido, Total Honorarios y fecha"""
+    return all(key_fields_found(text).values())
+
+
+# Productores típicos de escáneres y apps de digitalización
+_SCANNER_PRODUCER_RE = re.compile(
+    r'(?i)scan|canon|epson|xerox|ricoh|kyocera|brother|konica|fujitsu|naps2|abbyy|ocrmypdf|paperport|\bhp\b'
+)
+_HSPACE_RUN_RE = re.compile(r'[ \t\u00A0]+')
+
+
+def _pdf_resources(obj, fonts: int = 0, images: Optional[List[Tuple[int, int]]] = None, depth: int = 0):
+    """(N° de fuentes, [(ancho, alto) de cada imagen]) de la página y sus Form XObjects"""
+    images = [] if images is None else images
+    resources = obj.get('/Resources')
+    if resources is None or depth > 3:
+        return fonts, images
+    resources = resources.get_object()
+    font_dict = resources.get('/Font')
+    if font_dict is not None:
+        fonts += len(font_dict.get_object())
+    xobjects = resources.get('/XObject')
+    if xobjects is not None:
+        for xobj in xobjects.get_object().values():
+            xobj = xobj.get_object()
+            subtype = xobj.get('/Subtype')
+            if subtype == '/Image':
+                images.append((int(xobj.get('/Width', 0)), int(xobj.get('/Height', 0))))
+            elif subtype == '/Form':
+                fonts, images = _pdf_resources(xobj, fonts, images, depth + 1)
+    return fonts, images
+
+
+def classify_pdf_page(page, producer: str = "") -> str:
+    """
+    Clasifica una página PDF solo por su estructura, sin extraer texto:
+    - 'digital':       fuentes y ninguna imagen de página completa (p. ej. boleta del SII)
+    - 'escaneado_ocr': imagen de página + capa de texto de un escáner (texto a validar)
+    - 'escaneado':     imagen de página sin fuentes
+    - 'vectorial':     sin fuentes ni imágenes (texto en curvas): requiere OCR
+    """
+    fonts, images = _pdf_resources(page)
+    box = page.mediabox
+    min_px = (float(box.width) / 72 * PDF_SCAN_MIN_DPI) * (float(box.height) / 72 * PDF_SCAN_MIN_DPI) * 0.5
+    page_image = any(w * h >= min_px for w, h in images)
+
+    if not page_image:
+        return 'digital' if fonts else 'vectorial'
+    if not fonts:
+        return 'escaneado'
+    # Imagen de página con texto: capa OCR de escáner, o un fondo/membrete en un PDF generado
+    return 'escaneado_ocr' if _SCANNER_PRODUCER_RE.search(producer or "") else 'digital'
+
+
+def _page_text_lines(page) -> str:
+    """Texto de la página conservando las líneas (modo layout de pypdf si está disponible)"""
+    try:
+        text = page.extract_text(extraction_mode="layout")
+    except Exception:
+        text = page.extract_text()
+    lines = (_HSPACE_RUN_RE.sub(' ', line).strip() for line in (text or "").splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def pdf_page_to_image(pdf_path: Path, dpi: int = OCR_DPI, page_idx: int = 0) -> Image.Image:
+    """Convierte UNA página del PDF (0 = primera) a imagen"""
+    kwargs = {'dpi': dpi, 'first_page': page_idx + 1, 'last_page': page_idx + 1}
+    if POPPLER_BIN_DIR:
+        kwargs['poppler_path'] = POPPLER_BIN_DIR
+        kwargs['use_pdftocairo'] = True
+    # convert_from_path devuelve una lista; tomas el primer elemento
+    return convert_from_path(str(pdf_path), **kwargs)[0]
+
+
+def pdf_dpi_ladder() -> Tuple[int, ...]:
+    """DPI que se prueban en los PDF escaneados, en orden"""
+    return tuple(OCR_DPI_LADDER) if OCR_ADAPTIVE_DPI else (OCR_DPI_LADDER[-1],)
+
+
+class OCRVariantStats:
+    """
+    Historial de victorias por variante de preprocesamiento y PSM.
+    Ordena la búsqueda escalonada: primero lo que históricamente gana.
+    Los workers solo leen; el proceso principal consolida y guarda.
+    """
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path) if path else OCR_STATS_PATH
+        self.variantes: Dict[str, int] = {}
+        self.psm: Dict[str, int] = {}
+        self.dpi: Dict[str, int] = {}  # DPI final que necesitó cada archivo escaneado
+        self._load()
+
+    def _load(self):
+        try:
+            if self.path.exists():
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                self.variantes = {str(k): int(v) for k, v in data.get("variantes", {}).items()}
+                self.psm = {str(k): int(v) for k, v in data.get("psm", {}).items()}
+                self.dpi = {str(k): int(v) for k, v in data.get("dpi", {}).items()}
+        except Exception:
+            self.variantes, self.psm, self.dpi = {}, {}, {}
+
+    def save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix('.tmp')
+            tmp.write_text(json.dumps({"variantes": self.variantes, "psm": self.psm, "dpi": self.dpi},
+                                      ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar estadísticas OCR: {e}")
+
+    def order_variants(self, names) -> List[str]:
+        """Ordena por victorias (desc); empates conservan el orden configurado"""
+        names = list(names)
+        return sorted(names, key=lambda n: (-self.variantes.get(n, 0), names.index(n)))
+
+    def order_psms(self, psms) -> List[int]:
+        psms = list(psms)
+        return sorted(psms, key=lambda p: (-self.psm.get(str(p), 0), psms.index(p)))
+
+    def record(self, variante: str, psm: Optional[int]):
+        if variante:
+            self.variantes[variante] = self.variantes.get(variante, 0) + 1
+        if psm is not None:
+            self.psm[str(psm)] = self.psm.get(str(psm), 0) + 1
+
+    def merge_results(self, results: List[Dict]) -> int:
+        """
+        Suma las victorias reportadas por los workers (campos ocr_variante/ocr_psm).
+        Solo cuentan las de la búsqueda escalonada: la doble pasada ('two_passes'),
+        las zonas ('roi'), el timbre y el texto embebido no compiten en ese orden
+        y su PSM no es uno que la búsqueda haya probado.
+        """
+        n = 0
+        for r in results:
+            if r.get('ocr_cache'):
+                continue  # un acierto de caché no es una nueva victoria
+            if r.get('ocr_variante') in OCR_VARIANT_ORDER:
+                self.record(r['ocr_variante'], r.get('ocr_psm'))
+                n += 1
+            if r.get('ocr_dpi'):
+                k = str(r['ocr_dpi'])
+                self.dpi[k] = self.dpi.get(k, 0) + 1
+        return n
+
+
+def dpi_summary(results: List[Dict]) -> Dict[int, int]:
+    """Cantidad de archivos por DPI final de renderizado en una corrida"""
+    summary: Dict[int, int] = {}
+    for r in results:
+        if r.get('ocr_dpi') and not r.get('ocr_cache'):
+            summary[int(r['ocr_dpi'])] = summary.get(int(r['ocr_dpi']), 0) + 1
+    return dict(sorted(summary.items()))
+
+
+def update_variant_stats(results: List[Dict]) -> int:
+    """Consolida en disco las victorias de variante/PSM de una corrida"""
+    stats = OCRVariantStats()
+    n = stats.merge_results(results)
+    if n:
+        stats.save()
+    return n
+
+
+class PaginaPrevia:
+    """
+    Primera página preparada por las etapas anteriores del pipeline por etapas
+    (modules/staged_pipeline): imagen renderizada al primer DPI de la escalera
+    (sin rotar, vista sobre memoria compartida), orientación ya decidida o texto
+    embebido utilizable. Los campos en None se resuelven como en el camino normal.
+    """
+
+    def __init__(self, imagen: Optional[np.ndarray] = None, dpi: Optional[int] = None,
+                 angulo: Optional[int] = None, orientacion_metodo: str = "",
+                 texto_embebido: str = "", pdf_tipo: str = "",
+                 llamadas_ocr: int = 0, pixeles_ocr: int = 0,
+                 timbre: Optional[Dict] = None):
+        self.imagen = imagen
+        self.dpi = dpi
+        self.angulo = angulo
+        self.orientacion_metodo = orientacion_metodo
+        self.texto_embebido = texto_embebido
+        self.pdf_tipo = pdf_tipo  # classify_pdf_page
+        # Llamadas a Tesseract de la detección de orientación (etapa de preproceso)
+        self.llamadas_ocr = llamadas_ocr
+        self.pixeles_ocr = pixeles_ocr
+        # Timbre leído en la etapa de preproceso ({} = se buscó y no se pudo leer)
+        self.timbre = timbre
+
+
 class OCRExtractorOptimized:
     """Extractor OCR optimizado con múltiples variantes"""
     
-    def __init__(self):
+    def __init__(self, orientation_store=None, ocr_threads: int = 1, memory=None):
         self.preprocessor = ImagePreprocessor()
+        # Hilos para repartir variantes/PSM de UN documento (lotes pequeños, ver ocr_threads_for)
+        self.ocr_threads = max(1, int(ocr_threads or 1))
+        self._ocr_pool = None
         self.cache = {}
+        # Almacén opcional de orientaciones por hash de archivo (OCRCache)
+        self.orientation_store = orientation_store
+        # Memoria persistente opcional: con timbre y nombre/convenio conocidos no hay OCR
+        self.memory = memory
+        self.variant_stats = OCRVariantStats()
+        self.backend = get_backend()
+        # Detalle de la última búsqueda (variante/PSM ganadores, llamadas a Tesseract)
+        self.last_run: Dict = {}
+        # Tope de last_run['llamadas_ocr'] para la búsqueda en curso (None = sin tope)
+        self._limite_llamadas: Optional[int] = None
+        # Tiempos por etapa del documento en curso (DataProcessorOptimized.process_file
+        # asigna uno nuevo por archivo)
+        self.timer = StageTimer()
         
         # Detectar idiomas disponibles
         try:
-            langs_available = set(pytesseract.get_languages(config=''))
+            langs_available = self.backend.get_languages()
             if 'spa' in langs_available:
                 self.ocr_lang = 'spa'
             elif 'eng' in langs_available:
@@ -147,167 +387,496 @@ class OCRExtractorOptimized:
         except Exception:
             self.ocr_lang = ''
     
-    def preprocess_variants(self, gray: np.ndarray) -> List[Tuple[str, np.ndarray]]:
+    def iter_preprocess_variants(self, gray, order=None):
+        """
+        Genera variantes de preprocesamiento de forma perezosa, en el orden pedido,
+        a partir del gris compartido de la página (ndarray o PageArtifacts)
+        """
+        pagina = PageArtifacts.of(gray, self.timer)
+        for name in (order or OCR_VARIANT_ORDER):
+            try:
+                with self.timer.stage('preproceso'):
+                    variant_img = pagina.variante(name)
+            except Exception:
+                continue
+            yield name, variant_img
+
+    def preprocess_variants(self, gray) -> List[Tuple[str, np.ndarray]]:
         """Genera variantes de preprocesamiento"""
-        variants = []
-        
-        # 1. Otsu básico con mejoras
-        try:
-            enhanced = cv2.convertScaleAbs(gray, alpha=1.2, beta=10)
-            sharp = self.preprocessor.unsharp_mask(enhanced, 1.5, 1.0)
-            _, otsu = cv2.threshold(sharp, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
-            otsu = cv2.morphologyEx(otsu, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
-            variants.append(("otsu", otsu))
-        except Exception:
-            pass
-        
-        # 2. CLAHE + Otsu (bueno para iluminación variable)
-        try:
-            clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-            cl = clahe.apply(gray)
-            sharp = self.preprocessor.unsharp_mask(cl, 1.6, 1.0)
-            _, otsu = cv2.threshold(sharp, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
-            otsu = cv2.morphologyEx(otsu, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
-            variants.append(("clahe_otsu", otsu))
-        except Exception:
-            pass
+        return list(self.iter_preprocess_variants(gray))
+    
+    def _ocr_data(self, image: np.ndarray, psm: int) -> Tuple[str, float]:
+        """Una llamada a Tesseract (image_to_data): texto por palabra + confianza media"""
+        import pandas as pd
+
+        config = f"--oem 3 --psm {psm}"
+        if self.ocr_lang:
+            config += f" -l {self.ocr_lang}"
         
-        # 3. Gamma correction + Otsu (para documentos oscuros)
         try:
-            gamma_corrected = self.preprocessor.apply_gamma(gray, 0.7)
-            sharp = self.preprocessor.unsharp_mask(gamma_corrected, 1.7, 1.0)
-            _, otsu = cv2.threshold(sharp, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
-            variants.append(("gamma_otsu", otsu))
+            with self.timer.stage('tesseract'):
+                df = self.backend.image_to_data(image, config)
+            
+            if not isinstance(df, pd.DataFrame) or df.empty:
+                return "", 0.0
+            
+            # Filtrar y extraer texto
+            valid_data = df[df['conf'] >= 0]
+            texts = [str(t) for t in valid_data['text'].dropna() if str(t).strip()]
+            
+            if not texts:
+                return "", 0.0
+            
+            # Calcular confianza
+            confidences = pd.to_numeric(valid_data['conf'], errors='coerce')
+            confidences = confidences[confidences >= 0]
+            avg_conf = float(confidences.mean() / 100) if not confidences.empty else 0.0
+            
+            return "\n".join(texts), avg_conf
+            
         except Exception:
-            pass
-        
-        # 4. Adaptive Gaussian (robusto para fondos variables)
+            return "", 0.0
+
+    def _ocr_lines(self, image: np.ndarray, config: str) -> Tuple[str, float]:
+        """
+        OCR conservando líneas (agrupa palabras por bloque/párrafo/línea de image_to_data),
+        que es lo que esperan los extractores por línea de FieldExtractor.
+        """
+        import pandas as pd
+
+        if self.ocr_lang:
+            config += f" -l {self.ocr_lang}"
         try:
-            enhanced = cv2.convertScaleAbs(gray, alpha=1.3, beta=5)
-            adaptive = cv2.adaptiveThreshold(
-                enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                cv2.THRESH_BINARY, 35, 10
-            )
-            adaptive = cv2.morphologyEx(adaptive, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
-            variants.append(("adaptive_gauss", adaptive))
+            with self.timer.stage('tesseract'):
+                df = self.backend.image_to_data(image, config)
         except Exception:
-            pass
-        
-        return variants
-    
-    def ocr_image(self, img_bin: np.ndarray) -> Tuple[str, float]:
-        """Ejecuta OCR con múltiples configuraciones"""
-        import pandas as pd
-        
-        def try_ocr(image, psm):
-            config = f"--oem 3 --psm {psm}"
-            if self.ocr_lang:
-                config += f" -l {self.ocr_lang}"
-            
+            return "", 0.0
+
+        if not isinstance(df, pd.DataFrame) or df.empty:
+            return "", 0.0
+        valid = df[(df['conf'] >= 0) & df['text'].notna()].copy()
+        valid['text'] = valid['text'].astype(str).str.strip()
+        valid = valid[valid['text'] != '']
+        if valid.empty:
+            return "", 0.0
+
+        lines = [
+            " ".join(g['text'])
+            for _, g in valid.groupby(['block_num', 'par_num', 'line_num'], sort=True)
+        ]
+        conf = float(pd.to_numeric(valid['conf'], errors='coerce').mean() / 100)
+        return "\n".join(lines), conf
+
+    def ocr_regions(self, img,
+                    zonas: Tuple[str, ...] = ("encabezado", "fecha", "glosa", "totales")) -> Tuple[str, float, np.ndarray]:
+        """
+        OCR por zonas del layout SII (encabezado, fecha, glosa, totales), cada una con
+        su configuración de PSM/whitelist. La imagen (ndarray o PageArtifacts)
+        debe venir ya orientada.
+        Retorna (texto_concatenado, confianza_media, gris_de_la_pagina).
+        """
+        from modules.layout import BoletaLayoutDetector, crop
+
+        gray = PageArtifacts.of(img, self.timer).gris
+        zones, metodo = BoletaLayoutDetector().detect(gray)
+        self.last_run['layout'] = metodo
+
+        jobs = []
+        for name in zonas:
+            box = zones.get(name)
+            if box is None:
+                continue
+            zona = crop(gray, box)
+            if zona.size == 0:
+                continue
             try:
-                df = pytesseract.image_to_data(
-                    image, 
-                    config=config, 
-                    output_type=pytesseract.Output.DATAFRAME
-                )
-                
-                if not isinstance(df, pd.DataFrame) or df.empty:
-                    return "", 0.0
-                
-                # Filtrar y extraer texto
-                valid_data = df[df['conf'] >= 0]
-                texts = [str(t) for t in valid_data['text'].dropna() if str(t).strip()]
-                
-                if not texts:
-                    return "", 0.0
-                
-                # Calcular confianza
-                confidences = pd.to_numeric(valid_data['conf'], errors='coerce')
-                confidences = confidences[confidences >= 0]
-                avg_conf = float(confidences.mean() / 100) if not confidences.empty else 0.0
-                
-                return "\n".join(texts), avg_conf
-                
+                _, zona_bin = cv2.threshold(zona, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
             except Exception:
-                return "", 0.0
-        
-        # Probar diferentes PSM (Page Segmentation Modes)
+                zona_bin = zona
+            jobs.append((zona_bin, ROI_OCR_CONFIGS.get(name, "--oem 3 --psm 6")))
+
+        pool = self._get_ocr_pool()
+        if pool is not None:
+            resultados = list(pool.map(lambda job: self._ocr_lines(*job), jobs))
+        else:
+            resultados = [self._ocr_lines(*job) for job in jobs]
+
+        partes, confs = [], []
+        for (zona_bin, _), (text, conf) in zip(jobs, resultados):
+            self._count_ocr_call(zona_bin)
+            if text:
+                partes.append(text)
+                confs.append(conf)
+
+        text = "\n".join(partes)
+        conf = sum(confs) / len(confs) if confs else 0.0
+        return text, conf, gray
+
+    def ocr_image(self, img_bin: np.ndarray) -> Tuple[str, float]:
+        """Ejecuta OCR con múltiples configuraciones"""
+        text, conf, _, _ = self._ocr_variant(img_bin, early_exit=False)
+        return text, conf
+
+    def _ocr_variant(self, img_bin: np.ndarray, early_exit: bool = OCR_EARLY_EXIT) -> Tuple[str, float, Optional[int], bool]:
+        """
+        Prueba los PSM (ordenados por historial) sobre una variante.
+        Retorna (texto, confianza, psm_ganador, campos_clave_completos).
+        Con early_exit se detiene en el primer PSM cuyo texto ya trae los campos clave.
+        """
         best_text = ""
         best_conf = 0.0
+        best_psm = None
         
-        for psm in [6, 4, 11]:  # 6=bloque uniforme, 4=columna única, 11=sparse
-            text, conf = try_ocr(img_bin, psm)
+        for psm in self.variant_stats.order_psms(OCR_PSM_ORDER):
+            if self._sin_presupuesto():
+                break
+            text, conf = self._ocr_data(img_bin, psm)
+            self._count_ocr_call(img_bin)
+            
+            if early_exit and has_key_fields(text):
+                return text, conf, psm, True
             
             if len(text.strip()) > len(best_text.strip()):
                 best_text = text
                 best_conf = conf
+                best_psm = psm
         
         # Si todo falla, intentar con imagen invertida
-        if len(best_text.strip()) < 10:
+        if len(best_text.strip()) < 10 and not self._sin_presupuesto():
             inverted = 255 - img_bin
-            text, conf = try_ocr(inverted, 6)
+            text, conf = self._ocr_data(inverted, 6)
+            self._count_ocr_call(inverted)
             if len(text.strip()) > len(best_text.strip()):
                 best_text = text
                 best_conf = conf
+                best_psm = 6
         
-        return best_text, best_conf
+        return best_text, best_conf, best_psm, (early_exit and has_key_fields(best_text))
     
-    def process_image_optimized(self, img: np.ndarray) -> Tuple[str, float, np.ndarray]:
-        """Procesa una imagen con múltiples variantes"""
-        # Corregir orientación
-        img = self.preprocessor.correct_orientation(img)
-        
-        # Convertir a escala de grises
+    def _get_ocr_pool(self) -> Optional[ThreadPoolExecutor]:
+        """Pool de hilos del extractor (None si se trabaja en secuencia)"""
+        if self.ocr_threads <= 1:
+            return None
+        if self._ocr_pool is None:
+            self._ocr_pool = ThreadPoolExecutor(max_workers=self.ocr_threads, thread_name_prefix="ocr")
+        return self._ocr_pool
+
+    def set_ocr_threads(self, n: int):
+        """Cambia el paralelismo interno (cierra el pool anterior)"""
+        n = max(1, int(n or 1))
+        if n != self.ocr_threads and self._ocr_pool is not None:
+            self._ocr_pool.shutdown(wait=True)
+            self._ocr_pool = None
+        self.ocr_threads = n
+
+    def _iter_variant_results(self, gray, order: List[str]):
+        """
+        Resultados por variante en orden de prioridad:
+        (nombre, imagen, texto, confianza, psm, completo). Secuencial y perezoso:
+        una variante solo se genera y se lee si la anterior no trajo los campos clave
+        (ni se agotó el tope de llamadas).
+        """
+        for name, variant_img in self.iter_preprocess_variants(gray, order):
+            text, conf, psm, completo = self._ocr_variant(variant_img)
+            yield name, variant_img, text, conf, psm, completo
+            if self._sin_presupuesto():
+                return
+
+    def _iter_variant_results_parallel(self, gray, order: List[str]):
+        """
+        Igual que _iter_variant_results, pero reparte los trabajos (variante, PSM)
+        en el pool de hilos. Al aparecer un texto con los campos clave se cancelan
+        los trabajos pendientes y se entrega el completo de mayor prioridad.
+        Con tope de llamadas solo se envían los trabajos de mayor prioridad que caben.
+        """
+        pool = self._get_ocr_pool()
+        variants = list(self.iter_preprocess_variants(gray, order))
+        psms = self.variant_stats.order_psms(OCR_PSM_ORDER)
+
+        trabajos = [(vi, pi) for vi in range(len(variants)) for pi in range(len(psms))]
+        restantes = self._llamadas_restantes()
+        if restantes is not None:
+            trabajos = trabajos[:restantes]
+        futures = {}
+        for vi, pi in trabajos:
+            futures[pool.submit(self._ocr_data, variants[vi][1], psms[pi])] = (vi, pi)
+
+        results: Dict[Tuple[int, int], Tuple[str, float]] = {}
+        early = False
+        for fut in as_completed(futures):
+            if fut.cancelled():
+                continue
+            key = futures[fut]
+            try:
+                results[key] = fut.result()
+            except Exception:
+                results[key] = ("", 0.0)
+            self._count_ocr_call(variants[key[0]][1])
+            if OCR_EARLY_EXIT and not early and has_key_fields(results[key][0]):
+                early = True
+                for other in futures:
+                    other.cancel()  # solo afecta a los que aún no empiezan
+
+        for vi, (name, variant_img) in enumerate(variants):
+            best_text, best_conf, best_psm = "", 0.0, None
+            for pi, psm in enumerate(psms):
+                if (vi, pi) not in results:
+                    continue
+                text, conf = results[(vi, pi)]
+                if OCR_EARLY_EXIT and has_key_fields(text):
+                    yield name, variant_img, text, conf, psm, True
+                    return
+                if len(text.strip()) > len(best_text.strip()):
+                    best_text, best_conf, best_psm = text, conf, psm
+            if early:
+                continue  # otra variante trae los campos clave: no gastar en invertidas
+            if len(best_text.strip()) < 10 and not self._sin_presupuesto():
+                inverted = 255 - variant_img
+                text, conf = self._ocr_data(inverted, 6)
+                self._count_ocr_call(inverted)
+                if len(text.strip()) > len(best_text.strip()):
+                    best_text, best_conf, best_psm = text, conf, 6
+            yield name, variant_img, best_text, best_conf, best_psm, False
+
+    def _count_ocr_call(self, image: np.ndarray, n: int = 1):
+        """Contabiliza llamadas a Tesseract y píxeles procesados en last_run y en el timer"""
+        pixeles = n * int(image.shape[0] * image.shape[1])
+        self.last_run['llamadas_ocr'] = self.last_run.get('llamadas_ocr', 0) + n
+        self.last_run['pixeles_ocr'] = self.last_run.get('pixeles_ocr', 0) + pixeles
+        self.timer.count('llamadas_ocr', n)
+        self.timer.count('pixeles_ocr', pixeles)
+
+    def _llamadas_restantes(self) -> Optional[int]:
+        """Llamadas a Tesseract que quedan bajo el tope en curso (None si no hay tope)"""
+        if self._limite_llamadas is None:
+            return None
+        return max(0, self._limite_llamadas - self.last_run.get('llamadas_ocr', 0))
+
+    def _sin_presupuesto(self) -> bool:
+        return self._llamadas_restantes() == 0
+
+    def _new_run(self) -> Dict:
+        self.last_run = {'variante': '', 'psm': None, 'llamadas_ocr': 0,
+                         'pixeles_ocr': 0, 'salida_temprana': False}
+        return self.last_run
+
+    def _orientacion_previa(self, previa: Optional[PaginaPrevia]) -> Optional[int]:
+        """Adopta la orientación decidida en la etapa de preproceso (None si no la hay)"""
+        if previa is None or previa.angulo is None:
+            return None
+        self.last_run.update({'orientacion': previa.angulo, 'orientacion_metodo': previa.orientacion_metodo})
+        self.last_run['llamadas_ocr'] = self.last_run.get('llamadas_ocr', 0) + previa.llamadas_ocr
+        self.last_run['pixeles_ocr'] = self.last_run.get('pixeles_ocr', 0) + previa.pixeles_ocr
+        return previa.angulo
+
+    def read_timbre(self, img: np.ndarray, previa: Optional[PaginaPrevia] = None) -> Optional[Dict]:
+        """
+        Timbre electrónico (PDF417) de la página sin rotar, antes de cualquier OCR;
+        el de la etapa de preproceso si ya se buscó. Queda en last_run['timbre'].
+        """
+        if previa is not None and previa.timbre is not None:
+            timbre = previa.timbre or None
+        elif TIMBRE_ENABLED:
+            with self.timer.stage('timbre'):
+                timbre = decode_timbre(img)
+            if timbre:
+                self.timer.count('timbres')
+        else:
+            timbre = None
+        if timbre:
+            self.last_run['timbre'] = timbre
+        return timbre
+
+    def _timbre_en_memoria(self, timbre: Dict) -> bool:
+        """La memoria ya conoce nombre y convenio del RUT del timbre (no hace falta OCR)"""
+        if not self._nombre_en_memoria(timbre):
+            return False
+        try:
+            return bool(self.memory.get_convenio_by_rut(timbre['rut']))
+        except Exception:
+            return False
+
+    def _nombre_en_memoria(self, timbre: Dict) -> bool:
+        """La memoria ya conoce el nombre del emisor del timbre (el TED no lo trae)"""
+        if self.memory is None:
+            return False
+        try:
+            return bool(self.memory.get_name_by_rut(timbre['rut']))
+        except Exception:
+            return False
+
+    def _orientacion_timbre(self, timbre: Dict) -> int:
+        self.last_run.update({'orientacion': timbre['orientacion'], 'orientacion_metodo': 'timbre'})
+        return timbre['orientacion']
+
+    def ocr_glosa_timbre(self, img, timbre: Dict) -> Tuple[str, float, np.ndarray]:
+        """
+        Con timbre leído el OCR se limita a la zona de la glosa (convenio, horas,
+        decreto), más el encabezado si la memoria no conoce el nombre del emisor
+        (profesional visto por primera vez)
+        """
+        zonas = ("glosa",) if self._nombre_en_memoria(timbre) else ("encabezado", "glosa")
+        with self.timer.stage('roi'):
+            text, conf, gray = self.ocr_regions(img, zonas=zonas)
+        self.last_run.update({'variante': 'timbre_glosa', 'psm': None, 'salida_temprana': True})
+        return text, conf, gray
+
+    def _keyword_hit(self, gray: np.ndarray) -> bool:
+        """OCR rápido de una franja reducida buscando palabras típicas de la boleta"""
+        h, w = gray.shape[:2]
+        scale = min(1.0, OCR_ORIENT_WORK_WIDTH / float(w))
+        band = gray[:int(h * 0.4)]
+        if scale < 1.0:
+            band = cv2.resize(band, (int(w * scale), max(1, int(band.shape[0] * scale))), interpolation=cv2.INTER_AREA)
+        config = "--oem 3 --psm 6"
+        if self.ocr_lang:
+            config += f" -l {self.ocr_lang}"
+        try:
+            with self.timer.stage('tesseract'):
+                text = self.backend.image_to_string(band, config)
+        except Exception:
+            text = ""
+        self._count_ocr_call(band)
+        return bool(_ORIENT_KEYWORDS_RE.search(text or ""))
+
+    def detect_orientation(self, img: np.ndarray, file_hash: str = "") -> int:
+        """
+        Grados a rotar, evitando OSD cuando se puede decidir barato:
+        1) decisión previa guardada para el mismo archivo (hash)
+        2) perfiles de proyección (texto horizontal) + OCR rápido del encabezado
+           con palabra clave: 0° o, si aparece al rotar la franja inferior, 180°
+        3) OSD de Tesseract solo si lo anterior es ambiguo
+        """
+        store = self.orientation_store if file_hash else None
+        if store is not None:
+            angle = store.get_orientation(file_hash)
+            if angle is not None:
+                self.last_run.update({'orientacion': angle, 'orientacion_metodo': 'cache'})
+                return angle
+
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if len(img.shape) == 3 else img
-        
-        # Generar variantes de preprocesamiento
-        variants = self.preprocess_variants(gray)
+        angle, metodo = None, 'osd'
+        if OCR_ORIENT_FAST and self.preprocessor.text_line_ratio(gray) >= OCR_ORIENT_MIN_RATIO:
+            if self._keyword_hit(gray):
+                angle, metodo = 0, 'rapida'
+            elif self._keyword_hit(cv2.rotate(gray, cv2.ROTATE_180)):
+                angle, metodo = 180, 'rapida'
+        if angle is None:
+            with self.timer.stage('tesseract'):
+                angle = self.preprocessor.detect_rotation(gray)
+            self._count_ocr_call(gray)
+
+        self.last_run.update({'orientacion': angle, 'orientacion_metodo': metodo})
+        if store is not None:
+            store.put_orientation(file_hash, angle, metodo)
+        return angle
+
+    def process_image_optimized(self, img, oriented: bool = False,
+                                max_variants: Optional[int] = None,
+                                file_hash: str = "",
+                                previa: Optional[PaginaPrevia] = None) -> Tuple[str, float, np.ndarray]:
+        """
+        Procesa una imagen con búsqueda escalonada de variantes:
+        variantes y PSM en orden de victorias históricas, deteniéndose
+        apenas un texto contiene los campos clave (RUT, Total Honorarios, fecha).
+        max_variants limita la búsqueda a las N variantes más ganadoras.
+        previa.angulo (pipeline por etapas) evita volver a detectar la orientación.
+        Con timbre electrónico legible solo se hace OCR de la glosa, o nada si la
+        memoria ya conoce el RUT (texto vacío).
+        img puede ser un ndarray o los PageArtifacts de la página (gris compartido).
+        """
+        pagina = PageArtifacts.of(img, self.timer)
+        if not oriented:
+            self._new_run()
+            timbre = self.read_timbre(pagina.gris, previa)
+            if timbre and self._timbre_en_memoria(timbre):
+                self.last_run['variante'] = 'timbre'
+                return "", 0.0, None
+            # Corregir orientación
+            with self.timer.stage('orientacion'):
+                angle = self._orientacion_previa(previa)
+                if angle is None:
+                    angle = (self._orientacion_timbre(timbre) if timbre
+                             else self.detect_orientation(pagina.gris, file_hash))
+                pagina = pagina.rotated(angle)
+            if timbre:
+                return self.ocr_glosa_timbre(pagina, timbre)
         
         best_text = ""
         best_conf = 0.0
         best_img = None
+        best_name, best_psm = "", None
         
-        # Procesar cada variante
-        for name, variant_img in variants:
-            text, conf = self.ocr_image(variant_img)
+        order = self.variant_stats.order_variants(OCR_VARIANT_ORDER)[:max_variants]
+        if self.ocr_threads > 1:
+            variant_results = self._iter_variant_results_parallel(pagina, order)
+        else:
+            variant_results = self._iter_variant_results(pagina, order)
+
+        # Variantes y OCR (el tiempo de Tesseract queda en su propia etapa)
+        with self.timer.stage('variantes'):
+            for name, variant_img, text, conf, psm, completo in variant_results:
             
-            if not text:
-                continue
+                if not text:
+                    continue
+
+                if completo:
+                    best_text, best_conf, best_img = text, conf, variant_img
+                    best_name, best_psm = name, psm
+                    self.last_run['salida_temprana'] = True
+                    break
             
-            # Calcular score considerando calidad del texto
-            digit_bonus = min(0.2, len(re.findall(r'\d', text)) * 0.005)
-            keyword_bonus = 0.15 if re.search(r'honorarios?|boleta|total', text, re.IGNORECASE) else 0.0
-            length_bonus = min(0.3, len(text) / 1000.0)
+                # Calcular score considerando calidad del texto
+                digit_bonus = min(0.2, len(re.findall(r'\d', text)) * 0.005)
+                keyword_bonus = 0.15 if re.search(r'honorarios?|boleta|total', text, re.IGNORECASE) else 0.0
+                length_bonus = min(0.3, len(text) / 1000.0)
             
-            score = conf + digit_bonus + keyword_bonus + length_bonus
+                score = conf + digit_bonus + keyword_bonus + length_bonus
             
-            if score > best_conf or len(text) > len(best_text) * 1.5:
-                best_text = text
-                best_conf = conf
-                best_img = variant_img
+                if score > best_conf or len(text) > len(best_text) * 1.5:
+                    best_text = text
+                    best_conf = conf
+                    best_img = variant_img
+                    best_name, best_psm = name, psm
+        
+        self.last_run['variante'] = best_name
+        self.last_run['psm'] = best_psm
         
         return best_text, best_conf, best_img
     
     def extract_text_from_pdf_embedded(self, pdf_path: Path) -> str:
-        """Extrae texto embebido SOLO de la primera página del PDF"""
+        """Extrae texto embebido SOLO de la primera página del PDF (una línea por renglón)"""
         try:
             reader = PdfReader(str(pdf_path))
             if not reader.pages:
                 return ""
-            page = reader.pages[0]
-            text = page.extract_text() or ""
-            return re.sub(r'\s+', ' ', text).strip()
+            return _page_text_lines(reader.pages[0])
         except Exception:
             return ""
 
-    def _pdf_first_page_to_image(self, pdf_path: Path, dpi: int = 600) -> Image.Image:
+    def pdf_digital_text(self, pdf_path: Path) -> Tuple[str, str]:
+        """
+        Carril rápido de PDF nativos: clasifica la primera página por estructura y,
+        salvo escaneos sin capa de texto, extrae su texto con saltos de línea para
+        FieldExtractor. Retorna (texto utilizable o "", tipo de PDF).
+        """
+        try:
+            reader = PdfReader(str(pdf_path))
+            if not reader.pages:
+                return "", ""
+            page = reader.pages[0]
+            producer = str((reader.metadata or {}).get('/Producer', '') or '')
+            tipo = classify_pdf_page(page, producer)
+            if tipo in ('escaneado', 'vectorial'):
+                return "", tipo
+            text = _page_text_lines(page)
+            return (text if self._is_text_usable(text) else ""), tipo
+        except Exception:
+            return "", ""
+
+    def _pdf_first_page_to_image(self, pdf_path: Path, dpi: int = OCR_DPI) -> Image.Image:
         """Convierte SOLO la primera página del PDF a imagen"""
-        kwargs = {'dpi': dpi, 'first_page': 1, 'last_page': 1}
-        if POPPLER_BIN_DIR:
-            kwargs['poppler_path'] = POPPLER_BIN_DIR
-            kwargs['use_pdftocairo'] = True
-        # convert_from_path devuelve una lista; tomas el primer elemento
-        return convert_from_path(str(pdf_path), **kwargs)[0]
+        return pdf_page_to_image(pdf_path, dpi=dpi)
     
     def _is_text_usable(self, text: str) -> bool:
         """Verifica si el texto extraído es utilizable"""
@@ -323,9 +892,9 @@ class OCRExtractorOptimized:
         
         return has_numbers and has_letters and has_keywords
     
-    def _pdf_to_images(self, pdf_path: Path, dpi: int = 800) -> List[Image.Image]:
+    def _pdf_to_images(self, pdf_path: Path, dpi: int = None) -> List[Image.Image]:
         """Convierte PDF a imágenes"""
-        kwargs = {'dpi': dpi}
+        kwargs = {'dpi': dpi or OCR_DPI_LADDER[-1]}
         
         if POPPLER_BIN_DIR:
             kwargs['poppler_path'] = POPPLER_BIN_DIR
@@ -333,24 +902,34 @@ class OCRExtractorOptimized:
         
         return convert_from_path(str(pdf_path), **kwargs)
     
-    def process_pdf_optimized(self, pdf_path: Path) -> Tuple[List[str], List[float], str]:
-        """Procesa SOLO la primera página del PDF (600 DPI)"""
-        # 1) Intentar texto embebido de la primera página
-        embedded_text = self.extract_text_from_pdf_embedded(pdf_path)
-        if embedded_text and self._is_text_usable(embedded_text):
-            return [embedded_text], [0.99], ""
-
-        # 2) Renderizar SOLO la primera página a 600 DPI
-        page_img = self._pdf_first_page_to_image(pdf_path, dpi=600)
-
-        # 3A) Pipeline actual (varias variantes con image_to_data)
-        img_np = np.array(page_img)
-        text_cv, conf_cv, best_img = self.process_image_optimized(img_np)
-
-        # 3B) Doble pasada “suave” (string directo)
-        text_two = ocr_two_passes(page_img)
+    def process_pdf_optimized(self, pdf_path: Path, file_hash: str = "",
+                              previa: Optional[PaginaPrevia] = None) -> Tuple[List[str], List[float], Dict]:
+        """
+        Procesa SOLO la primera página del PDF.
+        Escaneados: escalera de DPI (OCR_DPI_LADDER), se sube de resolución
+        solo si el OCR a la resolución actual no trae los campos clave. Timbre,
+        orientación y zonas se resuelven una vez, en el primer peldaño; con calidad
+        baja se salta el peldaño intermedio, y la escalera completa no supera
+        OCR_MAX_CALLS llamadas (el peor caso de ir directo al DPI más alto).
+        Con previa (pipeline por etapas) el texto embebido ya se revisó y el primer
+        peldaño llega renderizado y con la orientación decidida.
+        Escaneados con timbre electrónico legible (primer peldaño): OCR solo de la
+        glosa, o ninguno si la memoria ya conoce el RUT (textos vacíos).
+        Retorna (textos, confianzas, preview_spec): la preview no se escribe aquí.
+        """
+        self._new_run()
+        # 1) Carril rápido: PDF nativo -> texto embebido con sus líneas, sin render ni OCR
+        if previa is not None:
+            embedded_text, tipo = previa.texto_embebido, previa.pdf_tipo
+        else:
+            with self.timer.stage('texto_embebido'):
+                embedded_text, tipo = self.pdf_digital_text(pdf_path)
+        self.last_run['pdf_tipo'] = tipo
+        if embedded_text:
+            self.timer.count('pdf_texto_embebido')
+            self.last_run['variante'] = 'texto_embebido'
+            return [embedded_text], [0.99], self.preview_spec(pdf_path, file_hash, dpi=PREVIEW_DPI, angulo=0)
 
-        # 4) Elegir el mejor por heurística
         def quality(t: str, base: float = 0.0) -> float:
             if not t: 
                 return -1.0
@@ -361,34 +940,130 @@ class OCRExtractorOptimized:
             q += min(0.3, len(t) / 1200.0)  # recompensa por longitud razonable
             return q
 
-        q_cv  = quality(text_cv, conf_cv)
+        ladder = pdf_dpi_ladder()
+        angle = self._orientacion_previa(previa)
+        best = None  # (calidad, texto, conf, dpi, variante, psm)
+        pendientes = list(ladder)
+        presupuesto_desde = 0
+
+        while pendientes:
+            dpi = pendientes.pop(0)
+            primero, final = dpi == ladder[0], not pendientes
+            # 2) Renderizar SOLO la primera página; la orientación se detecta una vez
+            if previa is not None and previa.imagen is not None and dpi == previa.dpi:
+                # Ya renderizada por la etapa de render
+                img_np = previa.imagen
+            else:
+                with self.timer.stage('render'):
+                    img_np = np.array(self._pdf_first_page_to_image(pdf_path, dpi=dpi))
+                self.timer.count('renders')
+                self.timer.count('pixeles_render', int(img_np.shape[0] * img_np.shape[1]))
+            self.last_run['dpi'] = dpi
+            # Artefactos del peldaño: el gris se calcula una vez y lo comparten timbre,
+            # orientación, zonas, variantes y doble pasada (el color se suelta al rotar)
+            pagina = PageArtifacts(img_np, self.timer)
+            del img_np
+
+            # 2b) Timbre electrónico: RUT, folio, fecha y monto sin OCR
+            timbre = self.read_timbre(pagina.gris, previa) if primero else None
+            if timbre:
+                if self._timbre_en_memoria(timbre):
+                    self.last_run['variante'] = 'timbre'
+                    return [], [], self.preview_spec(pdf_path, file_hash,
+                                                     angulo=timbre['orientacion'] if angle is None else angle)
+                if angle is None:
+                    angle = self._orientacion_timbre(timbre)
+
+            with self.timer.stage('orientacion'):
+                if angle is None:
+                    angle = self.detect_orientation(pagina.gris, file_hash)
+                pagina = pagina.rotated(angle)
+            if primero:
+                presupuesto_desde = self.last_run.get('llamadas_ocr', 0)
+
+            if timbre:
+                text_glosa, conf_glosa, _ = self.ocr_glosa_timbre(pagina, timbre)
+                preview = self.preview_spec(pdf_path, file_hash)
+                return ([text_glosa], [conf_glosa], preview) if text_glosa else ([], [], preview)
+
+            # 3) OCR por zonas (encabezado/fecha/glosa/totales), una sola vez en el primer
+            #    peldaño: si ya trae los campos clave no se procesa la página completa; si
+            #    no, su texto queda como candidato frente a la búsqueda por variantes
+            if OCR_ROI_ENABLED and primero:
+                with self.timer.stage('roi'):
+                    text_roi, conf_roi, _ = self.ocr_regions(pagina)
+                if has_key_fields(text_roi):
+                    self.last_run['variante'] = 'roi'
+                    self.last_run['psm'] = None
+                    self.last_run['salida_temprana'] = True
+                    return [text_roi], [conf_roi], self.preview_spec(pdf_path, file_hash)
+                if text_roi:
+                    best = (quality(text_roi, conf_roi), text_roi, conf_roi, dpi, 'roi', None)
+
+            # 3A) Pipeline actual (varias variantes con image_to_data). En los peldaños
+            #     intermedios solo se prueba la variante más ganadora antes de subir DPI;
+            #     en el último, la búsqueda completa usa lo que queda del tope de
+            #     llamadas, reservando las dos de la doble pasada
+            if final:
+                self._limite_llamadas = presupuesto_desde + OCR_MAX_CALLS - 2
+            try:
+                text_cv, conf_cv, _ = self.process_image_optimized(
+                    pagina, oriented=True, max_variants=None if final else 1)
+            finally:
+                self._limite_llamadas = None
+            q_cv = quality(text_cv, conf_cv)
+            if text_cv and (best is None or q_cv >= best[0]):
+                best = (q_cv, text_cv, conf_cv, dpi,
+                        self.last_run.get('variante'), self.last_run.get('psm'))
+            if self.last_run.get('salida_temprana'):
+                break
+            # Página pobre a la resolución inicial: el peldaño intermedio rara vez
+            # basta, se pasa directo al último
+            if primero and (best[0] if best else -1.0) < OCR_DPI_SALTO_CALIDAD:
+                pendientes = pendientes[-1:]
+
+        # 3B) Doble pasada “suave” (string directo) sobre la última resolución ya
+        #     orientada, solo si la búsqueda escalonada no encontró ya los campos clave
+        if self.last_run.get('salida_temprana'):
+            text_two = ""
+        else:
+            with self.timer.stage('doble_pasada'):
+                text_two = ocr_two_passes(pagina)
+            self._count_ocr_call(pagina.gris, 2)
+
+        # 4) Elegir el mejor por heurística
+        q_cv = best[0] if best else -1.0
         q_two = quality(text_two, 0.55)  # suele traer menos conf, le doy un piso
 
         if q_two > q_cv:
             # nos quedamos con el texto de doble pasada
+            self.last_run['variante'] = 'two_passes'
+            self.last_run['psm'] = 6
             texts = [text_two]
-            confidences = [max(0.55, conf_cv)]  # un piso razonable
-            # preview: guarda la imagen mejorada de la doble pasada
-            preview_path = self._save_preview(np.array(_enhance_for_text_pil(page_img)), pdf_path, page_idx=0)
+            confidences = [max(0.55, best[2] if best else 0.0)]  # un piso razonable
+        elif best:
+            _, text_cv, conf_cv, dpi, variante, psm = best
+            self.last_run.update({'dpi': dpi, 'variante': variante, 'psm': psm})
+            texts = [text_cv]
+            confidences = [conf_cv]
         else:
-            texts = [text_cv] if text_cv else []
-            confidences = [conf_cv] if text_cv else []
-            preview_path = self._save_preview(best_img, pdf_path, page_idx=0) if (text_cv and best_img is not None) else ""
-
-        return texts, confidences, preview_path
-    
-    def _save_preview(self, image: np.ndarray, source_path: Path, page_idx: int) -> str:
-        """Guarda imagen de preview"""
-        try:
-            # Usar la configuración global para el directorio de previews
-            preview_dir = REVIEW_PREVIEW_DIR
-            preview_dir.mkdir(exist_ok=True, parents=True)
+            return [], [], {}
 
-            filename = f"{source_path.stem}_p{page_idx+1}.png"
-            preview_path = preview_dir / filename
+        return texts, confidences, self.preview_spec(pdf_path, file_hash)
 
-            cv2.imwrite(str(preview_path), image)
-            return str(preview_path)
-        except Exception as e:
-            # Silenciar el error de preview, no debe detener el procesamiento
-            return ""
\ No newline at end of file
+    def preview_spec(self, source_path: Path, file_hash: str = "", dpi: Optional[int] = None,
+                     angulo: Optional[int] = None, page_idx: int = 0) -> Dict:
+        """
+        Lo necesario para regenerar la preview de revisión (modules/preview_store):
+        archivo, página, DPI, rotación y variante ganadora del último OCR. Aquí no
+        se escribe ninguna imagen: solo los registros que quedan para revisión
+        renderizan la suya, reducida.
+        """
+        return {
+            'archivo': str(source_path),
+            'hash': file_hash,
+            'pagina': page_idx,
+            'dpi': dpi or self.last_run.get('dpi'),
+            'angulo': self.last_run.get('orientacion', 0) if angulo is None else angulo,
+            'variante': self.last_run.get('variante', ''),
+        }
\ No newline at end of file
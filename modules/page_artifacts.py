@@ -0,0 +1,187 @@
+# modules/page_artifacts.py
+"""
+Artefactos de imagen de UNA página, calculados una sola vez y compartidos
+
+La misma página pasaba varias veces por las mismas conversiones: gris en la
+orientación, en el OCR por zonas y en las variantes; gris + CLAHE + umbral
+adaptativo en la doble pasada y otra vez para su preview; gamma en float32
+sobre la página completa. PageArtifacts memoiza lo que comparten varios
+consumidores (gris, autocontraste, texto mejorado) y construye las variantes
+de binarización con LUTs uint8 y operaciones en el lugar, sin copias de más.
+
+Las variantes no se memoizan: cada una se lee una sola vez (búsqueda escalonada)
+y guardarlas todas subiría el pico de memoria de la página.
+
+Con un StageTimer se registran los artefactos calculados y reutilizados
+('artefactos', 'artefactos_reusados') y el pico de memoria de la página
+('memoria_pagina_bytes': artefactos retenidos + el que se está construyendo).
+"""
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Union
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import *
+
+_KERNEL_2X2 = np.ones((2, 2), np.uint8)
+
+
+@lru_cache(maxsize=None)
+def gamma_lut(gamma: float) -> np.ndarray:
+    """LUT uint8 de corrección gamma (mismo redondeo que la versión en float32)"""
+    ramp = np.arange(256, dtype=np.float32) / 255.0
+    return np.clip(np.power(ramp, gamma) * 255.0, 0, 255).astype(np.uint8)
+
+
+@lru_cache(maxsize=None)
+def scale_abs_lut(alpha: float, beta: float) -> np.ndarray:
+    """LUT uint8 equivalente a cv2.convertScaleAbs(img, alpha, beta)"""
+    ramp = np.arange(256, dtype=np.uint8).reshape(1, 256)
+    return cv2.convertScaleAbs(ramp, alpha=alpha, beta=beta).reshape(256)
+
+
+def autocontrast_lut(gray: np.ndarray) -> np.ndarray:
+    """LUT de PIL.ImageOps.autocontrast (cutoff=0) para una imagen en gris"""
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    presentes = np.flatnonzero(hist)
+    lut = np.arange(256, dtype=np.uint8)
+    if presentes.size == 0:
+        return lut
+    lo, hi = int(presentes[0]), int(presentes[-1])
+    if hi <= lo:
+        return lut
+    scale = 255.0 / (hi - lo)
+    offset = -lo * scale
+    valores = (np.arange(256) * scale + offset).astype(np.int64)  # int() de PIL: trunca
+    return np.clip(valores, 0, 255).astype(np.uint8)
+
+
+def unsharp_into(src: np.ndarray, amount: float, sigma: float = 1.0) -> np.ndarray:
+    """Unsharp mask escribiendo el resultado sobre el buffer del desenfoque"""
+    blur = cv2.GaussianBlur(src, (0, 0), sigmaX=sigma)
+    return cv2.addWeighted(src, amount, blur, -(amount - 1), 0, dst=blur)
+
+
+class PageArtifacts:
+    """Artefactos memoizados de una página (uso desde el hilo del documento)"""
+
+    VARIANTES = ("otsu", "clahe_otsu", "gamma_otsu", "adaptive_gauss")
+
+    def __init__(self, img: np.ndarray, timer=None):
+        self.img = img
+        self.timer = timer
+        self._memo: Dict[str, np.ndarray] = {}
+        self.bytes = img.nbytes  # memoria retenida: imagen + artefactos memoizados
+        self.pico_bytes = 0
+        self._medir()
+
+    @classmethod
+    def of(cls, img: Union[np.ndarray, 'PageArtifacts'], timer=None) -> 'PageArtifacts':
+        return img if isinstance(img, PageArtifacts) else cls(img, timer)
+
+    # --- contabilidad ---------------------------------------------------------
+    def _medir(self, extra: int = 0):
+        total = self.bytes + extra
+        if total > self.pico_bytes:
+            self.pico_bytes = total
+            if self.timer is not None:
+                self.timer.peak('memoria_pagina_bytes', total)
+
+    def _memoizado(self, nombre: str, builder) -> np.ndarray:
+        arr = self._memo.get(nombre)
+        if arr is not None:
+            if self.timer is not None:
+                self.timer.count('artefactos_reusados')
+            return arr
+        arr = builder()
+        if arr is not self.img and not any(arr is otro for otro in self._memo.values()):
+            self.bytes += arr.nbytes
+        self._memo[nombre] = arr
+        self._medir()
+        if self.timer is not None:
+            self.timer.count('artefactos')
+        return arr
+
+    # --- artefactos compartidos ----------------------------------------------
+    @property
+    def gris(self) -> np.ndarray:
+        """Gris de la página (BGR -> gris como el resto del pipeline; sin copia si ya es gris)"""
+        return self._memoizado('gris', lambda: (cv2.cvtColor(self.img, cv2.COLOR_BGR2GRAY)
+                                                if self.img.ndim == 3 else self.img))
+
+    @property
+    def autocontraste(self) -> np.ndarray:
+        """Gris estirado a 0..255 (primera pasada de ocr_two_passes)"""
+        return self._memoizado('autocontraste', lambda: cv2.LUT(self.gris, autocontrast_lut(self.gris)))
+
+    @property
+    def texto(self) -> np.ndarray:
+        """Mejora suave para texto: bilateral + CLAHE + umbral adaptativo (doble pasada y su preview)"""
+        def build():
+            suave = cv2.bilateralFilter(self.gris, d=5, sigmaColor=50, sigmaSpace=50)
+            eq = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(suave)
+            self._medir(suave.nbytes + eq.nbytes)
+            # El umbral se escribe sobre el buffer del bilateral (ya no se usa)
+            th = cv2.adaptiveThreshold(eq, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                       cv2.THRESH_BINARY, 31, 10, dst=suave)
+            return cv2.morphologyEx(th, cv2.MORPH_OPEN, _KERNEL_2X2, dst=th, iterations=1)
+        return self._memoizado('texto', build)
+
+    def rotated(self, angle: int) -> 'PageArtifacts':
+        """
+        Artefactos de la página orientada. Todo lo demás parte del gris, así que
+        la imagen en color se suelta también sin rotación.
+        """
+        gris = self.gris
+        if angle:
+            from modules.ocr_extraction import ImagePreprocessor
+            return PageArtifacts(ImagePreprocessor.rotate(gris, angle), self.timer)
+        if self.img is not gris:
+            self.bytes -= self.img.nbytes
+            self.img = gris
+        return self
+
+    # --- variantes de binarización (no memoizadas) ----------------------------
+    def variante(self, nombre: str) -> np.ndarray:
+        builder = getattr(self, f"_variante_{nombre}", None)
+        if builder is None:
+            raise KeyError(nombre)
+        img = builder(self.gris)
+        self._medir(img.nbytes)
+        return img
+
+    @staticmethod
+    def _variante_otsu(gray: np.ndarray) -> np.ndarray:
+        """Contraste (LUT) + unsharp + Otsu + apertura"""
+        buf = cv2.LUT(gray, scale_abs_lut(1.2, 10))
+        sharp = unsharp_into(buf, 1.5, 1.0)
+        cv2.threshold(sharp, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU, dst=sharp)
+        return cv2.morphologyEx(sharp, cv2.MORPH_OPEN, _KERNEL_2X2, dst=sharp)
+
+    @staticmethod
+    def _variante_clahe_otsu(gray: np.ndarray) -> np.ndarray:
+        """CLAHE + unsharp + Otsu + apertura (iluminación variable)"""
+        cl = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8)).apply(gray)
+        sharp = unsharp_into(cl, 1.6, 1.0)
+        cv2.threshold(sharp, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU, dst=sharp)
+        return cv2.morphologyEx(sharp, cv2.MORPH_OPEN, _KERNEL_2X2, dst=sharp)
+
+    @staticmethod
+    def _variante_gamma_otsu(gray: np.ndarray) -> np.ndarray:
+        """Gamma (LUT) + unsharp + Otsu (documentos oscuros)"""
+        buf = cv2.LUT(gray, gamma_lut(0.7))
+        sharp = unsharp_into(buf, 1.7, 1.0)
+        cv2.threshold(sharp, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU, dst=sharp)
+        return sharp
+
+    @staticmethod
+    def _variante_adaptive_gauss(gray: np.ndarray) -> np.ndarray:
+        """Contraste (LUT) + umbral adaptativo gaussiano + apertura (fondos variables)"""
+        buf = cv2.LUT(gray, scale_abs_lut(1.3, 5))
+        cv2.adaptiveThreshold(buf, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                              cv2.THRESH_BINARY, 35, 10, dst=buf)
+        return cv2.morphologyEx(buf, cv2.MORPH_OPEN, _KERNEL_2X2, dst=buf)
@@ -0,0 +1,200 @@
+# modules/pipeline.py
+"""
+Fases del procesamiento sin interfaz gráfica (sin tkinter)
+- Fase 1: OCR en paralelo (process_file_worker con init_worker), o por etapas
+  render -> preproceso -> OCR en lotes grandes (modules/staged_pipeline)
+- Fase 3: previews reducidas solo de los registros para revisión (modules/preview_store)
+- Fase 4: quality_score final y escritura segura del Excel
+
+Lo usan la GUI (main.py) y la línea de comandos (cli.py).
+"""
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import *
+from modules.data_processing import process_file_worker, init_worker, ocr_threads_for
+
+
+def run_ocr_phase(files: List[Path], max_workers: int = MAX_WORKERS,
+                  cache_dir: Optional[str] = None, use_cache: bool = OCR_CACHE_ENABLED,
+                  on_result: Optional[Callable[[Path, Optional[Dict], Optional[str], int, int], None]] = None,
+                  should_continue: Optional[Callable[[], bool]] = None,
+                  staged: Optional[bool] = None,
+                  stats: Optional[Dict] = None) -> Tuple[List[Dict], List[str]]:
+    """
+    FASE 1: OCR + extracción de campos de cada archivo en un pool de procesos.
+
+    on_result(archivo, resultado, error, completados, total) se llama por cada archivo
+    terminado (resultado=None si hubo error). should_continue() permite detener.
+    staged=None usa el pipeline por etapas desde OCR_STAGED_MIN_FILES archivos
+    (config.OCR_STAGED_PIPELINE). stats recibe la utilización de los pools.
+    Retorna (resultados, archivos_con_error).
+    """
+    total = len(files)
+    all_results: List[Dict] = []
+    errors: List[str] = []
+    if total == 0:
+        return all_results, errors
+
+    if staged is None:
+        staged = OCR_STAGED_PIPELINE and total >= OCR_STAGED_MIN_FILES
+    if staged:
+        from modules.staged_pipeline import run_staged_ocr_phase
+        return run_staged_ocr_phase(files, max_workers=max_workers, cache_dir=cache_dir,
+                                    use_cache=use_cache, on_result=on_result,
+                                    should_continue=should_continue, stats=stats)
+
+    # init_worker: cada proceso construye su extractor/memoria una sola vez.
+    # Con pocos archivos, los núcleos libres reparten variantes/PSM dentro de cada documento
+    n_procs, ocr_threads = ocr_threads_for(total, max_workers)
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=n_procs, initializer=init_worker,
+                             initargs=(cache_dir, use_cache, ocr_threads)) as executor:
+        futures = {executor.submit(process_file_worker, str(f)): f for f in files}
+
+        completed = 0
+        for future in as_completed(futures):
+            if should_continue is not None and not should_continue():
+                for f in futures:
+                    f.cancel()
+                break
+
+            completed += 1
+            file_path = futures[future]
+            result, error = None, None
+            try:
+                result = future.result()
+                if result.get('error'):
+                    error, result = str(result.get('error')), None
+            except Exception as e:
+                error = str(e)
+
+            if error is not None:
+                errors.append(str(file_path))
+            else:
+                all_results.append(result)
+
+            if on_result is not None:
+                on_result(file_path, result, error, completed, total)
+
+    if stats is not None:
+        # Ocupación aproximada: tiempo medido dentro de process_file de cada documento
+        duracion = time.perf_counter() - t0
+        ocupado = sum(r.get('instrumentacion', {}).get('total_ms', 0.0) for r in all_results) / 1000
+        stats.update({
+            'modo': 'pool_unico',
+            'duracion_s': round(duracion, 3),
+            'etapas': {'ocr': {'workers': n_procs, 'hilos_ocr': ocr_threads, 'tareas': completed,
+                               'ocupado_s': round(ocupado, 3),
+                               'utilizacion': round(ocupado / (n_procs * duracion), 3) if duracion else 0.0}},
+        })
+
+    return all_results, errors
+
+
+def render_review_previews(registros: List[Dict], store=None,
+                           log_callback: Optional[Callable] = None) -> int:
+    """
+    FASE 3: genera (o reutiliza del almacén) la preview de cada registro para
+    revisión a partir de su especificación 'preview' y la deja en 'preview_path'.
+    Al terminar poda el almacén. Retorna la cantidad de previews disponibles.
+    """
+    pendientes = [r for r in registros if r.get('preview') and not r.get('preview_path')]
+    if not pendientes:
+        return 0
+    if store is None:
+        from modules.preview_store import PreviewStore
+        store = PreviewStore()
+
+    # Render y codificación liberan el GIL (poppler es un proceso aparte)
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_WORKERS, len(pendientes)))) as executor:
+        rutas = list(executor.map(lambda r: store.get_or_render(r['preview']), pendientes))
+    for registro, ruta in zip(pendientes, rutas):
+        registro['preview_path'] = ruta
+
+    eliminadas = store.prune()
+    listas = sum(1 for ruta in rutas if ruta)
+    if log_callback:
+        log_callback(f"Previews para revisión: {listas}/{len(pendientes)}"
+                     + (f" ({eliminadas} antiguas eliminadas)" if eliminadas else ""), "info")
+    return listas
+
+
+def calculate_final_quality(registro: Dict) -> float:
+    """Calcula score de calidad final"""
+    score = 0.0
+
+    pesos = {
+        'rut': 0.20,
+        'nombre': 0.15,
+        'monto': 0.20,
+        'fecha_documento': 0.10,
+        'convenio': 0.15,
+        'mes_nombre': 0.10,
+        'nro_boleta': 0.05,
+        'glosa': 0.05
+    }
+
+    for campo, peso in pesos.items():
+        valor = registro.get(campo, '')
+        if valor and valor not in ['SIN_CONVENIO', 'SIN_PERIODO']:
+            score += peso * 0.6
+            conf_campo = registro.get(f'{campo}_confidence', 0.7)
+            score += peso * 0.4 * conf_campo
+
+    return round(min(score, 1.0), 3)
+
+
+def write_excel(report_generator, results: List[Dict], output_file: Path,
+                generate_reports: bool = True, streaming: Optional[bool] = None,
+                run_report: Optional[Dict] = None):
+    """
+    Genera el Excel en un temporal y lo reemplaza de forma atómica.
+    Si el destino está en uso (abierto en Excel) guarda con sufijo de fecha.
+    streaming=None decide por tamaño (config.EXCEL_STREAMING_MIN_ROWS): el modo
+    streaming escribe fila a fila (constant_memory) sin armar el DataFrame.
+    run_report (modules.instrumentation.build_run_report) agrega la hoja 'Rendimiento'.
+    Retorna (registros_escritos, ruta_escrita).
+    """
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    if streaming is None:
+        streaming = len(results) >= EXCEL_STREAMING_MIN_ROWS
+
+    tmp_file = output_file.with_suffix(".tmp.xlsx")
+    try:
+        if streaming:
+            n_rows = report_generator.create_excel_streaming(
+                results,
+                str(tmp_file),
+                generate_reports=generate_reports,
+                run_report=run_report
+            )
+        else:
+            n_rows = len(report_generator.create_excel_with_reports(
+                results,
+                str(tmp_file),
+                generate_reports=generate_reports,
+                run_report=run_report
+            ))
+        try:
+            os.replace(tmp_file, output_file)
+            written = output_file
+        except PermissionError:
+            written = output_file.with_name(
+                f"{output_file.stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{output_file.suffix}"
+            )
+            os.replace(tmp_file, written)
+        return n_rows, written
+    except Exception:
+        try:
+            tmp_file.unlink(missing_ok=True)
+        except Exception:
+            pass
+        raise
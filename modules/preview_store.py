@@ -0,0 +1,264 @@
+# modules/preview_store.py
+"""
+Previews de revisión manual, generadas solo cuando hacen falta
+- El OCR ya no escribe una imagen por archivo: cada registro guarda 'preview',
+  la especificación para regenerarla (archivo, hash, página, DPI, rotación y
+  variante ganadora; OCRExtractorOptimized.preview_spec).
+- PreviewStore.get_or_render renderiza la página a DPI reducido, aplica la
+  rotación y la transformación de la variante, reduce al tamaño que muestra el
+  diálogo de revisión y la guarda comprimida (WebP, o JPEG si WebP no está).
+- Almacén por contenido: el nombre es el hash de (contenido del archivo +
+  especificación + formato), así un mismo documento no se renderiza dos veces
+  y un cambio de variante o rotación genera una preview nueva.
+- Desalojo por antigüedad y por tamaño máximo (las menos usadas primero); las
+  previews PNG del formato anterior ({archivo}_p1.png) se eliminan al podar.
+
+Uso desde consola:
+    python -m modules.preview_store stats
+    python -m modules.preview_store prune
+    python -m modules.preview_store clear
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import *
+from modules.page_artifacts import PageArtifacts
+
+_NOMBRE_RE = re.compile(r'^[0-9a-f]{64}\.(webp|jpg)$')
+_EXTENSIONES = {".webp", ".jpg", ".jpeg", ".png"}
+
+
+def transformacion(variante: str) -> str:
+    """
+    Artefacto de PageArtifacts que muestra lo que leyó el OCR: la variante de
+    binarización ganadora, 'texto' para la doble pasada y 'gris' para el resto
+    (OCR por zonas, timbre, texto embebido)
+    """
+    if variante in PageArtifacts.VARIANTES:
+        return variante
+    if variante == 'two_passes':
+        return 'texto'
+    return 'gris'
+
+
+class PreviewStore:
+    """Previews reducidas en disco, direccionadas por contenido (seguro entre hilos)"""
+
+    def __init__(self, preview_dir: Path = None, max_mb: float = None,
+                 max_age_days: float = None, formato: str = None):
+        self.dir = Path(preview_dir) if preview_dir else REVIEW_PREVIEW_DIR
+        self.max_bytes = int((PREVIEW_STORE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024)
+        self.max_age_days = PREVIEW_MAX_AGE_DAYS if max_age_days is None else max_age_days
+        self.formato = (formato or PREVIEW_FORMAT).lower().lstrip('.')
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Lectura / render
+    # ------------------------------------------------------------------
+    def key(self, spec: Dict) -> str:
+        """Clave de contenido de la preview (calcula el hash del archivo si falta)"""
+        file_hash = spec.get('hash')
+        if not file_hash:
+            from modules.ocr_cache import file_sha256
+            file_hash = file_sha256(Path(spec['archivo']))
+        datos = {
+            'hash': file_hash,
+            'pagina': int(spec.get('pagina') or 0),
+            'dpi': self._dpi(spec),
+            'angulo': int(spec.get('angulo') or 0) % 360,
+            'transformacion': transformacion(spec.get('variante', '')),
+            'tamano': list(PREVIEW_MAX_SIZE),
+            'formato': self.formato,
+            'calidad': PREVIEW_QUALITY,
+        }
+        return hashlib.sha256(json.dumps(datos, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get_or_render(self, spec: Dict) -> str:
+        """
+        Ruta de la preview de la especificación, renderizándola si no existe.
+        "" si no se pudo (archivo movido, PDF ilegible...): la revisión sigue sin imagen.
+        """
+        if not spec or not spec.get('archivo'):
+            return ""
+        try:
+            key = self.key(spec)
+            for ext in (self.formato, "jpg"):
+                path = self.dir / f"{key}.{ext}"
+                if path.exists():
+                    os.utime(path)  # marca de uso para el desalojo LRU
+                    return str(path)
+            return str(self._guardar(key, self.render(spec)))
+        except Exception as e:
+            print(f"⚠️ No se pudo generar la preview de {Path(spec.get('archivo', '')).name}: {e}")
+            return ""
+
+    @staticmethod
+    def _dpi(spec: Dict) -> int:
+        return min(int(spec.get('dpi') or PREVIEW_DPI), PREVIEW_DPI)
+
+    def render(self, spec: Dict) -> np.ndarray:
+        """Página orientada y transformada, reducida a PREVIEW_MAX_SIZE"""
+        archivo = Path(spec['archivo'])
+        if archivo.suffix.lower() == '.pdf':
+            from modules.ocr_extraction import pdf_page_to_image
+            pil_img = pdf_page_to_image(archivo, dpi=self._dpi(spec), page_idx=int(spec.get('pagina') or 0))
+            img = cv2.cvtColor(np.array(pil_img.convert('RGB')), cv2.COLOR_RGB2BGR)
+        else:
+            img = cv2.imread(str(archivo))
+            if img is None:
+                raise ValueError(f"No se pudo leer: {archivo}")
+            # Fotos grandes: se reducen antes de transformar, como el tope de DPI de los PDF
+            img = self._reducir(img, 2)
+
+        pagina = PageArtifacts(img).rotated(int(spec.get('angulo') or 0) % 360)
+        nombre = transformacion(spec.get('variante', ''))
+        if nombre == 'gris':
+            salida = pagina.gris
+        elif nombre == 'texto':
+            salida = pagina.texto
+        else:
+            salida = pagina.variante(nombre)
+        return self._reducir(salida)
+
+    @staticmethod
+    def _reducir(img: np.ndarray, factor: int = 1) -> np.ndarray:
+        ancho, alto = PREVIEW_MAX_SIZE[0] * factor, PREVIEW_MAX_SIZE[1] * factor
+        h, w = img.shape[:2]
+        escala = min(ancho / w, alto / h)
+        if escala >= 1:
+            return img
+        return cv2.resize(img, (max(1, int(w * escala)), max(1, int(h * escala))),
+                          interpolation=cv2.INTER_AREA)
+
+    def _guardar(self, key: str, img: np.ndarray) -> Path:
+        """Escritura atómica (temporal + reemplazo); JPEG si el formato pedido falla"""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        for ext in dict.fromkeys((self.formato, "jpg")):
+            flag = cv2.IMWRITE_WEBP_QUALITY if ext == "webp" else cv2.IMWRITE_JPEG_QUALITY
+            try:
+                ok, buf = cv2.imencode(f".{ext}", img, [flag, PREVIEW_QUALITY])
+            except cv2.error:
+                ok = False
+            if not ok:
+                continue
+            path = self.dir / f"{key}.{ext}"
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(buf.tobytes())
+            os.replace(tmp, path)
+            return path
+        raise ValueError(f"No se pudo codificar la preview ({self.formato})")
+
+    # ------------------------------------------------------------------
+    # Mantenimiento
+    # ------------------------------------------------------------------
+    def prune(self) -> int:
+        """
+        Elimina previews del formato anterior y temporales huérfanos, las sin uso
+        por más de max_age_days y, si se supera max_bytes, las menos usadas.
+        Retorna la cantidad de archivos eliminados.
+        """
+        if not self.dir.is_dir():
+            return 0
+        with self._lock:
+            removed = 0
+            vigentes = []
+            limite = time.time() - self.max_age_days * 86400 if self.max_age_days else None
+            for path in self.dir.iterdir():
+                try:
+                    if not path.is_file():
+                        continue
+                    st = path.stat()
+                    huerfano = path.suffix == ".tmp" and st.st_mtime < time.time() - 3600
+                    legado = path.suffix.lower() in _EXTENSIONES and not _NOMBRE_RE.match(path.name)
+                    if huerfano or legado or (limite and _NOMBRE_RE.match(path.name) and st.st_mtime < limite):
+                        path.unlink()
+                        removed += 1
+                    elif _NOMBRE_RE.match(path.name):
+                        vigentes.append((st.st_mtime, st.st_size, path))
+                except OSError:
+                    continue
+
+            exceso = sum(size for _, size, _ in vigentes) - self.max_bytes
+            if self.max_bytes and exceso > 0:
+                for _, size, path in sorted(vigentes):
+                    if exceso <= 0:
+                        break
+                    try:
+                        path.unlink()
+                        removed += 1
+                        exceso -= size
+                    except OSError:
+                        continue
+            return removed
+
+    def clear(self) -> int:
+        """Elimina todas las previews (también las del formato anterior)"""
+        if not self.dir.is_dir():
+            return 0
+        removed = 0
+        for path in self.dir.iterdir():
+            if path.is_file() and (path.suffix.lower() in _EXTENSIONES or path.suffix == ".tmp"):
+                try:
+                    path.unlink()
+                    removed += 1
+                except OSError:
+                    continue
+        return removed
+
+    def stats(self) -> Dict:
+        """Estadísticas del almacén"""
+        previews, legado, size = 0, 0, 0
+        if self.dir.is_dir():
+            for path in self.dir.iterdir():
+                if not path.is_file():
+                    continue
+                if _NOMBRE_RE.match(path.name):
+                    previews += 1
+                    size += path.stat().st_size
+                elif path.suffix.lower() in _EXTENSIONES:
+                    legado += 1
+        return {
+            "previews": previews,
+            "previews_formato_anterior": legado,
+            "tamano_mb": round(size / (1024 * 1024), 2),
+            "limite_mb": round(self.max_bytes / (1024 * 1024), 2),
+            "formato": self.formato,
+            "ruta": str(self.dir),
+        }
+
+
+def main(argv=None):
+    """Comandos de mantenimiento del almacén de previews"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mantenimiento de las previews de revisión")
+    parser.add_argument("--dir", default=None, help="Directorio de previews (por defecto config.REVIEW_PREVIEW_DIR)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="Muestra estadísticas")
+    sub.add_parser("prune", help="Aplica límites de tamaño/antigüedad y elimina previews antiguas")
+    sub.add_parser("clear", help="Elimina todas las previews")
+    args = parser.parse_args(argv)
+
+    store = PreviewStore(preview_dir=args.dir)
+    if args.cmd == "stats":
+        for k, v in store.stats().items():
+            print(f"{k}: {v}")
+    elif args.cmd == "prune":
+        print(f"Previews eliminadas: {store.prune()}")
+    elif args.cmd == "clear":
+        print(f"Previews eliminadas: {store.clear()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,15 +8,90 @@ import unicodedata
 import xlsxwriter
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import sys
 import re
+import numbers
+import warnings
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
 sys.path.append(str(Path(__file__).parent.parent))
 
 from config import *
 from modules.utils import get_month_year_from_date, format_currency
 
+# Columnas base de 'Base de Datos' (A..O); las fórmulas de los informes las referencian por letra
+MAIN_BASE_COLUMNS = [
+    "nombre", "rut", "nro_boleta", "fecha_documento", "periodo_servicio",
+    "monto", "convenio", "horas", "tipo", "glosa",
+    "archivo", "paginas", "confianza", "confianza_max", "decreto_alcaldicio"
+]
+# Columnas derivadas que _create_main_dataframe agrega a continuación
+MAIN_DERIVED_COLUMNS = ["monto_num", "fecha_dt", "periodo_dt", "periodo_final", "mes", "anio", "mes_nombre"]
+
+# Columnas que usa _create_individual_report: lo único que viaja a cada proceso
+INDIVIDUAL_REPORT_COLUMNS = ['periodo_servicio', 'anio', 'mes', 'monto_num',
+                             'nro_boleta', 'fecha_documento', 'convenio']
+
+
+def _periodo_to_dt(s):
+    """'YYYY-MM' -> datetime del primer día del mes del servicio (NaT si no aplica)"""
+    if not isinstance(s, str) or len(s) < 7 or s.startswith("XXXX"):
+        return pd.NaT
+    try:
+        return pd.to_datetime(s + "-01", format="%Y-%m-%d", errors="coerce")
+    except Exception:
+        return pd.NaT
+
+
+@lru_cache(maxsize=4096)
+def _parse_fecha(value: str):
+    """pd.to_datetime de una fecha suelta (las fechas se repiten mucho en un lote)"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return pd.to_datetime(value, errors="coerce", dayfirst=False)
+
+
+class _ConventionAccumulator:
+    """
+    Lo mínimo para escribir una hoja por convenio sin DataFrame (modo streaming):
+    filas de 'Base de Datos' por (año, mes), totales y RUT únicos
+    """
+    __slots__ = ('total', 'monto', 'ruts', 'meses')
+
+    def __init__(self):
+        self.total = 0
+        self.monto = 0
+        self.ruts = set()
+        self.meses = {}  # (anio, mes) -> [filas, suma_monto, n_montos]
+
+    def add(self, main_row: int, anio, mes, monto_num, rut):
+        self.total += 1
+        if not pd.isna(rut):
+            self.ruts.add(rut)
+        tiene_monto = not pd.isna(monto_num)
+        if tiene_monto:
+            self.monto += monto_num
+        if anio is None:
+            return
+        entry = self.meses.get((anio, mes))
+        if entry is None:
+            entry = self.meses[(anio, mes)] = [[], 0.0, 0]
+        entry[0].append(main_row)
+        if tiene_monto:
+            entry[1] += monto_num
+            entry[2] += 1
+
+    def meses_ordenados(self) -> List[Tuple]:
+        return [(anio, mes, filas, len(filas), suma, suma / n if n else 0.0)
+                for (anio, mes), (filas, suma, n) in sorted(self.meses.items())]
+
+
+def _individual_report_job(rut: str, grupo_data: Dict, output_dir: str) -> str:
+    """Tarea del pool: escribe el Excel de un profesional y retorna su ruta"""
+    return str(ReportGenerator()._create_individual_report(rut, grupo_data, Path(output_dir)))
+
 
 def _normalize_cols(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -45,7 +120,8 @@ class ReportGenerator:
             9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
         }
 
-    def create_excel_with_reports(self, registros: List[Dict], output_path: str, generate_reports: bool = True):
+    def create_excel_with_reports(self, registros: List[Dict], output_path: str, generate_reports: bool = True,
+                                  run_report: Optional[Dict] = None):
         """
         Crea un archivo Excel con los datos y opcionalmente informes por convenio
 
@@ -53,6 +129,7 @@ class ReportGenerator:
             registros: Lista de diccionarios con los datos de las boletas
             output_path: Ruta del archivo Excel de salida
             generate_reports: Si True, genera hojas adicionales con informes por convenio
+            run_report: Reporte de rendimiento de la corrida (hoja 'Rendimiento')
         """
         try:
             writer = pd.ExcelWriter(output_path, engine='xlsxwriter')
@@ -70,9 +147,13 @@ class ReportGenerator:
             # NUEVO: Agregar hoja de Resumen Global con fórmulas dinámicas
             self._create_summary_sheet(writer, df_main, formats)
 
-            # Hojas por convenio
+            # Hojas por convenio (índice clave -> fila de 'Base de Datos' construido una vez)
             if generate_reports:
-                self._generate_convention_reports(writer, df_main, formats)
+                row_index = self._build_row_index(df_main)
+                self._generate_convention_reports(writer, df_main, formats, row_index)
+
+            if run_report:
+                self._write_performance_sheet(workbook, run_report, formats)
 
             writer.close()
             return df_main
@@ -85,6 +166,118 @@ class ReportGenerator:
             traceback.print_exc()
             raise
 
+    def create_excel_streaming(self, registros: Iterable[Dict], output_path: str,
+                               generate_reports: bool = True, run_report: Optional[Dict] = None) -> int:
+        """
+        Variante de create_excel_with_reports para exportaciones grandes (50k+ boletas).
+
+        xlsxwriter en modo constant_memory: 'Base de Datos' se escribe fila a fila, en
+        orden, desde un iterable de registros (sin DataFrame). Para 'Resumen Global' y
+        las hojas por convenio solo se acumulan N° de fila, totales y RUT por
+        (convenio, año, mes); cada fila del informe referencia su propia fila.
+
+        Returns:
+            Cantidad de registros escritos en 'Base de Datos'
+        """
+        workbook = xlsxwriter.Workbook(output_path, {'constant_memory': True})
+        try:
+            formats = self._create_formats(workbook)
+            datetime_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+
+            worksheet = workbook.add_worksheet('Base de Datos')
+            for col_num, value in enumerate(MAIN_BASE_COLUMNS + MAIN_DERIVED_COLUMNS):
+                worksheet.write(0, col_num, value, formats['header'])
+
+            convenios_vistos = {}  # orden de aparición (dict como conjunto ordenado)
+            por_convenio: Dict[str, _ConventionAccumulator] = {}
+            todos = _ConventionAccumulator()  # hoja 'GENERAL' si ningún registro tiene convenio
+
+            n_rows = 0
+            for registro in registros:
+                valores = self._main_row_values(registro)
+                for col_num, value in enumerate(valores):
+                    self._write_cell(worksheet, n_rows + 1, col_num, value, datetime_format)
+
+                rut, convenio, monto_num, mes, anio = valores[1], valores[6], valores[15], valores[19], valores[20]
+                convenio = convenio if isinstance(convenio, str) else ""
+                convenios_vistos.setdefault(convenio, None)
+                todos.add(n_rows, anio, mes, monto_num, rut)
+                if generate_reports and convenio:
+                    acc = por_convenio.get(convenio)
+                    if acc is None:
+                        acc = por_convenio[convenio] = _ConventionAccumulator()
+                    acc.add(n_rows, anio, mes, monto_num, rut)
+                n_rows += 1
+
+            self._main_sheet_layout(worksheet, n_rows)
+
+            # Resumen Global con fórmulas dinámicas
+            self._write_summary_sheet(workbook, n_rows, list(convenios_vistos), formats)
+
+            # Hojas por convenio
+            if generate_reports:
+                hojas = list(por_convenio.items()) or [('GENERAL', todos)]
+                for convenio, acc in hojas:
+                    if acc.total == 0:
+                        continue
+                    self._write_convention_sheet(
+                        workbook, self._sanitize_sheet_name(f"Informe_{convenio}"), convenio,
+                        acc.total, acc.monto, len(acc.ruts), acc.meses_ordenados(), formats
+                    )
+
+            if run_report:
+                self._write_performance_sheet(workbook, run_report, formats)
+            return n_rows
+        finally:
+            workbook.close()
+
+    def _main_row_values(self, registro: Dict) -> List:
+        """
+        Fila de 'Base de Datos' para un registro: columnas base + derivadas con las
+        mismas reglas que _create_main_dataframe, calculadas de a un registro
+        """
+        valores = [registro.get(c, "") for c in MAIN_BASE_COLUMNS]
+
+        monto = registro.get("monto", "")
+        monto_num = pd.to_numeric(monto, errors="coerce") if monto is not None else float("nan")
+
+        fecha = registro.get("fecha_documento", "")
+        if isinstance(fecha, str):
+            fecha_dt = _parse_fecha(fecha)
+        else:
+            fecha_dt = pd.NaT if fecha is None else pd.to_datetime(fecha, errors="coerce")
+
+        periodo = registro.get("periodo_servicio", "")
+        periodo_dt = _periodo_to_dt(periodo if isinstance(periodo, str) else "")
+
+        # Preferir fecha del documento; si no hay, el período de servicio
+        periodo_final = fecha_dt if not pd.isna(fecha_dt) else periodo_dt
+        if pd.isna(periodo_final):
+            mes = anio = mes_nombre = None
+        else:
+            mes, anio = int(periodo_final.month), int(periodo_final.year)
+            mes_nombre = self.month_names.get(mes)
+
+        return valores + [monto_num, fecha_dt, periodo_dt, periodo_final, mes, anio, mes_nombre]
+
+    @staticmethod
+    def _write_cell(worksheet, row: int, col: int, value, datetime_format):
+        """Escribe un valor como lo haría pandas (vacíos se omiten, fechas con formato)"""
+        if isinstance(value, str):
+            if value:
+                worksheet.write_string(row, col, value)
+        elif value is None or value is pd.NaT:
+            return
+        elif isinstance(value, datetime):
+            worksheet.write_datetime(row, col, value, datetime_format)
+        elif isinstance(value, bool):
+            worksheet.write_boolean(row, col, value)
+        elif isinstance(value, numbers.Real):
+            if not pd.isna(value):
+                worksheet.write_number(row, col, float(value))
+        else:
+            worksheet.write_string(row, col, str(value))
+
     def _create_formats(self, workbook) -> Dict:
         """Crea los formatos para el libro de Excel"""
         return {
@@ -118,11 +311,7 @@ class ReportGenerator:
 
     def _create_main_dataframe(self, registros: List[Dict]) -> pd.DataFrame:
         """Crea el DataFrame principal con todos los datos, priorizando el perÃ­odo de servicio."""
-        cols = [
-            "nombre", "rut", "nro_boleta", "fecha_documento", "periodo_servicio",
-            "monto", "convenio", "horas", "tipo", "glosa",
-            "archivo", "paginas", "confianza", "confianza_max", "decreto_alcaldicio"
-        ]
+        cols = MAIN_BASE_COLUMNS
 
         df = pd.DataFrame(registros)
 
@@ -190,16 +379,8 @@ class ReportGenerator:
 
             return ""
 
-        # Convertir a datetime (primer dÃ­a del mes del servicio)
-        def _ps_to_dt(s):
-            if not isinstance(s, str) or len(s) < 7 or s.startswith("XXXX"):
-                return pd.NaT
-            try:
-                return pd.to_datetime(s + "-01", format="%Y-%m-%d", errors="coerce")
-            except Exception:
-                return pd.NaT
-
-        df["periodo_dt"] = ps_col.apply(_ps_to_dt)
+        # Convertir a datetime (primer día del mes del servicio)
+        df["periodo_dt"] = ps_col.apply(_periodo_to_dt)
 
         # Elegir fuente para mes/aÃ±o: preferir periodo_dt; si NaT, usar fecha_dt
         df["periodo_final"] = df["fecha_dt"].combine_first(df["periodo_dt"])
@@ -218,6 +399,14 @@ class ReportGenerator:
         """Aplica formato a la hoja principal"""
         worksheet = writer.sheets[sheet_name]
 
+        # Encabezados (ya están escritos por pandas; aquí los re-formateamos)
+        for col_num, value in enumerate(df.columns[:15]):
+            worksheet.write(0, col_num, value, formats['header'])
+
+        self._main_sheet_layout(worksheet, len(df))
+
+    def _main_sheet_layout(self, worksheet, n_rows: int):
+        """Anchos, paneles fijos y autofiltro de 'Base de Datos'"""
         column_widths = {
             'A': 30, 'B': 15, 'C': 12, 'D': 12, 'E': 15, 'F': 12, 'G': 15, 'H': 8,
             'I': 10, 'J': 40, 'K': 30, 'L': 8, 'M': 10, 'N': 12, 'O': 12,
@@ -225,16 +414,15 @@ class ReportGenerator:
         for col, width in column_widths.items():
             worksheet.set_column(f'{col}:{col}', width)
 
-        # Encabezados (ya están escritos por pandas; aquí los re-formateamos)
-        for col_num, value in enumerate(df.columns[:15]):
-            worksheet.write(0, col_num, value, formats['header'])
-
         worksheet.freeze_panes(1, 0)
-        worksheet.autofilter(0, 0, len(df), 14)
+        worksheet.autofilter(0, 0, n_rows, 14)
 
     def _create_summary_sheet(self, writer, df_main: pd.DataFrame, formats: Dict):
         """Crea hoja de resumen global con fórmulas dinámicas"""
-        workbook = writer.book
+        self._write_summary_sheet(writer.book, len(df_main), df_main['convenio'].unique(), formats)
+
+    def _write_summary_sheet(self, workbook, n_rows: int, convenios_unicos, formats: Dict):
+        """Escribe 'Resumen Global' (filas en orden, apto para constant_memory)"""
         worksheet = workbook.add_worksheet('Resumen Global')
 
         # Verificar que todos los formatos necesarios existen
@@ -265,7 +453,7 @@ class ReportGenerator:
         row += 2
 
         # Estadísticas generales con fórmulas
-        last_row = len(df_main) + 1  # +1 porque la fila 1 es header
+        last_row = n_rows + 1  # +1 porque la fila 1 es header
 
         worksheet.write(row, 0, "TOTAL DE BOLETAS:", formats['subtitle'])
         worksheet.write_formula(row, 1, f"=COUNTA('Base de Datos'!B2:B{last_row})", formats['text_center'])
@@ -303,8 +491,7 @@ class ReportGenerator:
         worksheet.write(row, 3, "Promedio", formats['header'])
         row += 1
 
-        # Obtener convenios únicos para crear fórmulas
-        convenios_unicos = df_main['convenio'].unique()
+        # Convenios únicos (orden de aparición) para crear fórmulas
         for convenio in convenios_unicos:
             if not convenio:
                 convenio = "(Sin Convenio)"
@@ -334,8 +521,117 @@ class ReportGenerator:
         worksheet.set_column('C:C', 18)
         worksheet.set_column('D:D', 18)
 
-    def _generate_convention_reports(self, writer, df_main: pd.DataFrame, formats: Dict):
+    def _write_performance_sheet(self, workbook, run_report: Dict, formats: Dict):
+        """
+        Escribe 'Rendimiento' a partir del reporte de la corrida (modules/instrumentation):
+        tiempos por etapa, contadores, picos y documentos más lentos (filas en orden)
+        """
+        worksheet = workbook.add_worksheet('Rendimiento')
+        worksheet.set_column(0, 0, 45)
+        worksheet.set_column(1, 7, 14)
+
+        row = 0
+        worksheet.merge_range(row, 0, row, 7, "RENDIMIENTO DE LA CORRIDA", formats['title'])
+        row += 2
+
+        resumen = [("Generado:", run_report.get('generado', '')),
+                   ("Documentos medidos:", run_report.get('documentos', 0)),
+                   ("Desde caché OCR:", run_report.get('desde_cache', 0)),
+                   ("Archivos con error:", run_report.get('errores', 0))]
+        resumen += [(f"Fase {fase} (s):", seg) for fase, seg in run_report.get('fases_s', {}).items()]
+        resumen += [(f"Tiempo por documento, {k} (ms):", v)
+                    for k, v in run_report.get('tiempo_documento_ms', {}).items()]
+        resumen += [(f"Llamadas OCR por documento, {k}:", v)
+                    for k, v in run_report.get('llamadas_ocr_documento', {}).items()]
+        for etiqueta, valor in resumen:
+            worksheet.write(row, 0, etiqueta, formats['subtitle'])
+            worksheet.write(row, 1, valor, formats['text_center'])
+            row += 1
+        row += 1
+
+        worksheet.write(row, 0, "TIEMPOS POR ETAPA", formats['subtitle'])
+        row += 1
+        for col, header in enumerate(["Etapa", "Documentos", "Total (s)", "Media (ms)",
+                                      "p50 (ms)", "p95 (ms)", "Máx. (ms)"]):
+            worksheet.write(row, col, header, formats['header'])
+        row += 1
+        for etapa, st in run_report.get('etapas', {}).items():
+            worksheet.write(row, 0, etapa, formats['text'])
+            for col, key in enumerate(['documentos', 'total_s', 'media_ms', 'p50_ms', 'p95_ms', 'max_ms'], 1):
+                worksheet.write_number(row, col, st.get(key, 0), formats['text_center'])
+            row += 1
+        row += 1
+
+        pipeline = run_report.get('pipeline') or {}
+        if pipeline.get('etapas'):
+            worksheet.write(row, 0, f"POOLS FASE 1 ({pipeline.get('modo', '')})", formats['subtitle'])
+            row += 1
+            for col, header in enumerate(["Etapa", "Workers", "Tareas", "Ocupado (s)",
+                                          "Utilización", "Espera media (s)", "Cola máx."]):
+                worksheet.write(row, col, header, formats['header'])
+            row += 1
+            for etapa, st in pipeline['etapas'].items():
+                worksheet.write(row, 0, etapa, formats['text'])
+                worksheet.write_number(row, 1, st.get('workers', 0), formats['text_center'])
+                worksheet.write_number(row, 2, st.get('tareas', 0), formats['text_center'])
+                worksheet.write_number(row, 3, st.get('ocupado_s', 0), formats['text_center'])
+                worksheet.write_number(row, 4, st.get('utilizacion', 0), formats['percent'])
+                worksheet.write(row, 5, st.get('espera_media_s', ''), formats['text_center'])
+                worksheet.write(row, 6, st.get('cola_max', ''), formats['text_center'])
+                row += 1
+            buffers = pipeline.get('buffers')
+            if buffers:
+                worksheet.write(row, 0, "Buffers compartidos (en uso máx. / total):", formats['text'])
+                worksheet.write(row, 1, f"{buffers.get('en_uso_max', 0)} / {buffers.get('cantidad', 0)}",
+                                formats['text_center'])
+                row += 1
+            row += 1
+
+        worksheet.write(row, 0, "CONTADORES", formats['subtitle'])
+        row += 1
+        for nombre, valor in run_report.get('contadores', {}).items():
+            worksheet.write(row, 0, nombre, formats['text'])
+            worksheet.write_number(row, 1, valor, formats['currency'])
+            row += 1
+        row += 1
+
+        picos = run_report.get('picos') or {}
+        if picos:
+            worksheet.write(row, 0, "PICOS POR DOCUMENTO", formats['subtitle'])
+            row += 1
+            for col, header in enumerate(["Pico", "p50", "p95", "Máx."]):
+                worksheet.write(row, col, header, formats['header'])
+            row += 1
+            for nombre, st in picos.items():
+                worksheet.write(row, 0, nombre, formats['text'])
+                for col, key in enumerate(['p50', 'p95', 'max'], 1):
+                    worksheet.write_number(row, col, st.get(key, 0), formats['currency'])
+                row += 1
+            row += 1
+
+        worksheet.write(row, 0, "DOCUMENTOS MÁS LENTOS", formats['subtitle'])
+        row += 1
+        for col, header in enumerate(["Archivo", "Total (ms)", "Etapa dominante", "Etapa (ms)",
+                                      "Llamadas OCR", "Variante", "DPI", "Caché"]):
+            worksheet.write(row, col, header, formats['header'])
+        row += 1
+        for doc in run_report.get('mas_lentos', []):
+            worksheet.write_string(row, 0, str(doc.get('archivo', '')), formats['text'])
+            worksheet.write_number(row, 1, doc.get('total_ms', 0), formats['text_center'])
+            worksheet.write_string(row, 2, doc.get('etapa_dominante', ''), formats['text_center'])
+            worksheet.write_number(row, 3, doc.get('etapa_dominante_ms', 0), formats['text_center'])
+            worksheet.write_number(row, 4, doc.get('llamadas_ocr', 0), formats['text_center'])
+            worksheet.write_string(row, 5, str(doc.get('variante') or ''), formats['text_center'])
+            worksheet.write(row, 6, doc.get('dpi') or '', formats['text_center'])
+            worksheet.write_string(row, 7, "sí" if doc.get('cache') else "no", formats['text_center'])
+            row += 1
+
+    def _generate_convention_reports(self, writer, df_main: pd.DataFrame, formats: Dict,
+                                     row_index: Optional[Dict] = None):
         """Genera hojas de informe por cada convenio"""
+        if row_index is None:
+            row_index = self._build_row_index(df_main)
+
         convenios = df_main[df_main['convenio'] != '']['convenio'].unique()
         if len(convenios) == 0:
             convenios = ['GENERAL']
@@ -345,7 +641,7 @@ class ReportGenerator:
             df_conv = df_main.copy() if convenio == 'GENERAL' else df_main[df_main['convenio'] == convenio].copy()
             if len(df_conv) == 0:
                 continue
-            self._create_convention_sheet(writer, sheet_name, convenio, df_conv, df_main, formats)
+            self._create_convention_sheet(writer, sheet_name, convenio, df_conv, row_index, formats)
 
     def _sanitize_sheet_name(self, name: str) -> str:
         """Sanitiza el nombre de la hoja de Excel (mÃ¡x 31 caracteres)"""
@@ -354,9 +650,33 @@ class ReportGenerator:
         return name if len(name) <= 31 else (name[:28] + '...')
 
     def _create_convention_sheet(self, writer, sheet_name: str, convenio: str,
-                                 df_conv: pd.DataFrame, df_main: pd.DataFrame, formats: Dict):
+                                 df_conv: pd.DataFrame, row_index: Dict, formats: Dict):
         """Crea una hoja de informe para un convenio especÃ­fico"""
-        workbook = writer.book
+        # Grupos (año, mes) en orden cronológico: una sola pasada sobre df_conv
+        grupos = df_conv.groupby(['anio', 'mes'], sort=True)
+        resumen = grupos['monto_num'].agg(['size', 'sum', 'mean'])
+        main_rows = self._main_rows(df_conv, row_index)
+        data_cols = ['nombre', 'rut', 'nro_boleta', 'fecha_documento', 'monto_num',
+                     'decreto_alcaldicio', 'horas', 'glosa']
+
+        # Por mes: fila de 'Base de Datos' de cada registro (o sus valores si no se encontró)
+        meses = []
+        for ((anio, mes), df_mes), num_boletas, total_mes, promedio_mes in zip(
+                grupos, resumen['size'], resumen['sum'], resumen['mean']):
+            filas = [main_row if main_row is not None else tuple(valores)
+                     for main_row, *valores in zip(main_rows.loc[df_mes.index], *(df_mes[c] for c in data_cols))]
+            meses.append((anio, mes, filas, int(num_boletas), float(total_mes), float(promedio_mes)))
+
+        self._write_convention_sheet(writer.book, sheet_name, convenio, len(df_conv),
+                                     df_conv['monto_num'].sum(), df_conv['rut'].nunique(), meses, formats)
+
+    def _write_convention_sheet(self, workbook, sheet_name: str, convenio: str, total_boletas: int,
+                                total_monto: float, personas_unicas: int, meses: List[Tuple], formats: Dict):
+        """
+        Escribe la hoja de un convenio (filas en orden, apto para constant_memory).
+        meses: [(anio, mes, filas, n_boletas, total_mes, promedio_mes)] en orden cronológico;
+        cada fila es el índice en 'Base de Datos' o una tupla de valores a escribir tal cual.
+        """
         worksheet = workbook.add_worksheet(sheet_name)
 
         row = 0
@@ -366,10 +686,6 @@ class ReportGenerator:
         row += 2
 
         # Info general
-        total_boletas = len(df_conv)
-        total_monto = df_conv['monto_num'].sum()
-        personas_unicas = df_conv['rut'].nunique()
-
         worksheet.write(row, 0, "Total Boletas:", formats['subtitle'])
         worksheet.write(row, 1, total_boletas, formats['text_center'])
         worksheet.write(row, 2, "Total Monto:", formats['subtitle'])
@@ -378,64 +694,46 @@ class ReportGenerator:
         worksheet.write(row, 5, personas_unicas, formats['text_center'])
         row += 2
 
-        # AÃ±os Ãºnicos
-        anios = sorted(df_conv['anio'].dropna().unique())
-
-        for anio in anios:
-            df_anio = df_conv[df_conv['anio'] == anio]
+        headers = ['Nombre', 'RUT', 'NÂ° Boleta', 'Fecha', 'Monto', 'Decreto', 'Horas', 'Glosa']
+        # Columna de 'Base de Datos' referenciada por cada columna de la tabla mensual
+        ref_cols = [('A', 'text'), ('B', 'text_center'), ('C', 'text_center'), ('D', 'date'),
+                    ('F', 'currency'), ('O', 'text_center'), ('H', 'text_center'), ('J', 'text')]
+        fallback_formats = ['text', 'text_center', 'text_center', 'text_center',
+                            'currency', 'text_center', 'text_center', 'text']
+
+        anio_actual = None
+        for anio, mes, filas, _, _, _ in meses:
+            if anio != anio_actual:
+                # SubtÃ­tulo aÃ±o
+                worksheet.merge_range(row, 0, row, 7, f"AÃ±o {int(anio)}", formats['subtitle'])
+                row += 1
+                anio_actual = anio
 
-            # SubtÃ­tulo aÃ±o
-            worksheet.merge_range(row, 0, row, 7, f"AÃ±o {int(anio)}", formats['subtitle'])
+            # TÃ­tulo del mes
+            mes_nombre = self.month_names.get(int(mes), f"Mes {int(mes)}")
+            worksheet.write(row, 0, f"{mes_nombre} {int(anio)}:", formats['subtitle'])
             row += 1
 
-            # Meses del aÃ±o
-            meses = sorted(df_anio['mes'].dropna().unique())
-
-            for mes in meses:
-                df_mes = df_anio[df_anio['mes'] == mes]
-                if len(df_mes) == 0:
-                    continue
-
-                # TÃ­tulo del mes
-                mes_nombre = self.month_names.get(int(mes), f"Mes {int(mes)}")
-                worksheet.write(row, 0, f"{mes_nombre} {int(anio)}:", formats['subtitle'])
-                row += 1
+            # Encabezados de la tabla mensual
+            for col, header in enumerate(headers):
+                worksheet.write(row, col, header, formats['header'])
+            row += 1
 
-                # Encabezados de la tabla mensual
-                headers = ['Nombre', 'RUT', 'NÂ° Boleta', 'Fecha', 'Monto', 'Decreto', 'Horas', 'Glosa']
-                for col, header in enumerate(headers):
-                    worksheet.write(row, col, header, formats['header'])
+            # Filas del mes (con fÃ³rmulas referenciadas a la hoja principal)
+            start_row_data = row
+            for fila in filas:
+                if isinstance(fila, tuple):
+                    for col, (valor, fmt) in enumerate(zip(fila, fallback_formats)):
+                        worksheet.write(row, col, valor, formats[fmt])
+                else:
+                    for col, (letra, fmt) in enumerate(ref_cols):
+                        worksheet.write_formula(row, col, f"='Base de Datos'!{letra}{fila+2}", formats[fmt])
                 row += 1
 
-                # Filas del mes (con fÃ³rmulas referenciadas a la hoja principal)
-                start_row_data = row
-                for _, registro in df_mes.iterrows():
-                    main_row = self._find_row_in_main(df_main, registro)
-                    if main_row is not None:
-                        worksheet.write_formula(row, 0, f"='Base de Datos'!A{main_row+2}", formats['text'])
-                        worksheet.write_formula(row, 1, f"='Base de Datos'!B{main_row+2}", formats['text_center'])
-                        worksheet.write_formula(row, 2, f"='Base de Datos'!C{main_row+2}", formats['text_center'])
-                        worksheet.write_formula(row, 3, f"='Base de Datos'!D{main_row+2}", formats['date'])
-                        worksheet.write_formula(row, 4, f"='Base de Datos'!F{main_row+2}", formats['currency'])
-                        worksheet.write_formula(row, 5, f"='Base de Datos'!O{main_row+2}", formats['text_center'])
-                        worksheet.write_formula(row, 6, f"='Base de Datos'!H{main_row+2}", formats['text_center'])
-                        worksheet.write_formula(row, 7, f"='Base de Datos'!J{main_row+2}", formats['text'])
-                    else:
-                        worksheet.write(row, 0, registro.get('nombre', ''), formats['text'])
-                        worksheet.write(row, 1, registro.get('rut', ''), formats['text_center'])
-                        worksheet.write(row, 2, registro.get('nro_boleta', ''), formats['text_center'])
-                        worksheet.write(row, 3, registro.get('fecha_documento', ''), formats['text_center'])
-                        worksheet.write(row, 4, registro.get('monto_num', 0), formats['currency'])
-                        worksheet.write(row, 5, registro.get('decreto_alcaldicio', ''), formats['text_center'])
-                        worksheet.write(row, 6, registro.get('horas', ''), formats['text_center'])
-                        worksheet.write(row, 7, registro.get('glosa', ''), formats['text'])
-
-                    row += 1
-
-                # Total del mes
-                worksheet.write(row, 3, "Total Mes:", formats['subtitle'])
-                worksheet.write_formula(row, 4, f"=SUM(E{start_row_data+1}:E{row})", formats['total'])
-                row += 2
+            # Total del mes
+            worksheet.write(row, 3, "Total Mes:", formats['subtitle'])
+            worksheet.write_formula(row, 4, f"=SUM(E{start_row_data+1}:E{row})", formats['total'])
+            row += 2
 
         # Resumen anual al final
         row += 1
@@ -452,29 +750,21 @@ class ReportGenerator:
 
         # Datos del resumen por mes
         resumen_rows = []
-        for anio in anios:
-            df_anio = df_conv[df_conv['anio'] == anio]
-            meses = sorted(df_anio['mes'].dropna().unique())
-
-            for mes in meses:
-                df_mes = df_anio[df_anio['mes'] == mes]
-                mes_nombre = self.month_names.get(int(mes), f"Mes {int(mes)}")
-                num_boletas = len(df_mes)
-                total_mes = df_mes['monto_num'].sum()
-                promedio_mes = df_mes['monto_num'].mean() if num_boletas > 0 else 0
-
-                worksheet.write(row, 0, f"{mes_nombre} {int(anio)}", formats['text'])
-                worksheet.write(row, 1, num_boletas, formats['text_center'])
-                worksheet.write(row, 2, total_mes, formats['currency'])
-                worksheet.write(row, 3, promedio_mes, formats['currency'])
-
-                if total_monto > 0:
-                    worksheet.write_formula(row, 4, f"=C{row+1}/{total_monto}", formats['percent'])
-                else:
-                    worksheet.write(row, 4, 0, formats['percent'])
+        for anio, mes, _, num_boletas, total_mes, promedio_mes in meses:
+            mes_nombre = self.month_names.get(int(mes), f"Mes {int(mes)}")
 
-                resumen_rows.append(row)
-                row += 1
+            worksheet.write(row, 0, f"{mes_nombre} {int(anio)}", formats['text'])
+            worksheet.write(row, 1, num_boletas, formats['text_center'])
+            worksheet.write(row, 2, total_mes, formats['currency'])
+            worksheet.write(row, 3, promedio_mes, formats['currency'])
+
+            if total_monto > 0:
+                worksheet.write_formula(row, 4, f"=C{row+1}/{total_monto}", formats['percent'])
+            else:
+                worksheet.write(row, 4, 0, formats['percent'])
+
+            resumen_rows.append(row)
+            row += 1
 
         # Total general
         if resumen_rows:
@@ -494,22 +784,45 @@ class ReportGenerator:
         worksheet.set_column('G:G', 8)
         worksheet.set_column('H:H', 40)
 
-    def _find_row_in_main(self, df_main: pd.DataFrame, registro: pd.Series) -> Optional[int]:
+    def _build_row_index(self, df_main: pd.DataFrame) -> Dict:
+        """
+        Índice clave -> fila de 'Base de Datos' (una pasada sobre df_main)
+        - (rut, nro_boleta) -> filas con esa clave
+        - (rut, nro_boleta, fecha_documento) -> primera fila, para desambiguar duplicados
+        """
+        por_boleta, por_fecha = {}, {}
+        for pos, (rut, nro, fecha) in enumerate(zip(df_main['rut'], df_main['nro_boleta'],
+                                                     df_main['fecha_documento'])):
+            if pd.isna(rut) or pd.isna(nro):
+                continue
+            idx = df_main.index[pos]
+            por_boleta.setdefault((rut, nro), []).append(idx)
+            if not pd.isna(fecha):
+                por_fecha.setdefault((rut, nro, fecha), idx)
+        return {'boleta': por_boleta, 'fecha': por_fecha}
+
+    def _find_row_in_main(self, row_index: Dict, rut, nro_boleta, fecha_documento) -> Optional[int]:
         """
         Encuentra el Ã­ndice de una fila en el DataFrame principal basÃ¡ndose en campos Ãºnicos
         """
-        mask = (df_main['rut'] == registro.get('rut')) & (df_main['nro_boleta'] == registro.get('nro_boleta'))
-        matches = df_main[mask]
-
-        if len(matches) == 1:
-            return matches.index[0]
-        elif len(matches) > 1:
-            mask = mask & (df_main['fecha_documento'] == registro.get('fecha_documento'))
-            matches = df_main[mask]
-            if len(matches) > 0:
-                return matches.index[0]
+        try:
+            matches = row_index['boleta'].get((rut, nro_boleta), [])
+            if len(matches) == 1:
+                return matches[0]
+            elif len(matches) > 1:
+                return row_index['fecha'].get((rut, nro_boleta, fecha_documento))
+        except TypeError:  # clave no hashable
+            pass
         return None
 
+    def _main_rows(self, df: pd.DataFrame, row_index: Dict) -> pd.Series:
+        """Fila de 'Base de Datos' de cada registro de df (None si no se encuentra)"""
+        return pd.Series(
+            [self._find_row_in_main(row_index, rut, nro, fecha)
+             for rut, nro, fecha in zip(df['rut'], df['nro_boleta'], df['fecha_documento'])],
+            index=df.index, dtype=object
+        )
+
     def generate_summary_report(self, df: pd.DataFrame, output_path: str):
         """
         Genera un informe resumido en un archivo Excel separado
@@ -583,13 +896,21 @@ class ReportGenerator:
 
         writer.close()
     
-    def generate_individual_professional_reports(self, df: pd.DataFrame, output_dir: Path):
+    def generate_individual_professional_reports(self, df: pd.DataFrame, output_dir: Path,
+                                                 max_workers: int = INDIVIDUAL_REPORT_WORKERS,
+                                                 progress_callback=None) -> Dict:
         """
         Genera un archivo Excel individual por cada profesional
 
         Args:
             df: DataFrame con todos los registros procesados
             output_dir: Directorio donde guardar los archivos individuales
+            max_workers: Procesos en paralelo (1 = secuencial en el hilo actual)
+            progress_callback: progress_callback(rut, archivo, error, completados, total)
+                               por cada profesional terminado (archivo=None si falló)
+
+        Returns:
+            {'total': int, 'generados': [rutas], 'fallidos': [{'rut', 'nombre', 'error'}]}
         """
         output_dir = Path(output_dir)
         output_dir.mkdir(parents=True, exist_ok=True)
@@ -598,66 +919,117 @@ class ReportGenerator:
         if 'monto_num' not in df.columns or df['monto_num'].isna().all():
             df['monto_num'] = pd.to_numeric(df.get('monto', 0), errors='coerce').fillna(0)
 
-        # Agrupar por RUT (verificando coherencia con nombre)
-        profesionales = self._group_by_professional(df)
-        
-        print(f"\n📊 Generando {len(profesionales)} reportes individuales...")
-        
-        for rut, grupo_data in profesionales.items():
-            try:
-                self._create_individual_report(rut, grupo_data, output_dir)
-            except Exception as e:
-                print(f"❌ Error generando reporte para RUT {rut}: {e}")
-        
+        # Agrupar por RUT (verificando coherencia con nombre); los grupos se generan
+        # de a uno a medida que se escribe (o se encola) cada archivo
+        total = df.loc[self._valid_rut_mask(df), 'rut'].nunique()
+        print(f"\n📊 Generando {total} reportes individuales...")
+
+        resumen = {'total': total, 'generados': [], 'fallidos': []}
+
+        def _done(rut, nombre, archivo, error):
+            if error is None:
+                resumen['generados'].append(archivo)
+            else:
+                print(f"❌ Error generando reporte para RUT {rut}: {error}")
+                resumen['fallidos'].append({'rut': rut, 'nombre': nombre, 'error': error})
+            if progress_callback is not None:
+                completados = len(resumen['generados']) + len(resumen['fallidos'])
+                progress_callback(rut, archivo, error, completados, total)
+
+        grupos = self._group_by_professional(df)
+        workers = min(max_workers or 1, total)
+        if workers <= 1:
+            for rut, grupo_data in grupos:
+                try:
+                    archivo = str(self._create_individual_report(rut, grupo_data, output_dir))
+                    _done(rut, grupo_data['nombre'], archivo, None)
+                except Exception as e:
+                    _done(rut, grupo_data['nombre'], None, str(e))
+        else:
+            self._run_individual_pool(grupos, output_dir, workers, _done)
+
+        if resumen['fallidos']:
+            print(f"⚠️ {len(resumen['fallidos'])} reportes individuales fallaron:")
+            for fallo in resumen['fallidos']:
+                print(f"   - {fallo['rut']} ({fallo['nombre']}): {fallo['error']}")
         print(f"✓ Reportes individuales guardados en: {output_dir}")
+        return resumen
+
+    def _run_individual_pool(self, grupos: Iterator[Tuple[str, Dict]], output_dir: Path,
+                             workers: int, on_done):
+        """
+        Reparte _create_individual_report en un pool de procesos.
+        Cada tarea recibe solo las columnas que usa el reporte de ese profesional y
+        se encolan a lo más 2·workers a la vez (memoria acotada con cientos de RUT).
+        """
+        pendientes = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            def _collect(futures):
+                for future in futures:
+                    rut, nombre = pendientes.pop(future)
+                    try:
+                        on_done(rut, nombre, future.result(), None)
+                    except Exception as e:
+                        on_done(rut, nombre, None, str(e))
+
+            for rut, grupo_data in grupos:
+                registros = grupo_data['registros']
+                payload = dict(grupo_data, registros=registros[
+                    [c for c in INDIVIDUAL_REPORT_COLUMNS if c in registros.columns]])
+                future = executor.submit(_individual_report_job, rut, payload, str(output_dir))
+                pendientes[future] = (rut, grupo_data['nombre'])
+                if len(pendientes) >= 2 * workers:
+                    listos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                    _collect(listos)
+            _collect(list(pendientes))
+
+    @staticmethod
+    def _valid_rut_mask(df: pd.DataFrame) -> pd.Series:
+        return df['rut'].notna() & (df['rut'] != '')
     
-    def _group_by_professional(self, df: pd.DataFrame) -> Dict:
+    def _group_by_professional(self, df: pd.DataFrame) -> Iterator[Tuple[str, Dict]]:
         """
-        Agrupa registros por profesional, verificando coherencia nombre-RUT
+        Agrupa registros por profesional, verificando coherencia nombre-RUT.
+        Una sola pasada groupby('rut') (orden de aparición); genera (rut, grupo_data)
+        bajo demanda para no mantener todos los grupos en memoria.
         """
         # Asegurar que monto_num existe ANTES de cualquier operación
         if 'monto_num' not in df.columns:
             df['monto_num'] = pd.to_numeric(df.get('monto', 0), errors='coerce').fillna(0)
 
-        profesionales = {}
+        validos = df[self._valid_rut_mask(df)]
 
-        # Agrupar por RUT
-        for rut in df['rut'].unique():
-            if not rut or pd.isna(rut):
-                continue
+        # Nombres por RUT con su frecuencia (orden de aparición), calculados una vez
+        nombres_por_rut = {}
+        for (rut, nombre), n in validos.groupby(['rut', 'nombre'], sort=False).size().items():
+            nombres_por_rut.setdefault(rut, []).append((nombre, n))
 
-            registros_rut = df[df['rut'] == rut].copy()
-
-            # Asegurar monto_num en cada grupo también
-            if 'monto_num' not in registros_rut.columns:
-                registros_rut['monto_num'] = pd.to_numeric(registros_rut.get('monto', 0), errors='coerce').fillna(0)
-            
+        for rut, registros_rut in validos.groupby('rut', sort=False):
             # Verificar coherencia de nombres
-            nombres = registros_rut['nombre'].dropna().unique()
+            nombres = nombres_por_rut.get(rut, [])
             
             if len(nombres) == 0:
                 nombre_principal = "SIN NOMBRE"
                 warnings = ["⚠️ No se encontró nombre asociado"]
             elif len(nombres) == 1:
-                nombre_principal = nombres[0]
+                nombre_principal = nombres[0][0]
                 warnings = []
             else:
-                # Múltiples nombres para el mismo RUT - usar el más frecuente
-                nombre_principal = registros_rut['nombre'].mode()[0] if len(registros_rut['nombre'].mode()) > 0 else nombres[0]
-                warnings = [f"⚠️ Múltiples nombres detectados: {', '.join(nombres)}"]
+                # Múltiples nombres para el mismo RUT - usar el más frecuente (empate: orden alfabético, como mode())
+                max_n = max(n for _, n in nombres)
+                nombre_principal = min(nombre for nombre, n in nombres if n == max_n)
+                warnings = [f"⚠️ Múltiples nombres detectados: {', '.join(nombre for nombre, _ in nombres)}"]
             
-            profesionales[rut] = {
+            yield rut, {
                 'nombre': nombre_principal,
                 'rut': rut,
                 'registros': registros_rut,
                 'warnings': warnings
             }
-        
-        return profesionales
     
     def _create_individual_report(self, rut: str, grupo_data: Dict, output_dir: Path):
         """
-        Crea un archivo Excel individual para un profesional
+        Crea un archivo Excel individual para un profesional y retorna su ruta
         """
         nombre = grupo_data['nombre']
         registros = grupo_data['registros']
@@ -804,6 +1176,7 @@ class ReportGenerator:
         worksheet.set_column('F:F', 25)
         
         writer.close()
+        return filepath
     
     def _sanitize_filename(self, nombre: str) -> str:
         """
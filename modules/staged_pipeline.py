@@ -0,0 +1,363 @@
+# modules/staged_pipeline.py
+"""
+FASE 1 por etapas: render -> preproceso -> OCR, cada una con su pool de procesos
+
+En el pool único (pipeline.run_ocr_phase) cada worker hace todo en serie:
+rasterizar con poppler (subproceso), orientar, preprocesar y llamar a Tesseract.
+Aquí las etapas se solapan y se dimensionan por separado:
+
+1) render:     caché OCR y texto embebido; si hace falta OCR, la primera página al
+               primer DPI de la escalera (o la imagen) se copia a un buffer compartido
+2) preproceso: timbre electrónico (PDF417) y orientación (la del código, o perfiles
+               de proyección / palabra clave / OSD) leyendo el buffer sin copiarlo
+3) OCR:        DataProcessorOptimized.process_file con la PaginaPrevia (ROI,
+               variantes, peldaños de DPI siguientes, campos y especificación de la preview)
+
+Los buffers (multiprocessing.shared_memory) los crea y libera el proceso principal
+y se reutilizan entre páginas; los workers se adjuntan por nombre una vez. Cada
+página conserva su buffer hasta terminar el OCR, así la cantidad de buffers acota
+las colas entre etapas (además de workers + OCR_STAGE_QUEUE_DEPTH trabajos por
+etapa). Los archivos sin render (acierto de caché, texto embebido) pasan directo
+al OCR. Las variantes de binarización se siguen generando dentro de la etapa OCR:
+son perezosas (salida temprana) y adelantarlas generaría variantes que no se leen.
+"""
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import *
+from modules.instrumentation import StageTimer
+from modules.page_artifacts import PageArtifacts
+from modules.data_processing import init_worker, _get_worker_processor
+
+ETAPAS_PIPELINE = ("render", "preproceso", "ocr")
+
+# Por proceso worker de render/preproceso (init_stage_worker)
+_STAGE_EXTRACTOR = None
+_STAGE_CACHE = None
+# Buffers compartidos ya adjuntados en este proceso (nombre -> SharedMemory)
+_ADJUNTOS: Dict[str, shared_memory.SharedMemory] = {}
+
+
+class PageBufferPool:
+    """Buffers de memoria compartida de tamaño fijo para las páginas en tránsito"""
+
+    def __init__(self, n: int, size_mb: float = OCR_PAGE_BUFFER_MB):
+        self.size = int(size_mb * 1024 * 1024)
+        self._buffers = [shared_memory.SharedMemory(create=True, size=self.size) for _ in range(n)]
+        self._libres = deque(b.name for b in self._buffers)
+        self.en_uso_max = 0
+
+    def __len__(self) -> int:
+        return len(self._buffers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def acquire(self) -> Optional[str]:
+        """Nombre de un buffer libre (None si están todos ocupados)"""
+        if not self._libres:
+            return None
+        name = self._libres.popleft()
+        self.en_uso_max = max(self.en_uso_max, len(self._buffers) - len(self._libres))
+        return name
+
+    def release(self, name: Optional[str]):
+        if name:
+            self._libres.append(name)
+
+    def close(self):
+        for buf in self._buffers:
+            try:
+                buf.close()
+                buf.unlink()
+            except Exception:
+                pass
+        self._buffers = []
+        self._libres.clear()
+
+
+def _page_view(pagina: Dict) -> np.ndarray:
+    """Vista numpy (sin copia) de una página en un buffer compartido"""
+    shm = _ADJUNTOS.get(pagina['buffer'])
+    if shm is None:
+        shm = _ADJUNTOS[pagina['buffer']] = shared_memory.SharedMemory(name=pagina['buffer'])
+    return np.ndarray(tuple(pagina['shape']), dtype=np.dtype(pagina['dtype']), buffer=shm.buf)
+
+
+def init_stage_worker(cache_dir: Optional[str] = None, use_cache: bool = OCR_CACHE_ENABLED):
+    """Initializer de los pools de render y preproceso: extractor y caché una vez por proceso"""
+    global _STAGE_EXTRACTOR, _STAGE_CACHE
+    from modules.ocr_cache import OCRCache
+    from modules.ocr_extraction import OCRExtractorOptimized
+    _STAGE_CACHE = OCRCache(cache_dir=cache_dir) if use_cache else None
+    _STAGE_EXTRACTOR = OCRExtractorOptimized(orientation_store=_STAGE_CACHE)
+
+
+def render_worker(file_path_str: str, buffer: str, buffer_size: int) -> Dict:
+    """
+    Etapa 1. Sin 'pagina' en la salida el archivo va directo al OCR: acierto de caché,
+    texto embebido utilizable, página más grande que el buffer o error (el OCR repite
+    el camino normal y reporta el error como siempre).
+    """
+    import cv2
+    from modules.ocr_cache import file_sha256
+    from modules.ocr_extraction import pdf_dpi_ladder
+
+    inicio, t0 = time.time(), time.perf_counter()
+    extractor = _STAGE_EXTRACTOR
+    timer = extractor.timer = StageTimer()
+    file_path = Path(file_path_str)
+    out = {'hash': '', 'pagina': None, 'dpi': None, 'texto_embebido': '', 'pdf_tipo': '', 'sin_buffer': False}
+    try:
+        if _STAGE_CACHE is not None:
+            with timer.stage('cache'):
+                out['hash'] = file_sha256(file_path)
+                if _STAGE_CACHE.get(out['hash']):
+                    return out
+
+        if file_path.suffix.lower() == '.pdf':
+            with timer.stage('texto_embebido'):
+                out['texto_embebido'], out['pdf_tipo'] = extractor.pdf_digital_text(file_path)
+            if out['texto_embebido']:
+                return out
+            out['dpi'] = pdf_dpi_ladder()[0]
+            with timer.stage('render'):
+                img = np.asarray(extractor._pdf_first_page_to_image(file_path, dpi=out['dpi']))
+            timer.count('renders')
+            timer.count('pixeles_render', int(img.shape[0] * img.shape[1]))
+        else:
+            with timer.stage('render'):
+                img = cv2.imread(file_path_str)
+            if img is None:
+                return out
+
+        if img.nbytes > buffer_size:
+            out['sin_buffer'] = True
+            return out
+        pagina = {'buffer': buffer, 'shape': img.shape, 'dtype': img.dtype.str}
+        with timer.stage('render'):
+            _page_view(pagina)[...] = img
+        out['pagina'] = pagina
+        return out
+    except Exception as e:
+        out['error'] = str(e)
+        return out
+    finally:
+        out.update(instrumentacion=timer.as_dict(), inicio=inicio, ocupado_s=time.perf_counter() - t0)
+
+
+def preprocess_worker(pagina: Dict, file_hash: str = "") -> Dict:
+    """
+    Etapa 2: timbre electrónico y orientación de la página. Con timbre legible la
+    orientación sale del código PDF417; si no, se detecta (y se guarda por hash)
+    como siempre.
+    """
+    inicio, t0 = time.time(), time.perf_counter()
+    extractor = _STAGE_EXTRACTOR
+    timer = extractor.timer = StageTimer()
+    run = extractor._new_run()
+    out = {'angulo': None, 'orientacion_metodo': '', 'llamadas_ocr': 0, 'pixeles_ocr': 0}
+    try:
+        # El gris lo comparten el timbre y la orientación
+        gris = PageArtifacts(_page_view(pagina), timer).gris
+        timbre = extractor.read_timbre(gris)
+        out['timbre'] = timbre or {}
+        with timer.stage('orientacion'):
+            if timbre:
+                out['angulo'] = extractor._orientacion_timbre(timbre)
+            else:
+                out['angulo'] = extractor.detect_orientation(gris, file_hash)
+        del gris
+        out.update(orientacion_metodo=run.get('orientacion_metodo', ''),
+                   llamadas_ocr=run.get('llamadas_ocr', 0), pixeles_ocr=run.get('pixeles_ocr', 0))
+    except Exception as e:
+        out['error'] = str(e)  # el OCR detecta la orientación por su cuenta
+    finally:
+        out.update(instrumentacion=timer.as_dict(), inicio=inicio, ocupado_s=time.perf_counter() - t0)
+    return out
+
+
+def ocr_worker(job: Dict) -> Dict:
+    """Etapa 3: process_file con lo que prepararon las etapas anteriores"""
+    from modules.ocr_extraction import PaginaPrevia
+
+    inicio, t0 = time.time(), time.perf_counter()
+    dp = _get_worker_processor()
+    # Cada archivo parte con batch vacío: la búsqueda cruzada real ocurre en el post-proceso
+    dp.reset_batch_memory()
+    timer = StageTimer()
+    for previo in job.get('instrumentacion', []):
+        timer.absorb(previo)
+
+    previa = None
+    if job.get('pagina') or job.get('texto_embebido'):
+        previa = PaginaPrevia(
+            imagen=_page_view(job['pagina']) if job.get('pagina') else None,
+            dpi=job.get('dpi'), angulo=job.get('angulo'),
+            orientacion_metodo=job.get('orientacion_metodo', ''),
+            texto_embebido=job.get('texto_embebido', ''), pdf_tipo=job.get('pdf_tipo', ''),
+            llamadas_ocr=job.get('llamadas_ocr', 0), pixeles_ocr=job.get('pixeles_ocr', 0),
+            timbre=job.get('timbre'),
+        )
+    try:
+        resultado = dp.process_file(Path(job['archivo']), file_hash=job.get('hash', ''),
+                                    previa=previa, timer=timer)
+    finally:
+        previa = None  # suelta la vista sobre el buffer antes de devolverlo
+    return {'resultado': resultado, 'inicio': inicio, 'ocupado_s': time.perf_counter() - t0}
+
+
+# Lo que viaja al worker de OCR (el resto del trabajo es estado del despachador)
+_OCR_JOB_KEYS = ('archivo', 'hash', 'pagina', 'dpi', 'angulo', 'orientacion_metodo',
+                 'texto_embebido', 'pdf_tipo', 'llamadas_ocr', 'pixeles_ocr', 'timbre', 'instrumentacion')
+
+
+def run_staged_ocr_phase(files: List[Path], max_workers: int = MAX_WORKERS,
+                         cache_dir: Optional[str] = None, use_cache: bool = OCR_CACHE_ENABLED,
+                         on_result: Optional[Callable[[Path, Optional[Dict], Optional[str], int, int], None]] = None,
+                         should_continue: Optional[Callable[[], bool]] = None,
+                         stats: Optional[Dict] = None) -> Tuple[List[Dict], List[str]]:
+    """
+    Igual contrato que pipeline.run_ocr_phase. En stats (si se entrega) deja la
+    utilización por etapa: workers, tareas, ocupado_s, utilizacion (ocupado /
+    workers × duración), espera_media_s (desde que el trabajo queda listo hasta
+    que un worker lo toma) y cola_max; más el uso de buffers compartidos.
+    """
+    total = len(files)
+    all_results: List[Dict] = []
+    errors: List[str] = []
+    if total == 0:
+        return all_results, errors
+
+    workers = {
+        'render': max(1, min(OCR_RENDER_WORKERS, total)),
+        'preproceso': max(1, min(OCR_PREPROC_WORKERS, total)),
+        'ocr': max(1, min(max_workers, total)),
+    }
+    limites = {etapa: n + OCR_STAGE_QUEUE_DEPTH for etapa, n in workers.items()}
+    n_buffers = max(1, OCR_PAGE_BUFFERS or (sum(workers.values()) + OCR_STAGE_QUEUE_DEPTH))
+    etapas = {etapa: {'workers': n, 'tareas': 0, 'ocupado_s': 0.0, 'espera_s': 0.0, 'cola_max': 0}
+              for etapa, n in workers.items()}
+    sin_buffer = 0
+
+    colas = {etapa: deque() for etapa in ETAPAS_PIPELINE}
+    ocupados = {etapa: 0 for etapa in ETAPAS_PIPELINE}
+    en_vuelo = {}  # future -> (etapa, trabajo)
+    for f in files:
+        colas['render'].append({'ruta': f, 'archivo': str(f), 'listo': time.time(), 'instrumentacion': []})
+
+    t0 = time.perf_counter()
+    completed = 0
+    # Los buffers se crean antes que los pools: los workers comparten el resource_tracker
+    with PageBufferPool(n_buffers) as buffers, \
+            ProcessPoolExecutor(max_workers=workers['render'], initializer=init_stage_worker,
+                                initargs=(cache_dir, use_cache)) as ex_render, \
+            ProcessPoolExecutor(max_workers=workers['preproceso'], initializer=init_stage_worker,
+                                initargs=(cache_dir, use_cache)) as ex_pre, \
+            ProcessPoolExecutor(max_workers=workers['ocr'], initializer=init_worker,
+                                initargs=(cache_dir, use_cache, 1)) as ex_ocr:
+
+        def submit(etapa: str, job: Dict):
+            if etapa == 'render':
+                return ex_render.submit(render_worker, job['archivo'], job['buffer'], buffers.size)
+            if etapa == 'preproceso':
+                return ex_pre.submit(preprocess_worker, job['pagina'], job.get('hash', ''))
+            return ex_ocr.submit(ocr_worker, {k: job[k] for k in _OCR_JOB_KEYS if k in job})
+
+        def encolar(etapa: str, job: Dict):
+            job['listo'] = time.time()
+            colas[etapa].append(job)
+
+        while en_vuelo or any(colas.values()):
+            if should_continue is not None and not should_continue():
+                for fut in en_vuelo:
+                    fut.cancel()
+                break
+
+            # Despachar: OCR primero (libera buffers), render solo con buffer libre
+            for etapa in reversed(ETAPAS_PIPELINE):
+                cola = colas[etapa]
+                while cola and ocupados[etapa] < limites[etapa]:
+                    if etapa == 'render':
+                        cola[0]['buffer'] = buffers.acquire()
+                        if cola[0]['buffer'] is None:
+                            break
+                    job = cola.popleft()
+                    en_vuelo[submit(etapa, job)] = (etapa, job)
+                    ocupados[etapa] += 1
+                espera = len(cola) + max(0, ocupados[etapa] - workers[etapa])
+                etapas[etapa]['cola_max'] = max(etapas[etapa]['cola_max'], espera)
+
+            done, _ = wait(list(en_vuelo), return_when=FIRST_COMPLETED)
+            for fut in done:
+                etapa, job = en_vuelo.pop(fut)
+                ocupados[etapa] -= 1
+                try:
+                    out = fut.result()
+                except Exception as e:
+                    out = {'error': str(e)}
+                if 'inicio' in out:
+                    etapas[etapa]['tareas'] += 1
+                    etapas[etapa]['ocupado_s'] += out['ocupado_s']
+                    etapas[etapa]['espera_s'] += max(0.0, out['inicio'] - job['listo'])
+
+                if etapa == 'render':
+                    job.update({k: out[k] for k in ('hash', 'pagina', 'dpi', 'texto_embebido', 'pdf_tipo')
+                                if k in out})
+                    if out.get('instrumentacion'):
+                        job['instrumentacion'].append(out['instrumentacion'])
+                    sin_buffer += bool(out.get('sin_buffer'))
+                    if job.get('pagina'):
+                        encolar('preproceso', job)
+                    else:
+                        buffers.release(job.pop('buffer', None))
+                        encolar('ocr', job)
+                elif etapa == 'preproceso':
+                    if 'error' not in out:
+                        job.update({k: out[k] for k in ('angulo', 'orientacion_metodo', 'timbre',
+                                                        'llamadas_ocr', 'pixeles_ocr')})
+                    if out.get('instrumentacion'):
+                        job['instrumentacion'].append(out['instrumentacion'])
+                    encolar('ocr', job)
+                else:
+                    buffers.release(job.pop('buffer', None))
+                    completed += 1
+                    result, error = out.get('resultado'), None
+                    if result is None:
+                        error = out.get('error', 'sin resultado')
+                    elif result.get('error'):
+                        error, result = str(result.get('error')), None
+
+                    if error is not None:
+                        errors.append(job['archivo'])
+                    else:
+                        all_results.append(result)
+                    if on_result is not None:
+                        on_result(job['ruta'], result, error, completed, total)
+
+        duracion = time.perf_counter() - t0
+        if stats is not None:
+            for st in etapas.values():
+                st['utilizacion'] = round(st['ocupado_s'] / (st['workers'] * duracion), 3) if duracion else 0.0
+                st['espera_media_s'] = round(st.pop('espera_s') / st['tareas'], 3) if st['tareas'] else 0.0
+                st['ocupado_s'] = round(st['ocupado_s'], 3)
+            stats.update({
+                'modo': 'etapas',
+                'duracion_s': round(duracion, 3),
+                'etapas': etapas,
+                'buffers': {'cantidad': len(buffers), 'mb': OCR_PAGE_BUFFER_MB,
+                            'en_uso_max': buffers.en_uso_max, 'sin_buffer': sin_buffer},
+            })
+
+    return all_results, errors
@@ -0,0 +1,96 @@
+# modules/timbre.py
+"""
+Timbre electrónico SII de las boletas de honorarios electrónicas
+- El timbre es un código PDF417 con el TED (Timbre Electrónico del Documento):
+  <TED><DD><RE>rut emisor</RE><F>folio</F><FE>fecha</FE><MNT>monto</MNT>...</DD>...</TED>
+- decode_timbre: ubica y decodifica el PDF417 de una página renderizada
+  (zxing-cpp, opcional) y retorna RUT, folio, fecha y monto, más la rotación
+  que endereza la página según la orientación del código.
+
+Sin zxing-cpp instalado decode_timbre retorna None y el OCR sigue como siempre.
+"""
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import *
+from modules.utils import dv_ok
+
+try:
+    import zxingcpp
+except ImportError:  # lector PDF417 opcional
+    zxingcpp = None
+
+_TED_RE = re.compile(r'<TED\b')
+_TED_CAMPO_RES = {
+    campo: re.compile(rf'<{campo}>\s*([^<]*?)\s*</{campo}>')
+    for campo in ("RE", "F", "FE", "MNT", "RR")
+}
+
+
+def _formatear_rut(rut: str) -> str:
+    """'12345678-5' -> '12.345.678-5' (formato impreso de la boleta y de la memoria)"""
+    cuerpo, dv = rut.replace('.', '').upper().split('-')
+    return f"{int(cuerpo):,}".replace(",", ".") + f"-{dv}"
+
+
+def parse_ted(texto: str) -> Optional[Dict]:
+    """
+    Campos del TED: {'rut', 'nro_boleta', 'fecha_documento', 'monto', 'rut_receptor'}.
+    None si el texto no es un TED o falta/no valida alguno de RE, F, FE y MNT.
+    """
+    if not texto or not _TED_RE.search(texto):
+        return None
+    valores = {}
+    for campo, rx in _TED_CAMPO_RES.items():
+        m = rx.search(texto)
+        valores[campo] = m.group(1) if m else ""
+
+    rut = valores["RE"]
+    if not rut or not dv_ok(rut):
+        return None
+    if not valores["F"].isdigit() or not valores["MNT"].isdigit():
+        return None
+    try:
+        fecha = datetime.strptime(valores["FE"], "%Y-%m-%d")
+    except ValueError:
+        return None
+
+    receptor = valores["RR"]
+    return {
+        'rut': _formatear_rut(rut),
+        'nro_boleta': str(int(valores["F"])),
+        'fecha_documento': fecha.strftime("%Y-%m-%d"),
+        'monto': str(int(valores["MNT"])),
+        'rut_receptor': _formatear_rut(receptor) if receptor and dv_ok(receptor) else "",
+    }
+
+
+def decode_timbre(img: np.ndarray) -> Optional[Dict]:
+    """
+    Busca el PDF417 en toda la página (el detector de zxing lo ubica en cualquier
+    posición y rotación) y retorna los campos del TED más 'orientacion': grados a
+    rotar la página (0/90/180/270, como ImagePreprocessor.rotate). None si no hay
+    timbre legible.
+    """
+    if zxingcpp is None or img is None:
+        return None
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    try:
+        codigos = zxingcpp.read_barcodes(np.ascontiguousarray(gray), formats=zxingcpp.BarcodeFormat.PDF417)
+    except Exception:
+        return None
+
+    for codigo in codigos:
+        campos = parse_ted(codigo.text)
+        if campos:
+            # orientation = giro del código en sentido horario; la corrección es la inversa
+            campos['orientacion'] = (-int(round(codigo.orientation / 90.0)) * 90) % 360
+            return campos
+    return None
@@ -10,11 +10,11 @@ from pathlib import Path
 from datetime import datetime
 import sys
 import os
-from .memory import Memory  # ⟵ importa la clase Memory
+from .memory import Memory, open_memory  # ⟵ importa la clase Memory
 import json
 
 # instancia global (a nivel de módulo)
-MEMORY = Memory()  # carga automática de memory.json
+MEMORY = open_memory()  # carga automática (SQLite o memory.json según config)
 
 sys.path.append(str(Path(__file__).parent.parent))
 from config import *
@@ -0,0 +1,69 @@
+# tests/test_memory_threads.py
+"""
+SQLiteMemory creada en un hilo y usada desde otro (flujo de la GUI: la memoria
+se construye en el hilo de Tk y el lote se procesa en un hilo de trabajo).
+"""
+import sys
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from modules.memory import SQLiteMemory
+
+
+def _en_otro_hilo(fn):
+    resultado, errores = [], []
+
+    def correr():
+        try:
+            resultado.append(fn())
+        except Exception as e:  # se re-lanza en el hilo del test
+            errores.append(e)
+
+    hilo = threading.Thread(target=correr)
+    hilo.start()
+    hilo.join()
+    if errores:
+        raise errores[0]
+    return resultado[0]
+
+
+def test_memoria_sqlite_usable_desde_otro_hilo(tmp_path):
+    mem = SQLiteMemory(tmp_path / "memory.sqlite3", json_path=tmp_path / "no_existe.json")
+    mem.learn({'rut': '11.111.111-1', 'nombre': 'ANA ROJAS DIAZ', 'convenio': 'PASMI'})
+
+    def trabajo():
+        with mem.batch():
+            mem.learn({'rut': '12.345.678-5', 'nombre': 'JUAN PABLO SOTO ROJAS', 'convenio': 'DIR',
+                       'decreto_alcaldicio': '123', 'monto': '500000', 'horas': '22'})
+        return (mem.get_name_by_rut('11.111.111-1'),
+                mem.get_rut_by_name('JUAN PABLO SOTO ROJA'),  # búsqueda difusa
+                mem.get_convenio_by_rut('12.345.678-5'),
+                mem.get_payment_by_rut_decreto('12.345.678-5', '123').get('monto'))
+
+    assert _en_otro_hilo(trabajo) == ('ANA ROJAS DIAZ', '12.345.678-5', 'DIR', '500000')
+    # De vuelta en el hilo que la creó: lo aprendido en el otro hilo quedó confirmado
+    assert mem.get_name_by_rut('12.345.678-5') == 'JUAN PABLO SOTO ROJAS'
+    mem.close()
+
+    reabierta = SQLiteMemory(tmp_path / "memory.sqlite3", json_path=tmp_path / "no_existe.json")
+    assert reabierta.get_convenio_by_rut('12.345.678-5') == 'DIR'
+    reabierta.close()
+
+
+def test_memoria_sqlite_hilos_concurrentes(tmp_path):
+    mem = SQLiteMemory(tmp_path / "memory.sqlite3", json_path=tmp_path / "no_existe.json")
+
+    def aprender(base):
+        for i in range(50):
+            mem.learn({'rut': f'{base + i}-0', 'nombre': f'PERSONA {base + i}', 'convenio': 'PASMI'})
+            mem.get_rut_by_name(f'PERSONA {base + i}')
+
+    hilos = [threading.Thread(target=aprender, args=(k * 1000,)) for k in range(4)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert mem.get_stats()['total_ruts'] == 200
+    mem.close()